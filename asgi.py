@@ -0,0 +1,7 @@
+from src import create_app
+from src.asgi import AsgiApplication
+
+
+# Serve the Flask application under an ASGI server (e.g. `uvicorn asgi:app`),
+# with the async views of the JSON API running on the server's event loop
+app = AsgiApplication(create_app())
@@ -0,0 +1,77 @@
+"""
+Benchmark of the vectorized rating report over a large catalogue.
+
+The benchmark seeds a scratch database with `benchmarks.datagen`, then
+builds the rating report of `src.analytics` with a few chunk sizes, printing
+the time, rows per second and peak resident memory of each run. With
+`--orm`, the same per-category and per-freelancer averages are also computed
+from `Package` objects one at a time, as the nightly reports used to.
+
+    python -m benchmarks.bench_analytics --freelancers 100000 --packages-per-freelancer 100
+"""
+import argparse
+import resource
+import time
+from collections import defaultdict
+
+from benchmarks.datagen import create_scratch_app, generate
+
+
+def peak_memory_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def orm_report(chunk_size: int):
+    """Average rating per category and per freelancer from ORM objects, without NumPy."""
+    from src import db
+    from src.models import Package
+
+    totals = defaultdict(lambda: [0, 0])
+    for package in db.session.execute(db.select(Package).execution_options(yield_per=chunk_size)).scalars():
+        for key in (('category', package.category), ('freelancer', package.freelancer_id)):
+            totals[key][0] += package.rating
+            totals[key][1] += 1
+    db.session.expunge_all()
+    return {key: rating_sum / count for key, (rating_sum, count) in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--freelancers', type=int, default=100000)
+    parser.add_argument('--packages-per-freelancer', type=int, default=100)
+    parser.add_argument('--chunk-sizes', default='10000,50000,200000')
+    parser.add_argument('--orm', action='store_true', help='also time the report built from ORM objects')
+    args = parser.parse_args()
+
+    app = create_scratch_app()
+    from src import db
+    from src.analytics import build_rating_report, load_rating_histograms
+
+    with app.app_context():
+        start = time.perf_counter()
+        with db.engine.begin() as connection:
+            total = generate(connection, args.freelancers, args.packages_per_freelancer, '-')
+        print(f'Seeded {total} packages for {args.freelancers} freelancers in {time.perf_counter() - start:.1f}s '
+              f'(peak memory {peak_memory_mb():.0f} MB)')
+
+        for chunk_size in (int(size) for size in args.chunk_sizes.split(',')):
+            start = time.perf_counter()
+            histograms = load_rating_histograms(chunk_size)
+            loaded = time.perf_counter() - start
+            build_rating_report(histograms, top=10, min_packages=5)
+            elapsed = time.perf_counter() - start
+            db.session.rollback()
+            print(f'  [numpy chunk={chunk_size}] {elapsed:.2f}s ({loaded:.2f}s reading), '
+                  f'{total / elapsed:,.0f} rows/sec, peak memory {peak_memory_mb():.0f} MB')
+
+        if args.orm:
+            start = time.perf_counter()
+            orm_report(10000)
+            elapsed = time.perf_counter() - start
+            print(f'  [orm]               {elapsed:.2f}s, {total / elapsed:,.0f} rows/sec, '
+                  f'peak memory {peak_memory_mb():.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Load test of the async read-only JSON API under WSGI and ASGI servers.
+
+The benchmark seeds a scratch SQLite database, then starts each server in
+turn on the same database and sends requests to '/api/v1/freelancers/<id>'
+and '/api/v1/freelancers/<id>/packages' from concurrent keep-alive clients:
+
+    * wsgi - gunicorn sync workers (`app:app`), one request per process at a time
+    * asgi - uvicorn (`asgi:app`), requests on a thread pool, queries on the event loop
+
+The requests per second, latency percentiles and resident memory of each
+server's process tree are reported side by side. Pick the worker counts so
+that both servers use about the same memory, e.g.:
+
+    python -m benchmarks.bench_asgi_api --wsgi-workers 4 --asgi-workers 1 --concurrency 32
+"""
+import argparse
+import http.client
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_marketplace import seed
+
+
+def process_tree_rss(pid: int) -> int:
+    """Return the resident memory (in kB) of the process `pid` and all of its descendants."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, StopIteration):
+            continue
+    return total
+
+
+def wait_until_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/v1/freelancers/1')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'The server on port {port} did not start')
+
+
+def run_client(port, num_freelancers, deadline, seed_value, timings, errors):
+    rng = random.Random(seed_value)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.monotonic() < deadline:
+        freelancer_id = rng.randint(1, num_freelancers)
+        url = rng.choice([f'/api/v1/freelancers/{freelancer_id}', f'/api/v1/freelancers/{freelancer_id}/packages'])
+        start = time.perf_counter()
+        try:
+            connection.request('GET', url)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException):
+            errors.append(url)
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+def load_test(name, command, environment, port, args):
+    server = subprocess.Popen(command, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port)
+        timings, errors = [], []
+        deadline = time.monotonic() + args.duration
+        clients = [threading.Thread(target=run_client,
+                                    args=(port, args.freelancers, deadline, n, timings, errors))
+                   for n in range(args.concurrency)]
+        for client in clients:
+            client.start()
+        time.sleep(args.duration / 2)
+        memory = process_tree_rss(server.pid)
+        for client in clients:
+            client.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    timings.sort()
+    print(f'  [{name}] {len(timings) / args.duration:.0f} requests/s '
+          f'p50={statistics.median(timings):.2f}ms p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms '
+          f'p99={timings[int(len(timings) * 0.99) - 1]:.2f}ms rss={memory / 1024:.0f}MB '
+          f'errors={len(errors)} over {len(timings)} requests')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--packages', type=int, default=100000)
+    parser.add_argument('--freelancers', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per server')
+    parser.add_argument('--wsgi-workers', type=int, default=4)
+    parser.add_argument('--asgi-workers', type=int, default=1)
+    parser.add_argument('--asgi-threads', type=int, default=32)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    environment = dict(os.environ,
+                       CONFIG_TYPE='config.config.TestingConfig',
+                       TEST_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench_asgi_api.db')}",
+                       SCHEMA_LOCK_FILE=os.path.join(directory, 'schema.lock'),
+                       LOG_FILE=os.path.join(directory, 'bench.log'),
+                       ASGI_THREADS=str(args.asgi_threads))
+    os.environ.update(environment)
+
+    from src import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        print(f'Seeding {args.packages} packages for {args.freelancers} freelancers into {db.engine.url}...')
+        with db.engine.begin() as connection:
+            seed(connection, args.freelancers, args.packages)
+            connection.exec_driver_sql('ANALYZE')
+
+    address = f'127.0.0.1:{args.port}'
+    print(f'{args.concurrency} concurrent clients for {args.duration:.0f}s per server:')
+    load_test(f'wsgi gunicorn x{args.wsgi_workers}',
+              [sys.executable, '-m', 'gunicorn', '--workers', str(args.wsgi_workers), '--bind', address, 'app:app'],
+              environment, args.port, args)
+    load_test(f'asgi uvicorn x{args.asgi_workers}',
+              [sys.executable, '-m', 'uvicorn', '--workers', str(args.asgi_workers), '--host', '127.0.0.1',
+               '--port', str(args.port), '--no-access-log', 'asgi:app'],
+              environment, args.port, args)
+
+
+if __name__ == '__main__':
+    main()
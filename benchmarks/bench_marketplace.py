@@ -0,0 +1,101 @@
+"""
+Benchmark of the '/marketplace' page over a large catalogue.
+
+The benchmark points the testing configuration at a scratch SQLite database,
+seeds it with packages spread over many freelancers and categories, derives
+the facet summary table, then requests a mix of filtered, sorted and paged
+marketplace URLs through the test client, without and with the short-TTL
+result cache.
+
+    python -m benchmarks.bench_marketplace --packages 1000000 --freelancers 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+
+CATEGORIES = ['Web Development', 'Mobile Development', 'Data Science', 'Design',
+              'Writing', 'Marketing', 'DevOps', 'Translation']
+
+
+def seed(connection, num_freelancers, num_packages, batch_size=10000):
+    from src.models import Freelancer, Package
+
+    connection.execute(Freelancer.__table__.insert(), [
+        {'id': i, 'full_name': f'Freelancer {i}', 'email': f'freelancer{i}@example.com',
+         'password_hashed': '-', 'created_at': datetime.now()} for i in range(1, num_freelancers + 1)
+    ])
+    rng = random.Random(42)
+    for start in range(0, num_packages, batch_size):
+        connection.execute(Package.__table__.insert(), [
+            {'package_name': f'Package {n}', 'category': rng.choice(CATEGORIES),
+             'rating': rng.randint(1, 5), 'freelancer_id': rng.randint(1, num_freelancers)}
+            for n in range(start, min(start + batch_size, num_packages))
+        ])
+
+
+def sample_urls(rng, count):
+    urls = []
+    for _ in range(count):
+        parameters = {'sort': rng.choice(['rating', 'recent'])}
+        if rng.random() < 0.5:
+            parameters['category'] = rng.choice(CATEGORIES)
+        if rng.random() < 0.5:
+            parameters['min_rating'] = rng.randint(1, 5)
+        urls.append('/marketplace?' + '&'.join(f'{key}={value}' for key, value in parameters.items()))
+    return urls
+
+
+def timed(client, urls):
+    timings = []
+    for url in urls:
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, url
+    timings.sort()
+    return (f'p50={statistics.median(timings):.2f}ms p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms '
+            f'p99={timings[int(len(timings) * 0.99) - 1]:.2f}ms over {len(timings)} requests')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--packages', type=int, default=1000000)
+    parser.add_argument('--freelancers', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['CONFIG_TYPE'] = 'config.config.TestingConfig'
+    os.environ['TEST_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'bench_marketplace.db')}"
+    os.environ['SCHEMA_LOCK_FILE'] = os.path.join(directory, 'schema.lock')
+
+    from src import create_app, db
+    from src.marketplace import marketplace_cache, rebuild_facets
+
+    app = create_app()
+    with app.app_context():
+        print(f'Seeding {args.packages} packages for {args.freelancers} freelancers into {db.engine.url}...')
+        start = time.perf_counter()
+        with db.engine.begin() as connection:
+            seed(connection, args.freelancers, args.packages)
+            rebuild_facets(connection)
+            connection.exec_driver_sql('ANALYZE')
+        print(f'Seeded in {time.perf_counter() - start:.1f}s')
+
+    urls = sample_urls(random.Random(7), args.requests)
+    with app.test_client() as client:
+        app.config['MARKETPLACE_CACHE_TTL'] = 0
+        print(f'  [uncached] {timed(client, urls)}')
+
+        app.config['MARKETPLACE_CACHE_TTL'] = 60
+        marketplace_cache.clear()
+        print(f'  [cached]   {timed(client, urls)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark of the per-request overhead of the request metrics.
+
+Times the work done by the `Metrics` request hooks for one request (in-flight
+gauge increment, then latency histogram observation, status counter increment
+and in-flight gauge decrement under one lock) with the in-memory store and
+with the multi-process memory-mapped store.
+
+    python -m benchmarks.bench_metrics_overhead --requests 200000
+"""
+import argparse
+import tempfile
+import time
+
+from src.metrics import Metrics
+
+
+def bench(metrics: Metrics, requests: int) -> float:
+    """Return the overhead in microseconds per simulated request."""
+    endpoints = [('packages.list_packages',), ('freelancers.login',), ('packages.index',)]
+    start = time.perf_counter()
+    for n in range(requests):
+        endpoint = endpoints[n % 3]
+        metrics.in_flight.inc(endpoint)
+        with metrics.registry.lock:
+            metrics.request_latency._observe(0.012, endpoint)
+            metrics.requests._inc(endpoint + ('200',), 1.0)
+            metrics.in_flight._inc(endpoint, -1.0)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200000)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    print(f'in-memory store: {bench(metrics, args.requests):.2f} us/request')
+
+    with tempfile.TemporaryDirectory() as directory:
+        metrics = Metrics()
+        metrics.registry.configure(directory)
+        print(f'mmap store:      {bench(metrics, args.requests):.2f} us/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Microbenchmark of password verification throughput for each hashing policy.
+
+Each policy is timed by verifying a password repeatedly in a single thread,
+so the reported logins/sec is the throughput of one CPU core. Use it to pick
+`PASSWORD_HASH_METHOD` by trading hash cost against login throughput.
+
+    python -m benchmarks.bench_password_hashing
+    python -m benchmarks.bench_password_hashing --policy pbkdf2:sha256:100000 --policy scrypt:16384:8:1
+"""
+import argparse
+import time
+
+from src.hashing import hash_password, normalize_method, verify_password
+
+
+DEFAULT_POLICIES = [
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha512:210000',
+    'scrypt:32768:8:1',
+    'scrypt:16384:8:1',
+]
+
+
+def bench_policy(method: str, seconds: float) -> float:
+    """Return the number of verifications per second achieved for `method`."""
+    password_hashed = hash_password('SecretPass', policy=(normalize_method(method), 16))
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        verify_password(password_hashed, 'SecretPass')
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--policy', action='append', help='werkzeug method string (repeatable)')
+    parser.add_argument('--seconds', type=float, default=2.0, help='time spent on each policy')
+    args = parser.parse_args()
+
+    print(f"{'policy':<24} {'logins/sec/core':>16} {'ms/login':>10}")
+    for method in args.policy or DEFAULT_POLICIES:
+        rate = bench_policy(method, args.seconds)
+        print(f'{normalize_method(method):<24} {rate:>16.1f} {1000 / rate:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
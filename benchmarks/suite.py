@@ -0,0 +1,311 @@
+"""
+Benchmark suite driving the real views with concurrent virtual users.
+
+The suite seeds a scratch database with `benchmarks.datagen`. Each scenario
+then sends `--requests` requests from `--concurrency` virtual users, each
+logged in as a different freelancer:
+    * list_packages - GET '/packages/'
+    * profile - GET '/profile'
+    * status - GET '/status'
+    * login - POST '/login' from a logged out client
+    * add_package - POST '/packages/add'
+
+The requests go through each selected transport:
+    * client - the Flask test client, in process (no network or server overhead)
+    * server - a real WSGI server (gunicorn with `--server-workers` processes
+      of `--server-threads` threads) on a local port
+
+The throughput and p50/p95/p99 latencies of every scenario are printed, and
+can be saved as a JSON baseline. With `--baseline`, the run is compared with
+a saved baseline. The command exits with status 1 if a scenario had errors,
+lost more than `--tolerance` of its throughput, or got more than
+`--tolerance` slower at p95. CI can therefore fail on performance
+regressions:
+
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --tolerance 0.25
+
+Baselines are only comparable when they are measured on the same kind of
+machine, with the same options.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from benchmarks.datagen import BENCH_PASSWORD, create_scratch_app, seed_database
+
+
+# name: (method, path, form data, expected status); '{n}' is replaced by a counter
+SCENARIOS = {
+    'status': ('GET', '/status', None, 200),
+    'login': ('POST', '/login', 'credentials', 302),
+    'list_packages': ('GET', '/packages/', None, 200),
+    'profile': ('GET', '/profile', None, 200),
+    'add_package': ('POST', '/packages/add',
+                    {'package_title': 'Benchmark package {n}', 'package_author': 'Benchmarks', 'package_rating': '4'},
+                    302),
+}
+
+
+def credentials(freelancer_id: int) -> dict:
+    return {'email': f'freelancer{freelancer_id}@example.com', 'password': BENCH_PASSWORD}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Return the nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))]
+
+
+# ----------
+# Transports
+# ----------
+
+class TestClientUser(object):
+    """Virtual user sending requests through the Flask test client."""
+
+    def __init__(self, app, freelancer_id):
+        self.app = app
+        self.freelancer_id = freelancer_id
+        self.client = app.test_client()
+
+    def log_in(self):
+        return self.request('POST', '/login', credentials(self.freelancer_id))
+
+    def request(self, method, path, data=None, logged_out=False):
+        client = self.app.test_client(use_cookies=False) if logged_out else self.client
+        return client.open(path, method=method, data=data).status_code
+
+
+class HttpUser(object):
+    """Virtual user sending requests over a keep-alive HTTP connection, with its own cookies."""
+
+    def __init__(self, port, freelancer_id):
+        self.port = port
+        self.freelancer_id = freelancer_id
+        self.cookies = {}
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def log_in(self):
+        return self.request('POST', '/login', credentials(self.freelancer_id))
+
+    def request(self, method, path, data=None, logged_out=False):
+        headers = {}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies and not logged_out:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            return None
+
+        if not logged_out:
+            for header in response.headers.get_all('Set-Cookie') or []:
+                name, _, value = header.split(';', 1)[0].partition('=')
+                self.cookies[name.strip()] = value
+        return response.status
+
+
+class WsgiServer(object):
+    """gunicorn serving `app:app` on a local port, as a subprocess."""
+
+    def __init__(self, port, workers, threads):
+        self.port = port
+        self.command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+                        '--bind', f'127.0.0.1:{port}', 'app:app']
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, env=dict(os.environ),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                connection.request('GET', '/status/live')
+                if connection.getresponse().status == 200:
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f'The WSGI server did not start: {" ".join(self.command)}')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+
+# -------
+# Running
+# -------
+
+def run_scenario(name, users, num_requests, warmup):
+    """Send `num_requests` requests of the scenario `name` spread over `users` and return its results."""
+    method, path, data, expected_status = SCENARIOS[name]
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+    timings, errors = [], []
+    per_user = [num_requests // len(users) + (1 if i < num_requests % len(users) else 0) for i in range(len(users))]
+
+    def send(user):
+        if data == 'credentials':
+            return user.request(method, path, credentials(user.freelancer_id), logged_out=True)
+        form = None
+        if data is not None:
+            with counter_lock:
+                n = next(counter)
+            form = {key: value.format(n=n) for key, value in data.items()}
+        return user.request(method, path, form)
+
+    def run_user(user, count):
+        for _ in range(warmup):
+            send(user)
+        barrier.wait()
+        for _ in range(count):
+            start = time.perf_counter()
+            status = send(user)
+            elapsed = (time.perf_counter() - start) * 1000
+            if status == expected_status:
+                timings.append(elapsed)
+            else:
+                errors.append(status)
+
+    barrier = threading.Barrier(len(users) + 1)
+    threads = [threading.Thread(target=run_user, args=(user, count)) for user, count in zip(users, per_user)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        'requests': len(timings) + len(errors),
+        'errors': len(errors),
+        'throughput': round(len(timings) / duration, 2) if duration else 0.0,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+    }
+
+
+def run_transport(make_user, scenarios, args, freelancer_ids):
+    users = [make_user(freelancer_id) for freelancer_id in freelancer_ids]
+    for user in users:
+        if user.log_in() != 302:
+            raise RuntimeError(f'Freelancer {user.freelancer_id} could not log in')
+
+    results = {}
+    for name in scenarios:
+        results[name] = result = run_scenario(name, users, args.requests, args.warmup)
+        print(f"    {name:<14} {result['throughput']:>9.1f} req/s  p50={result['p50_ms']:.2f}ms  "
+              f"p95={result['p95_ms']:.2f}ms  p99={result['p99_ms']:.2f}ms  errors={result['errors']}")
+    return results
+
+
+# -----------------------
+# Baseline Comparison
+# -----------------------
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float):
+    """Return a description of every regression of `results` against `baseline`."""
+    regressions = []
+    for transport, scenarios in results.items():
+        for name, result in scenarios.items():
+            if result['errors']:
+                regressions.append(f"{transport}/{name}: {result['errors']} of {result['requests']} requests failed")
+            expected = baseline.get('results', {}).get(transport, {}).get(name)
+            if expected is None:
+                continue
+            if result['throughput'] < expected['throughput'] * (1 - tolerance):
+                regressions.append(f"{transport}/{name}: throughput {result['throughput']} req/s is below "
+                                   f"the baseline {expected['throughput']} req/s")
+            if result['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{transport}/{name}: p95 {result['p95_ms']}ms is above "
+                                   f"the baseline {expected['p95_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--freelancers', type=int, default=1000)
+    parser.add_argument('--packages-per-freelancer', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and transport')
+    parser.add_argument('--warmup', type=int, default=2, help='untimed requests per virtual user')
+    parser.add_argument('--concurrency', type=int, default=8, help='virtual users')
+    parser.add_argument('--transports', default='client,server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--server-workers', type=int, default=2)
+    parser.add_argument('--server-threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--baseline', help='JSON baseline to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    parser.add_argument('--save-baseline', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    app = create_scratch_app()
+    start = time.perf_counter()
+    total = seed_database(app, args.freelancers, args.packages_per_freelancer)
+    print(f'Seeded {args.freelancers} freelancers and {total} packages in {time.perf_counter() - start:.1f}s')
+
+    freelancer_ids = random.Random(7).sample(range(1, args.freelancers + 1), min(args.concurrency, args.freelancers))
+    results = {}
+    for transport in args.transports.split(','):
+        print(f'  [{transport}] {len(freelancer_ids)} virtual users, {args.requests} requests per scenario')
+        if transport == 'client':
+            results['client'] = run_transport(lambda id: TestClientUser(app, id), scenarios, args, freelancer_ids)
+        elif transport == 'server':
+            with WsgiServer(args.port, args.server_workers, args.server_threads):
+                results['server'] = run_transport(lambda id: HttpUser(args.port, id), scenarios, args,
+                                                  freelancer_ids)
+        else:
+            parser.error(f'unknown transport: {transport}')
+
+    report = {
+        'options': {key: getattr(args, key) for key in ('freelancers', 'packages_per_freelancer', 'requests',
+                                                        'concurrency', 'server_workers', 'server_threads')},
+        'results': results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'Saved the baseline to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('options') != report['options']:
+            print(f"WARNING: the baseline was measured with other options: {baseline.get('options')}")
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regression beyond {args.tolerance:.0%} of the baseline.')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,6 @@ import logging
 import os
 from logging.handlers import RotatingFileHandler
 
-import sqlalchemy as sqla
 from click import echo
 
 from flask import Flask
@@ -11,11 +10,36 @@ from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
 
-
-db = SQLAlchemy()
+from src.async_db import AsyncDatabase
+from src.fragments import FragmentCache
+from src.hashing import PasswordHasher
+from src.http_cache import HttpCache
+from src.identity import FreelancerIdentity, IdentityCache
+from src.instrumentation import QueryInstrumentation
+from src.jobs import JobQueue
+from src.log import JsonFormatter, NonBlockingQueueHandler, create_queue_handler
+from src.metrics import Metrics
+from src.pool import DatabasePool, InstrumentedQueuePool
+from src.replica import ReplicaRouter, RoutingSession
+
+
+# Every engine uses a pool that reports how long checkouts wait for a connection,
+# and the session sends the reads of GET requests to the read replica (if any)
+db = SQLAlchemy(engine_options={'poolclass': InstrumentedQueuePool}, session_options={'class_': RoutingSession})
+async_db = AsyncDatabase()
+replica_router = ReplicaRouter()
 csrf_protection = CSRFProtect()
 login = LoginManager()
 login.login_view = "freelancers.login"
+login.blueprint_login_views = {'api': None}  # API clients get a 401 instead of a redirect
+identity_cache = IdentityCache()
+password_hasher = PasswordHasher()
+query_instrumentation = QueryInstrumentation()
+metrics = Metrics()
+database_pool = DatabasePool()
+http_cache = HttpCache()
+fragment_cache = FragmentCache()
+job_queue = JobQueue()
 
 # -----------------------------------
 # Create Application Factory Function
@@ -34,16 +58,13 @@ def create_app():
     configure_logging(app)
     register_cli_commands(app)
 
-    # Check if the database needs to be initialized
-    engine = sqla.create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
-    inspector = sqla.inspect(engine)
-    if not inspector.has_table("users"):
-        with app.app_context():
-            db.drop_all()
-            db.create_all()
-            app.logger.info('Initialized the database!')
+    # Check if the database schema needs to be created or upgraded
+    from src.schema import ensure_schema
+
+    if ensure_schema(app):
+        app.logger.info('Initialized the database!')
     else:
-        app.logger.info('Database already contains the users table.')
+        app.logger.info('Database schema is up to date.')
 
     return app
 
@@ -55,15 +76,29 @@ def initialize_extensions(app):
     # Since the application instance is now created, pass it to each Flask
     # extension instance to bind it to the Flask application instance (app)
     db.init_app(app)
+    replica_router.init_app(app)
+    async_db.init_app(app)
     #csrf_protection.init_app(app)
     login.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    query_instrumentation.init_app(app)
+    metrics.init_app(app)
+    database_pool.init_app(app)
+    http_cache.init_app(app)
+    fragment_cache.init_app(app)
+    job_queue.init_app(app)
 
     # Flask-Login configuration
     from src.models import Freelancer
 
+    def load_identity(user_id):
+        freelancer = Freelancer.query.filter(Freelancer.id == user_id).first()
+        return FreelancerIdentity.from_freelancer(freelancer) if freelancer else None
+
     @login.user_loader
     def load_user(user_id):
-        return Freelancer.query.filter(Freelancer.id == int(user_id)).first()
+        return identity_cache.load(int(user_id), load_identity)
 
 
 def register_blueprints(app):
@@ -71,9 +106,11 @@ def register_blueprints(app):
     # with the Flask application instance (app)
     from src.packages import packages_blueprint
     from src.freelancers import freelancers_blueprint
+    from src.api import api_blueprint
 
     app.register_blueprint(packages_blueprint)
     app.register_blueprint(freelancers_blueprint)
+    app.register_blueprint(api_blueprint)
 
 
 def configure_logging(app):
@@ -83,13 +120,25 @@ def configure_logging(app):
         app.logger.handlers.extend(gunicorn_error_logger.handlers)
         app.logger.setLevel(logging.DEBUG)
     else:
-        file_handler = RotatingFileHandler('instance/flask-freelancer-management.log',
-                                           maxBytes=16384,
-                                           backupCount=20)
-        file_formatter = logging.Formatter('%(asctime)s %(levelname)s %(threadName)s-%(thread)d: %(message)s [in %(filename)s:%(lineno)d]')
-        file_handler.setFormatter(file_formatter)
+        # Request threads only enqueue records; a background thread writes them
+        # as JSON lines to the rotating log file
+        for handler in [h for h in app.logger.handlers if isinstance(h, NonBlockingQueueHandler)]:
+            app.logger.removeHandler(handler)
+            handler.close()
+
+        os.makedirs(os.path.dirname(app.config['LOG_FILE']) or '.', exist_ok=True)
+        file_handler = RotatingFileHandler(app.config['LOG_FILE'],
+                                           maxBytes=app.config['LOG_MAX_BYTES'],
+                                           backupCount=app.config['LOG_BACKUP_COUNT'])
+        file_handler.setFormatter(JsonFormatter())
         file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
+
+        queue_handler = create_queue_handler(file_handler,
+                                             app.config['LOG_QUEUE_SIZE'],
+                                             app.config['LOG_INFO_SAMPLE_RATE'])
+        app.logger.addHandler(queue_handler)
+        app.logger.setLevel(logging.INFO)
+        app.extensions['log_queue_handler'] = queue_handler
 
     # Remove the default logger configured by Flask
     app.logger.removeHandler(default_handler)
@@ -101,8 +150,19 @@ def register_cli_commands(app):
     @app.cli.command('init_db')
     def initialize_database():
         """Initialize the database."""
-        db.drop_all()
-        db.create_all()
+        from src.schema import reset_schema
+
+        reset_schema()
         echo('Initialized the database!')
 
+    from src.analytics import analytics_cli
+    from src.jobs import worker_command
+    from src.packages.cli import packages_cli
+    from src.stats import stats_cli
+
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(packages_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(worker_command)
+
 
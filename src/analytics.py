@@ -0,0 +1,213 @@
+"""
+Rating reports over every package: distribution of the ratings per category
+and per freelancer, with top-N rankings.
+
+The `(category, rating, freelancer_id)` columns are streamed with
+`yield_per` and each chunk is folded into rating histograms (one row of 5
+counts per category and per freelancer) with `numpy.bincount`. Categories and
+freelancer ids are mapped to dense row codes, so memory is bounded by the
+chunk size and the number of distinct categories and freelancers, never by
+the number of packages or the magnitude of the ids. Ratings are whole numbers
+from 1 to 5, so the means and percentiles computed from the histograms are
+exact.
+
+    flask analytics ratings --top 10 --min-packages 5 report.json
+    GET /api/v1/analytics/ratings?top=10&min_packages=5
+
+Reports are cached for `ANALYTICS_CACHE_TTL` seconds.
+"""
+import json
+
+import click
+from flask import current_app
+import numpy as np
+from flask.cli import AppGroup
+
+from src import db
+from src.cache import TTLCache
+from src.stats import RATINGS
+
+
+PERCENTILES = (25, 50, 75, 90)
+
+analytics_cache = TTLCache(maxsize=64)
+
+analytics_cli = AppGroup('analytics', help='Reports on the packages.')
+
+
+class RatingHistograms(object):
+    """
+    Number of packages per rating of every category and every freelancer.
+
+    The following attributes are accumulated chunk by chunk:
+        * categories - row index of every category in `category_counts`
+        * category_counts - array of shape (categories, 5): packages per category and rating
+        * freelancers - row index of every freelancer id in `freelancer_counts`
+        * freelancer_counts - array of shape (freelancers, 5): packages per freelancer and rating
+        * packages, unrated - number of packages read, and of those without a rating from 1 to 5
+    """
+
+    def __init__(self):
+        self.categories = {}
+        # Also maps None to the code of '', for `add`
+        self._codes = {}
+        self.category_counts = np.zeros((0, len(RATINGS)), dtype=np.int64)
+        self.freelancers = {}
+        self.freelancer_counts = np.zeros((0, len(RATINGS)), dtype=np.int64)
+        self.packages = 0
+        self.unrated = 0
+
+    @staticmethod
+    def accumulate(totals, keys, rating_indexes):
+        """Add the number of occurrences of every (key, rating) to `totals`, growing it as needed."""
+        if not len(keys):
+            return totals
+        width = len(RATINGS)
+        # Only count over the range of keys of the chunk
+        first, last = int(keys.min()), int(keys.max())
+        counts = np.bincount((keys - first) * width + rating_indexes, minlength=(last - first + 1) * width)
+        if last >= len(totals):
+            # Grow geometrically, as new keys are appended
+            grown = np.zeros((max(last + 1, 2 * len(totals)), width), dtype=np.int64)
+            grown[:len(totals)] = totals
+            totals = grown
+        totals[first:last + 1] += counts.reshape(-1, width)
+        return totals
+
+    def add(self, categories, ratings, freelancer_ids):
+        """Add one chunk of the three columns (sequences of equal length, possibly holding None)."""
+        for category in dict.fromkeys(categories):  # distinct, in order of appearance
+            if category not in self._codes:
+                self._codes[category] = self.categories.setdefault(category or '', len(self.categories))
+        category_codes = np.fromiter(map(self._codes.__getitem__, categories), dtype=np.intp, count=len(categories))
+        # None becomes NaN, which fails every comparison
+        ratings = np.array(ratings, dtype=np.float64)
+        freelancer_ids = np.array(freelancer_ids, dtype=np.float64)
+
+        rated = (ratings >= RATINGS.start) & (ratings < RATINGS.stop) & (ratings == np.floor(ratings))
+        rating_indexes = ratings[rated].astype(np.intp) - RATINGS.start
+        self.packages += len(ratings)
+        self.unrated += len(ratings) - int(rated.sum())
+
+        self.category_counts = self.accumulate(self.category_counts, category_codes[rated], rating_indexes)
+        owned = freelancer_ids[rated] >= 0
+        self.freelancer_counts = self.accumulate(self.freelancer_counts,
+                                                 self.freelancer_codes(freelancer_ids[rated][owned]),
+                                                 rating_indexes[owned])
+
+    def freelancer_codes(self, freelancer_ids):
+        """Return the row codes of `freelancer_ids`, assigning new codes to the ids not seen before."""
+        distinct, inverse = np.unique(freelancer_ids.astype(np.int64), return_inverse=True)
+        codes = [self.freelancers.setdefault(int(freelancer_id), len(self.freelancers)) for freelancer_id in distinct]
+        return np.array(codes, dtype=np.intp)[inverse.reshape(-1)]
+
+
+def load_rating_histograms(chunk_size: int) -> RatingHistograms:
+    """Read the category, rating and owner of every package, `chunk_size` rows at a time."""
+    from src.models import Package
+
+    histograms = RatingHistograms()
+    query = db.select(Package.category, Package.rating, Package.freelancer_id).execution_options(yield_per=chunk_size)
+    # Plain rows through the connection of the session: the ORM result layer would double the cost per row
+    for partition in db.session.connection().execute(query).partitions():
+        histograms.add(*zip(*partition))
+    return histograms
+
+
+def summarize(counts) -> dict:
+    """Return the package count, mean rating and rating percentiles of every row of histograms."""
+    totals = counts.sum(axis=1)
+    sums = counts @ np.arange(RATINGS.start, RATINGS.stop)
+    means = np.divide(sums, totals, out=np.full(len(totals), np.nan), where=totals > 0)
+    # Nearest-rank percentile: the first rating whose cumulative count reaches the rank
+    cumulative = counts.cumsum(axis=1)
+    percentiles = {}
+    for percentile in PERCENTILES:
+        ranks = np.maximum(np.ceil(totals * percentile / 100), 1)
+        percentiles[percentile] = (cumulative < ranks[:, np.newaxis]).sum(axis=1) + RATINGS.start
+    return {'totals': totals, 'means': means, 'percentiles': percentiles}
+
+
+def rank(summary: dict, top: int, min_packages: int = 1, by: str = 'means', keys=None):
+    """
+    Return the row indexes of the `top` best rows by mean rating (or by package
+    count with `by='totals'`), among the rows with at least `min_packages` packages.
+    """
+    totals = summary['totals']
+    candidates = np.flatnonzero(totals >= max(min_packages, 1))
+    primary = summary[by][candidates]
+    secondary = totals[candidates] if by == 'means' else summary['means'][candidates]
+    tiebreak = candidates if keys is None else np.asarray(keys)[candidates]
+    # Best first; ties are broken by the other measure, then by the lowest key (default: the row index)
+    order = np.lexsort((tiebreak, -secondary, -primary))
+    return candidates[order[:top]]
+
+
+def group_report(counts, summary: dict, row: int) -> dict:
+    total = int(summary['totals'][row])
+    return {
+        'package_count': total,
+        'average_rating': round(float(summary['means'][row]), 2) if total else None,
+        'percentiles': {f'p{percentile}': int(values[row]) if total else None
+                        for percentile, values in summary['percentiles'].items()},
+        'histogram': {str(rating): int(count) for rating, count in zip(RATINGS, counts[row])},
+    }
+
+
+def build_rating_report(histograms: RatingHistograms, top: int, min_packages: int) -> dict:
+    """Return the JSON-serializable rating report of `histograms`."""
+    categories = list(histograms.categories)
+    freelancer_ids = np.fromiter(histograms.freelancers, dtype=np.int64, count=len(histograms.freelancers))
+    category_summary = summarize(histograms.category_counts)
+    freelancer_summary = summarize(histograms.freelancer_counts)
+    overall_counts = histograms.category_counts.sum(axis=0, keepdims=True)
+
+    def category_entry(row):
+        return dict(category=categories[row], **group_report(histograms.category_counts, category_summary, row))
+
+    def freelancer_entry(row):
+        return dict(freelancer_id=int(freelancer_ids[row]),
+                    **group_report(histograms.freelancer_counts, freelancer_summary, row))
+
+    return {
+        'packages': histograms.packages,
+        'unrated_packages': histograms.unrated,
+        'rated_freelancers': int(np.count_nonzero(freelancer_summary['totals'])),
+        'overall': group_report(overall_counts, summarize(overall_counts), 0),
+        'categories': [category_entry(row) for row in rank(category_summary, len(categories), by='totals')],
+        'top_categories': [category_entry(row) for row in rank(category_summary, top, min_packages)],
+        'top_freelancers': [freelancer_entry(row) for row in rank(freelancer_summary, top, min_packages,
+                                                                  keys=freelancer_ids)],
+        'most_active_freelancers': [freelancer_entry(row) for row in rank(freelancer_summary, top, by='totals',
+                                                                          keys=freelancer_ids)],
+    }
+
+
+def rating_report(top: int = 10, min_packages: int = None, chunk_size: int = None) -> dict:
+    """Return the rating report of every package, cached for `ANALYTICS_CACHE_TTL` seconds."""
+    config = current_app.config
+    min_packages = config['ANALYTICS_MIN_PACKAGES'] if min_packages is None else min_packages
+    key = (str(db.engine.url), top, min_packages)
+    report = analytics_cache.get(key)
+    if report is None:
+        histograms = load_rating_histograms(chunk_size or config['ANALYTICS_CHUNK_SIZE'])
+        report = build_rating_report(histograms, top, min_packages)
+        analytics_cache.set(key, report, ttl=config['ANALYTICS_CACHE_TTL'])
+    return report
+
+
+# ---
+# CLI
+# ---
+
+@analytics_cli.command('ratings')
+@click.argument('output', type=click.File('w'), default='-')
+@click.option('--top', type=int, default=10, show_default=True, help='Entries of each ranking.')
+@click.option('--min-packages', type=int, help='Rated packages needed to be ranked by average rating '
+              '(default: ANALYTICS_MIN_PACKAGES).')
+@click.option('--chunk-size', type=int, help='Rows fetched per round trip (default: ANALYTICS_CHUNK_SIZE).')
+def ratings_report(output, top, min_packages, chunk_size):
+    """Write the rating distribution per category and per freelancer as JSON."""
+    report = rating_report(top, min_packages, chunk_size)
+    json.dump(report, output, indent=2)
+    output.write('\n')
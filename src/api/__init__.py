@@ -0,0 +1,13 @@
+"""
+The api Blueprint provides a JSON REST API (version 1) for this application.
+Specifically, this Blueprint allows for packages to be created, updated and
+deleted in bulk by the logged in freelancer, serves the rating report of
+`src.analytics`, and provides async read-only endpoints for packages and
+freelancer profiles.
+"""
+from flask import Blueprint
+
+
+api_blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
+
+from . import async_routes, routes
@@ -0,0 +1,75 @@
+"""
+Read-only JSON API for packages and freelancer profiles.
+
+These views are async and query the database through `async_db`, so under
+the ASGI adapter (`src.asgi`) a slow query does not hold a worker process.
+They only read public data (the same as the marketplace) and never touch
+`current_user`, which would load the user through the synchronous session.
+"""
+from flask import abort, request
+
+from src import async_db, db
+from src.models import Freelancer, Package
+from src.packages.routes import get_page_size
+from src.stats import category_stats_query, stats_query, summarize_statistics
+
+from . import api_blueprint
+
+
+PACKAGE_COLUMNS = (Package.id, Package.package_name, Package.category, Package.rating, Package.freelancer_id)
+
+
+def package_json(row) -> dict:
+    return {'id': row.id, 'package_name': row.package_name, 'category': row.category,
+            'rating': row.rating, 'freelancer_id': row.freelancer_id}
+
+
+# ------
+# Routes
+# ------
+
+@api_blueprint.get('/packages/<int:package_id>')
+async def get_package(package_id):
+    async with async_db.session() as session:
+        row = (await session.execute(db.select(*PACKAGE_COLUMNS).where(Package.id == package_id))).first()
+    if row is None:
+        abort(404, description=f'Package {package_id} not found')
+    return package_json(row)
+
+
+@api_blueprint.get('/freelancers/<int:freelancer_id>')
+async def get_freelancer(freelancer_id):
+    async with async_db.session() as session:
+        freelancer = (await session.execute(
+            db.select(Freelancer.id, Freelancer.full_name, Freelancer.created_at).where(Freelancer.id == freelancer_id)
+        )).first()
+        if freelancer is None:
+            abort(404, description=f'Freelancer {freelancer_id} not found')
+        stats = (await session.execute(stats_query(freelancer_id))).scalar_one_or_none()
+        statistics = summarize_statistics(stats, (await session.execute(category_stats_query(freelancer_id))).all())
+
+    return {
+        'id': freelancer.id,
+        'full_name': freelancer.full_name,
+        'created_at': freelancer.created_at.isoformat() if freelancer.created_at else None,
+        'statistics': statistics,
+    }
+
+
+@api_blueprint.get('/freelancers/<int:freelancer_id>/packages')
+async def list_freelancer_packages(freelancer_id):
+    # Keyset pagination: `after` is the last id of the previous page
+    after = request.args.get('after', default=0, type=int)
+    per_page = get_page_size()
+    query = db.select(*PACKAGE_COLUMNS) \
+        .where(Package.freelancer_id == freelancer_id, Package.id > after) \
+        .order_by(Package.id) \
+        .limit(per_page + 1)
+
+    async with async_db.session() as session:
+        rows = (await session.execute(query)).all()
+
+    return {
+        'results': [package_json(row) for row in rows[:per_page]],
+        'next_after': rows[per_page - 1].id if len(rows) > per_page else None,
+    }
@@ -0,0 +1,126 @@
+from flask import abort, current_app, jsonify, request
+from flask_login import current_user, login_required
+from werkzeug.exceptions import HTTPException
+
+from src import db
+from src.analytics import rating_report
+from src.packages.bulk import (PackageUpdateModel, delete_packages, insert_packages,
+                               owned_package_ids, update_packages, validate_rows)
+from src.packages.routes import get_page_number, get_page_size
+from src.search import search_packages
+
+from . import api_blueprint
+
+
+# ----------------
+# Helper Functions
+# ----------------
+
+def get_json_rows():
+    """Return the JSON array in the request body, aborting with a 400/413 if it is unusable."""
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list):
+        abort(400, description='Request body must be a JSON array')
+    if len(rows) > current_app.config['API_BULK_MAX_ROWS']:
+        abort(413, description=f"At most {current_app.config['API_BULK_MAX_ROWS']} rows can be sent per request")
+    return rows
+
+
+def bulk_response(result: dict, errors: list, status_code: int):
+    """Return the result of a bulk operation, with 207 (Multi-Status) if some rows failed."""
+    result['errors'] = errors
+    if errors:
+        status_code = 207 if any(result.get(key) for key in ('created', 'updated', 'deleted')) else 422
+    return jsonify(result), status_code
+
+
+@api_blueprint.errorhandler(HTTPException)
+def handle_http_exception(e):
+    return jsonify(error=e.name, description=e.description), e.code
+
+
+# ------
+# Routes
+# ------
+
+@api_blueprint.get('/packages/search')
+@login_required
+def search():
+    query = request.args.get('q', default='').strip()
+    if not query:
+        abort(400, description='Query parameter "q" is required')
+
+    page = get_page_number()
+    packages, has_next = search_packages(query, current_user.id, page, get_page_size())
+    return jsonify(
+        results=[{'id': package.id, 'package_name': package.package_name,
+                  'category': package.category, 'rating': package.rating} for package in packages],
+        page=page,
+        next_page=page + 1 if has_next else None,
+    )
+
+
+@api_blueprint.get('/analytics/ratings')
+@login_required
+def ratings_analytics():
+    top = max(1, min(request.args.get('top', default=10, type=int), current_app.config['ANALYTICS_MAX_TOP']))
+    min_packages = request.args.get('min_packages', type=int)
+    return jsonify(rating_report(top, None if min_packages is None else max(1, min_packages)))
+
+
+@api_blueprint.post('/packages')
+@login_required
+def create_packages():
+    rows = get_json_rows()
+    valid, errors = validate_rows(rows)
+
+    ids = insert_packages([package for _, package in valid], current_user.id,
+                          current_app.config['API_BULK_BATCH_SIZE'])
+    db.session.commit()
+
+    current_app.logger.info(f'{len(ids)} packages were added in bulk for user: {current_user.id}!')
+    return bulk_response({'created': len(ids), 'ids': ids}, errors, 201)
+
+
+@api_blueprint.patch('/packages')
+@login_required
+def update_packages_in_bulk():
+    rows = get_json_rows()
+    valid, errors = validate_rows(rows, model=PackageUpdateModel)
+
+    batch_size = current_app.config['API_BULK_BATCH_SIZE']
+    owned = owned_package_ids([update.id for _, update in valid], current_user.id, batch_size)
+    updates = []
+    for index, update in valid:
+        if update.id in owned:
+            updates.append(update)
+        else:
+            errors.append({'index': index, 'errors': [{'msg': f'Package {update.id} not found'}]})
+
+    update_packages(updates, batch_size)
+    db.session.commit()
+
+    current_app.logger.info(f'{len(updates)} packages were updated in bulk by user: {current_user.id}')
+    return bulk_response({'updated': len(updates)}, sorted(errors, key=lambda error: error['index']), 200)
+
+
+@api_blueprint.delete('/packages')
+@login_required
+def delete_packages_in_bulk():
+    body = request.get_json(silent=True)
+    ids = body.get('ids') if isinstance(body, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(id, int) for id in ids):
+        abort(400, description='Request body must be a JSON object with a list of integer "ids"')
+    if len(ids) > current_app.config['API_BULK_MAX_ROWS']:
+        abort(413, description=f"At most {current_app.config['API_BULK_MAX_ROWS']} ids can be sent per request")
+
+    batch_size = current_app.config['API_BULK_BATCH_SIZE']
+    owned = owned_package_ids(ids, current_user.id, batch_size)
+    errors = [{'index': index, 'errors': [{'msg': f'Package {id} not found'}]}
+              for index, id in enumerate(ids) if id not in owned]
+
+    delete_packages(sorted(owned), batch_size)
+    db.session.commit()
+
+    current_app.logger.info(f'{len(owned)} packages were deleted in bulk for user: {current_user.id}!')
+    return bulk_response({'deleted': len(owned)}, errors, 200)
@@ -0,0 +1,64 @@
+"""
+ASGI adapter serving the Flask application next to the WSGI entry point:
+
+    uvicorn asgi:app --workers 2
+
+`asgiref.wsgi.WsgiToAsgi` runs every request on one shared thread, which
+would serialize the whole application. This adapter runs each request on a
+thread of a pool bounded by `ASGI_THREADS` instead. Async views, i.e. the
+read-only JSON API, are scheduled back on the server's event loop. There the
+async engine of `src.async_db` keeps one connection pool per process. A
+request waiting on the database only holds a thread, not a whole worker
+process.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+
+
+# The synchronous function that `WsgiToAsgiInstance` wraps with a thread-sensitive `sync_to_async`
+run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+
+class ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """Handles one request, running the WSGI application on a thread of `executor`."""
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(run_wsgi_app, thread_sensitive=False, executor=self.executor)(self, body)
+
+
+class AsgiApplication(object):
+    """ASGI application wrapping the Flask application `app`."""
+
+    def __init__(self, app):
+        self.app = app
+        self.async_db = app.extensions['async_db']
+        self.executor = ThreadPoolExecutor(max_workers=app.config['ASGI_THREADS'], thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        # Servers running without lifespan events attach the loop on the first request
+        if self.async_db.event_loop is None:
+            self.async_db.attach(asyncio.get_running_loop())
+        await ThreadPoolWsgiToAsgiInstance(self.app, self.executor)(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.async_db.attach(asyncio.get_running_loop())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.async_db.detach()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
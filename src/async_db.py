@@ -0,0 +1,100 @@
+"""
+Async database access for the async views of the read-only JSON API.
+
+The engine uses the async driver of the configured database (aiosqlite for
+SQLite, asyncpg for PostgreSQL), or `ASYNC_DATABASE_URI` if it is set, and
+works with the same models as `db`:
+
+    async with async_db.session() as session:
+        package = await session.get(Package, package_id)
+
+Flask runs an async view to completion on an event loop for each request.
+Under the WSGI servers (gunicorn, the test client) that loop is created for
+the request and closed afterwards. Connections can not outlive their loop,
+so those requests use an unpooled engine. Under the ASGI adapter
+(`src.asgi`) every async view runs on the server's event loop, which is
+attached here, and the engine keeps a pool configured by
+`ASYNC_SQLALCHEMY_ENGINE_OPTIONS`.
+"""
+import asyncio
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from src.pool import configure_connection
+
+
+# Async driver used for each database backend
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url):
+    """Return `url` with the async driver of its backend, e.g. 'sqlite:///app.db' -> 'sqlite+aiosqlite:///app.db'."""
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS.values():
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver is configured for the {backend!r} database backend')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase(object):
+    """Flask extension providing SQLAlchemy `AsyncSession`s to async views."""
+
+    def __init__(self, app=None):
+        self.url = None
+        self.engine_options = {}
+        self.config = {}
+        self.event_loop = None
+        self._pooled_engine = None
+        self._unpooled_engine = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.url = async_database_url(app.config['ASYNC_DATABASE_URI'] or app.config['SQLALCHEMY_DATABASE_URI'])
+        self.engine_options = dict(app.config['ASYNC_SQLALCHEMY_ENGINE_OPTIONS'])
+        self.config = app.config
+        # Engines are created on first use, so the async drivers are only needed by the async views
+        self.event_loop = None
+        self._pooled_engine = None
+        self._unpooled_engine = None
+        app.extensions['async_db'] = self
+
+    def attach(self, loop):
+        """Pool connections on `loop`, the long-lived event loop of an ASGI server."""
+        self.event_loop = loop
+
+    async def detach(self):
+        """Close the pooled connections, e.g. when the ASGI server shuts down."""
+        engine, self._pooled_engine, self.event_loop = self._pooled_engine, None, None
+        if engine is not None:
+            await engine.dispose()
+
+    @property
+    def engine(self):
+        """Return the engine usable on the running event loop."""
+        if self.event_loop is not None and asyncio.get_running_loop() is self.event_loop:
+            if self._pooled_engine is None:
+                # Explicit pool class: SQLite in-memory URLs would otherwise get a StaticPool
+                self._pooled_engine = self.create_engine(**{'poolclass': AsyncAdaptedQueuePool, **self.engine_options})
+            return self._pooled_engine
+
+        if self._unpooled_engine is None:
+            self._unpooled_engine = self.create_engine(poolclass=NullPool)
+        return self._unpooled_engine
+
+    def create_engine(self, **options):
+        engine = create_async_engine(self.url, **options)
+        # Same per-connection settings (e.g. SQLite pragmas) as the synchronous engine
+        configure_connection(engine.sync_engine, self.config)
+        return engine
+
+    def session(self) -> AsyncSession:
+        """Return a new session, to be used as an async context manager."""
+        return AsyncSession(self.engine, expire_on_commit=False)
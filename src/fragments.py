@@ -0,0 +1,241 @@
+"""
+Fragment cache for rendered Jinja templates.
+
+Expensive parts of a template are wrapped in a `cache` block whose key is a
+fragment name, a scope (typically the id of a freelancer or package) and any
+number of version values:
+
+    {% cache 'profile-summary', current_user.id, packages_version %}
+        ...
+    {% endcache %}
+
+On a hit the stored HTML is emitted without evaluating the block, so any
+query made inside the block is skipped as well. Because the keys carry the
+data version, a fragment is never served once its data has changed; the
+explicit `invalidate(name, scope)` hooks (wired to package changes in
+`src.models`) additionally free the stale entries right away.
+
+The storage is pluggable through `FRAGMENT_CACHE_BACKEND`:
+    * 'memory' - bounded in-process LRU/TTL cache (default)
+    * 'file' - one file per fragment under `FRAGMENT_CACHE_DIR`, shared by every worker process
+    * dotted import path of a `FragmentStore` subclass
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from werkzeug.utils import import_string
+
+from src.cache import TTLCache
+from src.metrics import Counter
+
+
+def fragment_key(name: str, parts) -> tuple:
+    """Return the (name, scope, digest) key of a fragment; the scope is its first key part."""
+    scope = str(parts[0]) if parts else ''
+    digest = hashlib.sha1(repr(tuple(parts)).encode()).hexdigest()
+    return name, scope, digest
+
+
+# ------
+# Stores
+# ------
+
+class FragmentStore(object):
+    """Interface that fragment storage backends implement."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, key: tuple):
+        """Return the HTML stored under `key`, or None."""
+        raise NotImplementedError
+
+    def set(self, key: tuple, html: str):
+        """Store `html` under `key`."""
+        raise NotImplementedError
+
+    def delete_scope(self, name: str, scope: str = None):
+        """Remove the fragments `name` of `scope` (or of every scope)."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove every fragment."""
+        raise NotImplementedError
+
+
+class MemoryFragmentStore(FragmentStore):
+    """Bounded in-process LRU cache with a time-to-live."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._cache = TTLCache(maxsize=app.config['FRAGMENT_CACHE_MAX_SIZE'], ttl=app.config['FRAGMENT_CACHE_TTL'])
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, html):
+        self._cache.set(key, html)
+
+    def delete_scope(self, name, scope=None):
+        self._cache.delete_where(lambda key: key[0] == name and (scope is None or key[1] == scope))
+
+    def clear(self):
+        self._cache.clear()
+
+
+class FileFragmentStore(FragmentStore):
+    """
+    Fragments stored as files under `FRAGMENT_CACHE_DIR/<name>/<scope hash>/`,
+    expiring `FRAGMENT_CACHE_TTL` seconds after they were written.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.directory = app.config['FRAGMENT_CACHE_DIR']
+        self.ttl = app.config['FRAGMENT_CACHE_TTL']
+
+    def _scope_directory(self, name, scope):
+        return os.path.join(self.directory, name, hashlib.sha1(scope.encode()).hexdigest()[:16])
+
+    def _path(self, key):
+        name, scope, digest = key
+        return os.path.join(self._scope_directory(name, scope), f'{digest}.html')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if os.stat(path).st_mtime + self.ttl < time.time():
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, html):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial fragment
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(temporary_path, path)
+
+    def delete_scope(self, name, scope=None):
+        directory = os.path.join(self.directory, name) if scope is None else self._scope_directory(name, scope)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+BACKENDS = {
+    'memory': MemoryFragmentStore,
+    'file': FileFragmentStore,
+}
+
+
+# ---------------
+# Jinja Extension
+# ---------------
+
+class FragmentCacheExtension(Extension):
+    """Adds the `{% cache name, scope, version... %}...{% endcache %}` tag."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render_fragment', [parts[0], nodes.List(parts[1:])])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, name, parts, caller):
+        fragment_cache = getattr(self.environment, 'fragment_cache', None)
+        if fragment_cache is None:
+            return caller()
+        return Markup(fragment_cache.fetch(name, parts, caller))
+
+
+# ---------
+# Extension
+# ---------
+
+class FragmentCache(object):
+    """Flask extension storing rendered template fragments."""
+
+    def __init__(self, app=None):
+        self.store = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._hit_counter = None
+        self._miss_counter = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.store = None
+        if app.config['FRAGMENT_CACHE_ENABLED']:
+            backend = app.config['FRAGMENT_CACHE_BACKEND']
+            store_class = BACKENDS[backend] if backend in BACKENDS else import_string(backend)
+            self.store = store_class(app)
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+        metrics = app.extensions.get('metrics')
+        if metrics is not None and self._hit_counter is None:
+            self._hit_counter = Counter(metrics.registry, 'jinja_fragment_cache_hits',
+                                        'Number of template fragments served from the fragment cache.', ('fragment',))
+            self._miss_counter = Counter(metrics.registry, 'jinja_fragment_cache_misses',
+                                         'Number of template fragments rendered on a fragment cache miss.',
+                                         ('fragment',))
+        app.extensions['fragment_cache'] = self
+
+    def fetch(self, name: str, parts, render) -> str:
+        """Return the fragment `name` for the key `parts`, calling `render()` on a miss."""
+        if self.store is None:
+            return render()
+
+        key = fragment_key(name, parts)
+        html = self.store.get(key)
+        hit = html is not None
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        counter = self._hit_counter if hit else self._miss_counter
+        if counter is not None:
+            counter.inc((name,))
+
+        if not hit:
+            html = str(render())
+            self.store.set(key, html)
+        return html
+
+    def invalidate(self, name: str, scope=None):
+        """Forget the fragments `name` rendered for `scope` (e.g. a freelancer id), or for every scope."""
+        if self.store is not None:
+            self.store.delete_scope(name, None if scope is None else str(scope))
+
+    def clear(self):
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self):
+        """Return the hit/miss counters and hit ratio of the fragment cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'enabled': self.store is not None, 'hits': self.hits, 'misses': self.misses,
+                    'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0}
@@ -8,4 +8,4 @@ from flask import Blueprint
 
 freelancers_blueprint = Blueprint('freelancers', __name__, template_folder='templates')
 
-from . import routes
+from . import routes, tasks
@@ -1,12 +1,14 @@
 import os
 
-import sqlalchemy as sqla
-from flask import (current_app, flash, redirect, render_template, request,url_for)
+from flask import (current_app, flash, jsonify, redirect, render_template, request, url_for)
 from flask_login import current_user, login_required, login_user, logout_user
 from sqlalchemy.exc import IntegrityError
 
-from src import db
+from src import database_pool, db, fragment_cache, health, http_cache, identity_cache, password_hasher
+from src.jobs import enqueue
 from src.models import Freelancer
+from src.replica import use_primary
+from src.stats import package_statistics
 
 from . import freelancers_blueprint
 from .forms import LoginForm, RegisterForm
@@ -15,10 +17,19 @@ from .forms import LoginForm, RegisterForm
 @freelancers_blueprint.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    return render_template('freelancers/profile.html')
+    version, updated_at = db.session.execute(
+        db.select(Freelancer.packages_version, Freelancer.packages_updated_at).where(Freelancer.id == current_user.id)
+    ).one()
+    # The statistics are only computed when the cached profile summary fragment is stale
+    return http_cache.conditional(
+        lambda: render_template('freelancers/profile.html', packages_version=version,
+                                load_stats=lambda: package_statistics(current_user.id)),
+        'profile', current_user.id, current_user.email, version, last_modified=updated_at
+    )
 
 
 @freelancers_blueprint.route('/register', methods=['GET', 'POST'])
+@use_primary
 def register():
     # If the User is already logged in, don't allow them to try to register
     if current_user.is_authenticated:
@@ -30,6 +41,9 @@ def register():
         try:
             new_user = Freelancer('Freelancer Name', form.email.data, form.password.data)
             db.session.add(new_user)
+            db.session.flush()
+            enqueue('freelancers.registered', {'freelancer_id': new_user.id, 'email': new_user.email},
+                    idempotency_key=f'freelancer-registered:{new_user.id}:{new_user.created_at}')
             db.session.commit()
 
             login_user(new_user)
@@ -70,6 +84,7 @@ def login():
 @freelancers_blueprint.route('/logout')
 @login_required
 def logout():
+    identity_cache.invalidate(current_user.id)
     logout_user()
     flash('Goodbye!')
     return redirect(url_for('packages.index'))
@@ -77,11 +92,9 @@ def logout():
 
 @freelancers_blueprint.route('/status')
 def status():
-    # Check if the database needs to be initialized
-    engine = sqla.create_engine(current_app.config['SQLALCHEMY_DATABASE_URI'])
-    inspector = sqla.inspect(engine)
-    users_table_created = inspector.has_table("freelancers")
-    books_table_created = inspector.has_table("packages")
+    # Check if the database needs to be initialized (cached, see `src.health`)
+    users_table_created = health.table_exists("freelancers")
+    books_table_created = health.table_exists("packages")
     database_created = users_table_created and books_table_created
 
     return render_template(
@@ -91,3 +104,20 @@ def status():
         database_users_table_status=users_table_created,
         database_books_table_status=books_table_created
     )
+
+
+@freelancers_blueprint.route('/status/live')
+def status_live():
+    return jsonify(health.liveness())
+
+
+@freelancers_blueprint.route('/status/ready')
+def status_ready():
+    result = health.readiness()
+    result['identity_cache'] = identity_cache.stats()
+    result['password_hasher'] = password_hasher.stats()
+    result['fragment_cache'] = fragment_cache.stats()
+    result['database_pool'] = database_pool.stats()
+    if 'log_queue_handler' in current_app.extensions:
+        result['logging'] = current_app.extensions['log_queue_handler'].stats()
+    return jsonify(result), 200 if result['status'] == 'ok' else 503
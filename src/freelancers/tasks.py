@@ -0,0 +1,11 @@
+"""
+Background jobs of the freelancer views (see `src.jobs`).
+"""
+from flask import current_app
+
+from src import job_queue
+
+
+@job_queue.task('freelancers.registered')
+def log_registration(payload):
+    current_app.logger.info(f"Freelancer {payload['freelancer_id']} registered with {payload['email']}!")
@@ -0,0 +1,170 @@
+"""
+Password hashing policy.
+
+The hashing method and work factor come from `PASSWORD_HASH_METHOD` and
+`PASSWORD_SALT_LENGTH` in the configuration, using the werkzeug method
+syntax (e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'). Hashes created
+with an older policy are detected by `needs_rehash` so they can be upgraded
+the next time the password is verified.
+
+Hashing is CPU-bound, so `PasswordHasher` runs it in a bounded process pool
+(`PASSWORD_HASH_WORKERS`). At most `PASSWORD_HASH_QUEUE_LIMIT` operations may
+wait for a free worker; beyond that `HashingQueueFull` is raised and answered
+with a fast 503 instead of letting requests pile up behind the hashing.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app, has_app_context, jsonify
+from werkzeug.security import (DEFAULT_PBKDF2_ITERATIONS, check_password_hash,
+                               generate_password_hash)
+
+
+DEFAULT_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+DEFAULT_SALT_LENGTH = 16
+
+
+def normalize_method(method: str) -> str:
+    """Expand a werkzeug method string to the fully specified form stored in the hash."""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        hash_name = parts[1] if len(parts) > 1 else 'sha256'
+        iterations = parts[2] if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    if parts[0] == 'scrypt':
+        defaults = ['32768', '8', '1']
+        return ':'.join(['scrypt'] + parts[1:4] + defaults[len(parts[1:4]):])
+    return method
+
+
+def current_policy():
+    """Return the (method, salt_length) hashing policy of the current application."""
+    if has_app_context():
+        return (normalize_method(current_app.config['PASSWORD_HASH_METHOD']),
+                current_app.config['PASSWORD_SALT_LENGTH'])
+    return DEFAULT_METHOD, DEFAULT_SALT_LENGTH
+
+
+def hash_password(password_plaintext: str, policy=None) -> str:
+    """Hash `password_plaintext` with `policy` (defaults to the current policy)."""
+    method, salt_length = policy or current_policy()
+    return generate_password_hash(password_plaintext, method=method, salt_length=salt_length)
+
+
+def verify_password(password_hashed: str, password_plaintext: str) -> bool:
+    """Check `password_plaintext` against `password_hashed`."""
+    return check_password_hash(password_hashed, password_plaintext)
+
+
+def needs_rehash(password_hashed: str, policy=None) -> bool:
+    """Return whether `password_hashed` was created with a different policy than `policy`."""
+    method, salt_length = policy or current_policy()
+    try:
+        hash_method, salt, _ = password_hashed.split('$', 2)
+    except ValueError:
+        return True
+    return normalize_method(hash_method) != method or len(salt) != salt_length
+
+
+class HashingQueueFull(Exception):
+    """Raised when too many password hashing operations are already queued."""
+
+
+class PasswordHasher(object):
+    """Flask extension running password hashing in a bounded worker pool."""
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = None
+        self._metrics_lock = threading.Lock()
+        self.reset_metrics()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1) + app.config['PASSWORD_HASH_QUEUE_LIMIT'])
+        self.reset_metrics()
+        app.extensions['password_hasher'] = self
+
+        @app.errorhandler(HashingQueueFull)
+        def handle_hashing_queue_full(e):
+            app.logger.warning('Password hashing queue is full, rejecting request')
+            response = jsonify(error='Service Unavailable',
+                               description='Too many login requests are being processed, please retry shortly.')
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self.queue_depth = 0
+            self.max_queue_depth = 0
+            self.rejected = 0
+            self.completed = 0
+            self.total_latency = 0.0
+            self.max_latency = 0.0
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _get_executor(self):
+        # Created lazily so that the pool is never inherited by forked worker processes
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _run(self, function, *args):
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            with self._metrics_lock:
+                self.rejected += 1
+            raise HashingQueueFull()
+
+        with self._metrics_lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        start = time.perf_counter()
+        try:
+            if self.workers:
+                return self._get_executor().submit(function, *args).result()
+            return function(*args)
+        finally:
+            latency = time.perf_counter() - start
+            if self._slots is not None:
+                self._slots.release()
+            with self._metrics_lock:
+                self.queue_depth -= 1
+                self.completed += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+
+    def hash(self, password_plaintext: str) -> str:
+        """Hash `password_plaintext` with the current policy."""
+        return self._run(hash_password, password_plaintext, current_policy())
+
+    def verify(self, password_hashed: str, password_plaintext: str) -> bool:
+        """Check `password_plaintext` against `password_hashed`."""
+        return self._run(verify_password, password_hashed, password_plaintext)
+
+    def stats(self):
+        """Return the queue depth and hash latency metrics of the pool."""
+        with self._metrics_lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'avg_latency_ms': round(self.total_latency / self.completed * 1000, 3) if self.completed else 0.0,
+                'max_latency_ms': round(self.max_latency * 1000, 3),
+            }
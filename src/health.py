@@ -0,0 +1,68 @@
+"""
+Health and status checks for the application.
+
+Liveness only reports that the process is serving requests and never touches
+the database. Readiness runs a single `SELECT 1` on the primary and reports
+how long it took; with a read replica (`REPLICA_DATABASE_URL`), the replica
+is checked and reported separately, and both must answer. Table existence
+checks used by the status page run on the database the request reads from
+(the replica for GET requests, see `src.replica`), and are cached for
+`HEALTH_TABLE_CACHE_TTL` seconds so that frequent probes do not re-run
+catalog queries.
+"""
+import time
+
+import sqlalchemy as sqla
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from src import db
+from src.cache import TTLCache
+from src.replica import REPLICA_BIND, reads_from_replica
+
+
+table_status_cache = TTLCache(maxsize=64)
+
+
+def table_exists(table_name: str) -> bool:
+    """Return whether `table_name` exists, using the cached result when still fresh."""
+    engine = db.engines[REPLICA_BIND] if reads_from_replica() else db.engine
+    key = (str(engine.url), table_name)
+    exists = table_status_cache.get(key)
+    if exists is None:
+        exists = sqla.inspect(engine).has_table(table_name)
+        table_status_cache.set(key, exists, ttl=current_app.config['HEALTH_TABLE_CACHE_TTL'])
+    return exists
+
+
+def invalidate_table_status():
+    """Forget cached table existence results (e.g. after the schema is recreated)."""
+    table_status_cache.clear()
+
+
+def liveness():
+    """Return the liveness status of the process without touching the database."""
+    return {'status': 'ok'}
+
+
+def check_database(engine, name: str) -> dict:
+    """Run `SELECT 1` with `engine` and return whether it answered, and its latency."""
+    start = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(sqla.text('SELECT 1'))
+        available = True
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f'Readiness check of the {name} database failed: {e}')
+        available = False
+    return {'database': available, 'latency_ms': round((time.perf_counter() - start) * 1000, 3)}
+
+
+def readiness():
+    """Check the primary database (and the replica if any) and return the status and latencies."""
+    result = check_database(db.engine, 'primary')
+    available = result['database']
+    if REPLICA_BIND in db.engines:
+        result['replica'] = check_database(db.engines[REPLICA_BIND], 'replica')
+        available = available and result['replica']['database']
+    return dict(status='ok' if available else 'unavailable', **result)
@@ -0,0 +1,129 @@
+"""
+HTTP caching of pages and static assets.
+
+Pages: `HttpCache.conditional` derives a strong ETag from a cheap version key
+(for instance the freelancer's `packages_version` counter) and answers a
+matching `If-None-Match` with `304 Not Modified` before the page is
+rendered, so no package rows are loaded. The ETag also covers the request
+URL and a build id hashed from the templates, so a deploy with changed
+templates invalidates every cached page. `Last-Modified` is only sent as
+information: a date can tell neither the viewers nor the deploys apart, and
+every cached page is per-user, so `If-Modified-Since` is never answered on its
+own. Pages with pending flash messages are always rendered because rendering
+consumes them.
+
+Static assets: `url_for('static', ...)` adds a `v=<content hash>` query
+argument, and versioned static responses are served with a far-future
+`Cache-Control: public, max-age=..., immutable` header.
+"""
+import hashlib
+import os
+import threading
+
+from flask import current_app, make_response, request, session
+
+
+def file_digest(path: str, length: int = 12) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def directory_digest(path: str) -> str:
+    """Return a digest of the names and contents of every file under `path`."""
+    digest = hashlib.sha1()
+    for directory, subdirectories, filenames in sorted(os.walk(path)):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            file_path = os.path.join(directory, filename)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(file_digest(file_path).encode())
+    return digest.hexdigest()[:12]
+
+
+class HttpCache(object):
+    """Flask extension adding conditional GET support and content-hashed static URLs."""
+
+    def __init__(self, app=None):
+        self.build_id = ''
+        self._static_hashes = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.build_id = directory_digest(os.path.join(app.root_path, app.template_folder))
+        self._static_hashes = {}
+        app.url_defaults(self.add_static_version)
+        app.after_request(self.cache_static_files)
+        app.extensions['http_cache'] = self
+
+    # ------------
+    # Static Files
+    # ------------
+
+    def static_version(self, filename: str):
+        """Return the content hash of a static file, or None if it does not exist."""
+        path = os.path.join(current_app.static_folder, filename)
+        try:
+            modified = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        # Re-hashed only when the file changes (e.g. in development)
+        with self._lock:
+            cached = self._static_hashes.get(path)
+        if cached is None or cached[0] != modified:
+            cached = (modified, file_digest(path))
+            with self._lock:
+                self._static_hashes[path] = cached
+        return cached[1]
+
+    def add_static_version(self, endpoint, values):
+        if endpoint == 'static' and 'v' not in values and current_app.config['STATIC_VERSIONED_URLS']:
+            version = self.static_version(values.get('filename', ''))
+            if version is not None:
+                values['v'] = version
+
+    @staticmethod
+    def cache_static_files(response):
+        if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['STATIC_MAX_AGE']
+            response.cache_control.immutable = True
+            response.expires = None
+        return response
+
+    # -----
+    # Pages
+    # -----
+
+    def etag(self, *key) -> str:
+        """Return the ETag of the current URL for the version `key`."""
+        value = ':'.join(str(part) for part in (self.build_id, request.full_path) + key)
+        return hashlib.sha1(value.encode()).hexdigest()
+
+    def conditional(self, render, *key, last_modified=None):
+        """
+        Return `304 Not Modified` if the client's cached copy matches the version
+        `key`, otherwise call `render` and return its response with the ETag
+        (and `last_modified`, as information) attached.
+        """
+        if (not current_app.config['HTTP_CACHE_ENABLED'] or request.method not in ('GET', 'HEAD')
+                or session.get('_flashes')):
+            return render()
+
+        etag = self.etag(*key)
+        not_modified = request.if_none_match.contains_weak(etag)
+
+        response = current_app.response_class(status=304) if not_modified else make_response(render())
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Per-user pages: browsers may store them but must revalidate every time
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
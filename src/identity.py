@@ -0,0 +1,184 @@
+"""
+Identity cache used by the Flask-Login `user_loader`.
+
+Instead of querying the `freelancers` table on every authenticated request,
+a lightweight `FreelancerIdentity` snapshot is cached by id. The storage is
+pluggable through `IDENTITY_CACHE_BACKEND`:
+    * 'memory' - bounded in-process LRU/TTL cache (default)
+    * 'redis' - shared cache in Redis (requires the `redis` package)
+    * dotted import path of an `IdentityCacheBackend` subclass
+"""
+import json
+from datetime import datetime
+
+from flask_login import UserMixin
+from werkzeug.utils import import_string
+
+from src.cache import TTLCache
+
+
+class FreelancerIdentity(UserMixin):
+    """
+    Detached snapshot of the fields of a `Freelancer` needed to identify the
+    logged in user. It never holds the password hash.
+    """
+
+    def __init__(self, id: int, full_name: str, email: str, created_at: datetime):
+        self.id = id
+        self.full_name = full_name
+        self.email = email
+        self.created_at = created_at
+
+    @classmethod
+    def from_freelancer(cls, freelancer):
+        return cls(freelancer.id, freelancer.full_name, freelancer.email, freelancer.created_at)
+
+    def to_dict(self):
+        return {'id': self.id, 'full_name': self.full_name, 'email': self.email,
+                'created_at': self.created_at.isoformat() if self.created_at else None}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        created_at = datetime.fromisoformat(data['created_at']) if data['created_at'] else None
+        return cls(data['id'], data['full_name'], data['email'], created_at)
+
+    def __repr__(self):
+        return f'<Freelancer: {self.email}>'
+
+
+# --------
+# Backends
+# --------
+
+class IdentityCacheBackend(object):
+    """Interface that identity cache storage backends implement."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, user_id: int):
+        """Return the cached `FreelancerIdentity` for `user_id`, or None."""
+        raise NotImplementedError
+
+    def set(self, user_id: int, identity: FreelancerIdentity):
+        """Cache `identity` for `user_id`."""
+        raise NotImplementedError
+
+    def delete(self, user_id: int):
+        """Remove the cached identity for `user_id`."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove every cached identity."""
+        raise NotImplementedError
+
+
+class MemoryIdentityBackend(IdentityCacheBackend):
+    """Bounded in-process LRU cache with a time-to-live."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._cache = TTLCache(maxsize=app.config['IDENTITY_CACHE_MAX_SIZE'],
+                               ttl=app.config['IDENTITY_CACHE_TTL'])
+
+    def get(self, user_id):
+        return self._cache.get(user_id)
+
+    def set(self, user_id, identity):
+        self._cache.set(user_id, identity)
+
+    def delete(self, user_id):
+        self._cache.delete(user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class RedisIdentityBackend(IdentityCacheBackend):
+    """Cache shared by every worker process, stored as JSON in Redis."""
+
+    key_prefix = 'freelancer-identity:'
+
+    def __init__(self, app):
+        super().__init__(app)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("IDENTITY_CACHE_BACKEND 'redis' requires the `redis` package to be installed")
+        self._client = redis.Redis.from_url(app.config['IDENTITY_CACHE_REDIS_URL'])
+        self._ttl = app.config['IDENTITY_CACHE_TTL']
+
+    def get(self, user_id):
+        data = self._client.get(f'{self.key_prefix}{user_id}')
+        return FreelancerIdentity.from_dict(json.loads(data)) if data else None
+
+    def set(self, user_id, identity):
+        self._client.set(f'{self.key_prefix}{user_id}', json.dumps(identity.to_dict()), ex=self._ttl)
+
+    def delete(self, user_id):
+        self._client.delete(f'{self.key_prefix}{user_id}')
+
+    def clear(self):
+        keys = list(self._client.scan_iter(f'{self.key_prefix}*'))
+        if keys:
+            self._client.delete(*keys)
+
+
+BACKENDS = {
+    'memory': MemoryIdentityBackend,
+    'redis': RedisIdentityBackend,
+}
+
+
+# ---------
+# Extension
+# ---------
+
+class IdentityCache(object):
+    """Flask extension caching `FreelancerIdentity` snapshots for the `user_loader`."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = None
+        if app.config['IDENTITY_CACHE_ENABLED']:
+            backend = app.config['IDENTITY_CACHE_BACKEND']
+            backend_class = BACKENDS[backend] if backend in BACKENDS else import_string(backend)
+            self.backend = backend_class(app)
+        app.extensions['identity_cache'] = self
+
+    def load(self, user_id: int, loader):
+        """Return the identity for `user_id`, calling `loader(user_id)` on a cache miss."""
+        if self.backend is None:
+            return loader(user_id)
+
+        identity = self.backend.get(user_id)
+        if identity is not None:
+            self.hits += 1
+            return identity
+
+        self.misses += 1
+        identity = loader(user_id)
+        if identity is not None:
+            self.backend.set(user_id, identity)
+        return identity
+
+    def invalidate(self, user_id: int):
+        """Forget the cached identity for `user_id` (e.g. password change, logout, deletion)."""
+        if self.backend is not None and user_id is not None:
+            self.backend.delete(int(user_id))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """Return the hit/miss counters; each hit is a query saved by the cache."""
+        lookups = self.hits + self.misses
+        return {'enabled': self.backend is not None, 'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,114 @@
+"""
+Opt-in, per-request SQL instrumentation.
+
+When `SQL_INSTRUMENTATION_ENABLED` is set, every statement executed while
+handling a request is counted and timed through SQLAlchemy engine events.
+At the end of the request the query count, total database time and slowest
+statement are added to the `Server-Timing` header and logged. Statements
+repeated at least `SQL_N_PLUS_ONE_THRESHOLD` times in one request (typically
+lazy loads of `Package.freelancer_relationship` or
+`Freelancer.packages_relationship` inside a loop) are flagged as N+1 queries.
+"""
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestQueryStats(object):
+    """Statistics of the SQL statements executed during one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.statements[statement] += 1
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+    def repeated_statements(self, threshold: int):
+        """Return (statement, count) pairs executed at least `threshold` times."""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def to_dict(self):
+        return {
+            'queries': self.count,
+            'db_time_ms': round(self.total_time * 1000, 3),
+            'slowest_ms': round(self.slowest_time * 1000, 3),
+            'slowest_statement': self.slowest_statement,
+        }
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g and conn.info.get('query_start_time'):
+        g.sql_stats.record(statement, time.perf_counter() - conn.info['query_start_time'].pop())
+
+
+def handle_error(exception_context):
+    # Failed statements never reach `after_cursor_execute`, so drop their start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start_time'):
+        connection.info['query_start_time'].pop()
+
+
+class QueryInstrumentation(object):
+    """Flask extension recording SQL statistics per request."""
+
+    def __init__(self, app=None):
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not self._listening:
+            # Listening on the Engine class covers the primary engine and any binds
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(Engine, 'handle_error', handle_error)
+            self._listening = True
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.extensions['query_instrumentation'] = self
+
+    @staticmethod
+    def start_request():
+        if current_app.config['SQL_INSTRUMENTATION_ENABLED']:
+            g.sql_stats = RequestQueryStats()
+
+    @staticmethod
+    def finish_request(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        response.headers.add('Server-Timing',
+                             f'db;dur={stats.total_time * 1000:.3f};desc="{stats.count} queries"')
+
+        summary = stats.to_dict()
+        current_app.logger.info(
+            f"SQL for {request.endpoint}: {summary['queries']} queries in {summary['db_time_ms']}ms "
+            f"(slowest {summary['slowest_ms']}ms)",
+            extra={'endpoint': request.endpoint, 'sql': summary}
+        )
+
+        for statement, count in stats.repeated_statements(current_app.config['SQL_N_PLUS_ONE_THRESHOLD']):
+            current_app.logger.warning(
+                f'Possible N+1 query in {request.endpoint}: statement executed {count} times: {statement}',
+                extra={'endpoint': request.endpoint, 'n_plus_one': {'statement': statement, 'count': count}}
+            )
+        return response
@@ -0,0 +1,291 @@
+"""
+Durable background jobs for the slow side effects of requests.
+
+Jobs are rows of the `jobs` table in the application database. A view
+enqueues its jobs in the same transaction as its own write, so a job exists
+exactly when the write was committed, and the view returns as soon as the
+commit is done:
+
+    db.session.add(package)
+    db.session.flush()
+    enqueue('packages.log_change', {'action': 'added', ...},
+            idempotency_key=f'package-added:{package.id}:{package.updated_at}')
+    db.session.commit()
+
+`flask worker` runs the jobs with a pool of `JOB_WORKER_CONCURRENCY` threads
+or processes (`JOB_WORKER_POOL`):
+    * due jobs are claimed with a single UPDATE (with `FOR UPDATE SKIP LOCKED`
+      on PostgreSQL), so concurrent workers never claim the same job
+    * a failing job is retried after `JOB_RETRY_BACKOFF * 2 ** (attempts - 1)`
+      seconds (at most `JOB_RETRY_BACKOFF_MAX`), until it was attempted
+      `max_attempts` times; it is then marked as 'failed'
+    * a job still 'running' after `JOB_LOCK_TIMEOUT` seconds (its worker died)
+      is claimed again
+    * a job enqueued with an idempotency key is only enqueued once: enqueueing
+      the same key again does nothing
+    * done and failed jobs are deleted `JOB_RETENTION` seconds after they
+      finished (checked every `JOB_PRUNE_INTERVAL` seconds, or once with
+      `flask worker --prune`)
+
+Tasks are registered with the `job_queue.task` decorator and receive the
+payload of the job, within an application context:
+
+    @job_queue.task('packages.log_change')
+    def log_package_change(payload):
+        ...
+
+A job can run more than once (e.g. when its worker dies before recording
+the result), so tasks must be idempotent.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_
+
+
+class Task(object):
+    """Function registered to run the jobs of a given name."""
+
+    def __init__(self, name: str, function, max_attempts: int = None):
+        self.name = name
+        self.function = function
+        self.max_attempts = max_attempts
+
+
+class JobQueue(object):
+    """Flask extension holding the tasks that run the background jobs."""
+
+    def __init__(self, app=None):
+        self.tasks = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['job_queue'] = self
+
+    def task(self, name: str, max_attempts: int = None):
+        """Decorator registering the function running the jobs named `name`."""
+        def decorator(function):
+            self.tasks[name] = Task(name, function, max_attempts)
+            return function
+        return decorator
+
+
+def retry_delay(attempts: int, config) -> float:
+    """Return the delay in seconds before retrying a job that failed `attempts` times."""
+    return min(config['JOB_RETRY_BACKOFF'] * 2 ** (attempts - 1), config['JOB_RETRY_BACKOFF_MAX'])
+
+
+def enqueue(name: str, payload=None, idempotency_key: str = None, delay: float = 0, max_attempts: int = None,
+            connection=None):
+    """
+    Add a job running the task `name` with `payload` to the transaction of
+    `connection` (by default `db.session`); it is queued when that transaction commits.
+    """
+    from src import db, job_queue
+    from src.models import Job, utcnow
+
+    task = job_queue.tasks.get(name)
+    if task is None:
+        raise ValueError(f'No task is registered as {name!r}')
+
+    bind = connection if connection is not None else db.session
+    dialect = connection.dialect if connection is not None else db.session.get_bind().dialect
+    if dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    now = utcnow()
+    statement = insert(Job).values(
+        name=name, payload=payload, idempotency_key=idempotency_key, status='pending', attempts=0,
+        max_attempts=max_attempts or task.max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=now + timedelta(seconds=delay), created_at=now,
+    )
+    if idempotency_key is not None:
+        statement = statement.on_conflict_do_nothing(index_elements=[Job.idempotency_key])
+    bind.execute(statement)
+
+
+# ------
+# Worker
+# ------
+
+# Application of a worker process of the process pool
+process_app = None
+
+
+def initialize_process():
+    global process_app
+    from src import create_app
+
+    process_app = create_app()
+
+
+def run_task(name: str, payload, app=None):
+    """Run the task `name` with `payload` in a pool thread (with `app`) or a pool process."""
+    from src import job_queue
+
+    with (app or process_app).app_context():
+        job_queue.tasks[name].function(payload)
+
+
+class Worker(object):
+    """Claims the due jobs and runs them with a pool of threads or processes."""
+
+    def __init__(self, app, concurrency: int = None, pool: str = None, poll_interval: float = None):
+        self.app = app
+        self.concurrency = concurrency or app.config['JOB_WORKER_CONCURRENCY']
+        self.pool = pool or app.config['JOB_WORKER_POOL']
+        self.poll_interval = poll_interval if poll_interval is not None else app.config['JOB_POLL_INTERVAL']
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{id(self):x}'
+        self.stopping = threading.Event()
+        self.completed = 0
+        self.failed = 0
+        self.pruned_at = None
+
+    def claimable(self, now):
+        from src.models import Job
+
+        stale = now - timedelta(seconds=self.app.config['JOB_LOCK_TIMEOUT'])
+        return or_(and_(Job.status == 'pending', Job.run_at <= now),
+                   and_(Job.status == 'running', Job.locked_at < stale))
+
+    def claim(self, limit: int):
+        """Mark up to `limit` due jobs as running by this worker and return them."""
+        from src import db
+        from src.models import Job, utcnow
+
+        now = utcnow()
+        due = (db.select(Job.id).where(self.claimable(now)).order_by(Job.run_at, Job.id).limit(limit)
+               .with_for_update(skip_locked=True))
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(Job).where(Job.id.in_(due), self.claimable(now))
+                .values(status='running', locked_by=self.name, locked_at=now, attempts=Job.attempts + 1)
+            )
+            return connection.execute(
+                db.select(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+                .where(Job.locked_by == self.name, Job.locked_at == now, Job.status == 'running')
+                .order_by(Job.run_at, Job.id)
+            ).all()
+
+    def finish(self, job, error: BaseException = None):
+        """Record the outcome of `job`: done, retried later or failed."""
+        from src import db
+        from src.models import Job, utcnow
+
+        now = utcnow()
+        if error is None:
+            values = {'status': 'done', 'finished_at': now, 'last_error': None}
+            self.completed += 1
+        elif job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts, self.app.config)
+            values = {'status': 'pending', 'run_at': now + timedelta(seconds=delay), 'last_error': repr(error)}
+            self.app.logger.warning(f'Job {job.id} ({job.name}) failed (attempt {job.attempts} of '
+                                    f'{job.max_attempts}), retrying in {delay:.0f}s: {error!r}')
+        else:
+            values = {'status': 'failed', 'finished_at': now, 'last_error': repr(error)}
+            self.failed += 1
+            self.app.logger.error(f'Job {job.id} ({job.name}) failed after {job.attempts} attempts: {error!r}')
+
+        with db.engine.begin() as connection:
+            # Unless the job was claimed again by another worker in the meantime
+            connection.execute(db.update(Job).where(Job.id == job.id, Job.locked_by == self.name,
+                                                    Job.status == 'running')
+                               .values(locked_by=None, locked_at=None, **values))
+
+    def prune(self) -> int:
+        """Delete the done and failed jobs that finished more than `JOB_RETENTION` seconds ago."""
+        from src import db
+        from src.models import Job, utcnow
+
+        cutoff = utcnow() - timedelta(seconds=self.app.config['JOB_RETENTION'])
+        with db.engine.begin() as connection:
+            deleted = connection.execute(db.delete(Job).where(Job.status.in_(['done', 'failed']),
+                                                              Job.finished_at < cutoff)).rowcount
+        self.pruned_at = time.monotonic()
+        return deleted
+
+    def prune_due(self) -> bool:
+        return self.pruned_at is None or time.monotonic() - self.pruned_at >= self.app.config['JOB_PRUNE_INTERVAL']
+
+    def create_executor(self):
+        if self.pool == 'process':
+            return ProcessPoolExecutor(max_workers=self.concurrency, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=initialize_process)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job-worker')
+
+    def submit(self, executor, job):
+        if self.pool == 'process':
+            return executor.submit(run_task, job.name, job.payload)
+        return executor.submit(run_task, job.name, job.payload, self.app)
+
+    def run(self, burst: bool = False):
+        """Run jobs until `stop` is called, or with `burst` until no job is due."""
+        running = {}
+        with self.create_executor() as executor:
+            while not self.stopping.is_set() or running:
+                if not self.stopping.is_set() and self.prune_due():
+                    with self.app.app_context():
+                        self.prune()
+
+                if not self.stopping.is_set() and len(running) < self.concurrency:
+                    with self.app.app_context():
+                        for job in self.claim(self.concurrency - len(running)):
+                            running[self.submit(executor, job)] = job
+
+                if not running:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                with self.app.app_context():
+                    for future in done:
+                        self.finish(running.pop(future), future.exception())
+
+    def stop(self, *args):
+        """Stop claiming jobs; the running jobs are finished first."""
+        self.stopping.set()
+
+
+@click.command('worker')
+@click.option('--concurrency', type=int, help='Jobs run at the same time (default: JOB_WORKER_CONCURRENCY).')
+@click.option('--pool', type=click.Choice(['thread', 'process']), help='Run the jobs in threads or processes '
+              '(default: JOB_WORKER_POOL).')
+@click.option('--poll-interval', type=float, help='Seconds between polls when no job is due '
+              '(default: JOB_POLL_INTERVAL).')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for new jobs.')
+@click.option('--prune', is_flag=True, help='Only delete the jobs finished more than JOB_RETENTION seconds ago.')
+@with_appcontext
+def worker_command(concurrency, pool, poll_interval, burst, prune):
+    """Run the queued background jobs."""
+    worker = Worker(current_app._get_current_object(), concurrency, pool, poll_interval)
+    if prune:
+        click.echo(f'Deleted {worker.prune()} finished jobs')
+        return
+
+    handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        # Stop gracefully: the running jobs are finished and recorded
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            handlers[signal_number] = signal.signal(signal_number, worker.stop)
+
+    click.echo(f'Worker {worker.name} running jobs in {worker.concurrency} {worker.pool} workers', err=True)
+    try:
+        worker.run(burst=burst)
+    finally:
+        for signal_number, handler in handlers.items():
+            signal.signal(signal_number, handler)
+    click.echo(f'Worker {worker.name} stopped: {worker.completed} jobs done, {worker.failed} failed', err=True)
@@ -0,0 +1,126 @@
+"""
+Non-blocking, structured logging.
+
+Request threads only put log records on a bounded in-memory queue; a
+background `QueueListener` thread formats them as JSON lines and writes them
+to a rotating file. When the queue is full, records are dropped and counted
+instead of blocking the request. INFO records can be sampled with
+`LOG_INFO_SAMPLE_RATE` to keep noisy messages from flooding the log.
+
+A forked child (e.g. a gunicorn worker with `--preload`) does not inherit the
+listener thread, so it gets its own queue and listener right after the fork.
+"""
+import atexit
+import copy
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Attributes present on every LogRecord; anything else was passed in `extra`
+STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format each record as a single JSON object, including any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': f'{record.threadName}-{record.thread}',
+            'message': record.getMessage(),
+            'location': f'{record.filename}:{record.lineno}',
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class InfoSamplingFilter(logging.Filter):
+    """Keep only a `rate` fraction of INFO records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno != logging.INFO or self.rate >= 1.0 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.listener = None
+
+    def prepare(self, record):
+        # Keep the `extra` fields for the JSON formatter, but resolve the message
+        # and traceback now since the record is formatted on another thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start_listener(self, *handlers):
+        """Start a new listener thread writing the records of a new queue to `handlers`."""
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def restart_listener(self):
+        # Only the forking thread survives a fork: replace the listener, and the
+        # queue holding the records of the parent, unless the handler was closed
+        if self.listener is not None:
+            self.start_listener(*self.listener.handlers)
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'dropped': self.dropped}
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+
+def create_queue_handler(target_handler: logging.Handler, queue_size: int, info_sample_rate: float):
+    """
+    Return a `NonBlockingQueueHandler` feeding `target_handler` from a
+    background thread that is already started.
+    """
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(InfoSamplingFilter(info_sample_rate))
+    handler.start_listener(target_handler)
+    atexit.register(handler.close)
+    os.register_at_fork(after_in_child=functools.partial(restart_listener, weakref.ref(handler)))
+    return handler
+
+
+def restart_listener(handler_ref):
+    handler = handler_ref()
+    if handler is not None:
+        handler.restart_listener()
@@ -0,0 +1,165 @@
+"""
+Marketplace-wide browsing of packages across every freelancer.
+
+Listings are filtered by category and minimum rating, sorted by rating or
+recency, and paginated with a keyset cursor. The facet counts (packages per
+category and per rating) are read from the `package_facets` summary table,
+which holds one row per (category, rating) and is updated incrementally by
+`adjust_facets` from the `Package` mapper events and the bulk paths in
+`src.packages.bulk`, so no request ever runs a GROUP BY over `packages`.
+
+Listing pages and facets are cached for `MARKETPLACE_CACHE_TTL` seconds, so
+new packages can take that long to show up.
+"""
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy import bindparam, func, text, tuple_
+
+from src import db
+from src.cache import TTLCache
+
+
+SORT_ORDERS = ('rating', 'recent')
+
+marketplace_cache = TTLCache(maxsize=1024)
+
+
+def facet_key(category, rating):
+    """Return the `package_facets` primary key of a package (the key columns are not nullable)."""
+    return (category or '', rating or 0)
+
+
+# -----------------
+# Facet Maintenance
+# -----------------
+
+def count_facets(connection, ids) -> Counter:
+    """Return the number of packages per (category, rating) among the packages with the given ids."""
+    if not ids:
+        return Counter()
+    rows = connection.execute(
+        text('SELECT category, rating, COUNT(*) FROM packages WHERE id IN :ids GROUP BY category, rating')
+        .bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(ids)}
+    )
+    return Counter({facet_key(category, rating): count for category, rating, count in rows})
+
+
+def adjust_facets(connection, deltas: Counter):
+    """Add `deltas` ({(category, rating): change in package count}) to `package_facets`."""
+    from src.models import PackageFacet
+
+    rows = [{'category': category, 'rating': rating, 'package_count': delta}
+            for (category, rating), delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(PackageFacet)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[PackageFacet.category, PackageFacet.rating],
+        set_={'package_count': PackageFacet.package_count + statement.excluded.package_count}
+    ), rows)
+
+
+def rebuild_facets(connection):
+    """Recompute `package_facets` from scratch with one GROUP BY over `packages`."""
+    connection.execute(text('DELETE FROM package_facets'))
+    connection.execute(text(
+        "INSERT INTO package_facets (category, rating, package_count) "
+        "SELECT COALESCE(category, ''), COALESCE(rating, 0), COUNT(*) FROM packages "
+        "GROUP BY COALESCE(category, ''), COALESCE(rating, 0)"
+    ))
+
+
+# --------
+# Browsing
+# --------
+
+def parse_cursor(after: str, sort: str):
+    """Return the keyset cursor encoded in `after`, raising ValueError if it is malformed."""
+    if sort == 'rating':
+        rating, id = after.split('-', 1)
+        return int(rating), int(id)
+    return int(after)
+
+
+def cached(key, function):
+    key = (str(db.engine.url),) + key
+    value = marketplace_cache.get(key)
+    if value is None:
+        value = function()
+        marketplace_cache.set(key, value, ttl=current_app.config['MARKETPLACE_CACHE_TTL'])
+    return value
+
+
+def browse_packages(category=None, min_rating=None, sort='rating', after=None, per_page=50):
+    """
+    Return one page of packages across all freelancers as a (rows, next_cursor)
+    tuple. Rows are dictionaries so that they can be cached outside of the session.
+    """
+    def query_page():
+        from src.models import Freelancer, Package
+
+        query = db.select(Package.id, Package.package_name, Package.category, Package.rating,
+                          Freelancer.full_name.label('freelancer_name')) \
+            .join(Freelancer, Package.freelancer_id == Freelancer.id)
+        if category:
+            query = query.where(Package.category == category)
+        if min_rating:
+            query = query.where(Package.rating >= min_rating)
+
+        if sort == 'rating':
+            query = query.order_by(Package.rating.desc(), Package.id.desc())
+            if after is not None:
+                query = query.where(tuple_(Package.rating, Package.id) < tuple_(*parse_cursor(after, sort)))
+        else:
+            query = query.order_by(Package.id.desc())
+            if after is not None:
+                query = query.where(Package.id < parse_cursor(after, sort))
+
+        rows = [dict(row._mapping) for row in db.session.execute(query.limit(per_page + 1))]
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            last = rows[-1]
+            next_cursor = f"{last['rating']}-{last['id']}" if sort == 'rating' else str(last['id'])
+        return rows, next_cursor
+
+    return cached(('packages', category, min_rating, sort, after, per_page), query_page)
+
+
+def facet_counts(category=None, min_rating=None):
+    """
+    Return the package counts per category (matching `min_rating`) and per
+    rating (matching `category`) from `package_facets`.
+    """
+    def query_facets():
+        from src.models import PackageFacet
+
+        categories = db.select(PackageFacet.category, func.sum(PackageFacet.package_count).label('total')) \
+            .where(PackageFacet.package_count > 0) \
+            .group_by(PackageFacet.category) \
+            .order_by(db.desc('total'), PackageFacet.category) \
+            .limit(current_app.config['MARKETPLACE_FACET_LIMIT'])
+        if min_rating:
+            categories = categories.where(PackageFacet.rating >= min_rating)
+
+        ratings = db.select(PackageFacet.rating, func.sum(PackageFacet.package_count)) \
+            .where(PackageFacet.package_count > 0) \
+            .group_by(PackageFacet.rating) \
+            .order_by(PackageFacet.rating.desc())
+        if category:
+            ratings = ratings.where(PackageFacet.category == category)
+
+        return {
+            'categories': [(name, int(count)) for name, count in db.session.execute(categories)],
+            'ratings': [(rating, int(count)) for rating, count in db.session.execute(ratings)],
+        }
+
+    return cached(('facets', category, min_rating), query_facets)
@@ -0,0 +1,402 @@
+"""
+In-process metrics registry exposed in the Prometheus text exposition format.
+
+Request latency histograms, request counts by status code and in-flight
+gauges are recorded for every request, labelled by endpoint (e.g.
+`packages.list_packages`), and served at `METRICS_PATH` (default `/metrics`).
+
+When `METRICS_DIR` is set, each process writes its values to its own
+memory-mapped file in that directory and a scrape sums the files of every
+process, so the numbers are correct under gunicorn with several workers.
+The directory must be emptied before the server starts, and the gauges of
+exited workers should be removed from the gunicorn `child_exit` hook:
+
+    def child_exit(server, worker):
+        from src.metrics import mark_process_dead
+        mark_process_dead(worker.pid, os.environ['METRICS_DIR'])
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, request
+
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ------
+# Stores
+# ------
+
+class MemoryDict(object):
+    """Values of a single process kept in a plain dictionary."""
+
+    def __init__(self):
+        self._values = {}
+
+    def add(self, key: str, amount: float):
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key: str, value: float):
+        self._values[key] = value
+
+    def items(self):
+        return list(self._values.items())
+
+
+class MmapedDict(object):
+    """
+    Values of a single process stored in a memory-mapped file so that other
+    processes can read them.
+
+    The file starts with the number of bytes used (4 bytes, padded to 8),
+    followed by entries made of the key length (4 bytes), the UTF-8 key padded
+    so the value is 8-byte aligned, and the value as a double.
+    """
+
+    initial_size = 1 << 16
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(self.initial_size)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._positions = {}
+
+        self._used = struct.unpack_from('<i', self._map, 0)[0]
+        if self._used == 0:
+            self._used = 8
+            struct.pack_into('<i', self._map, 0, self._used)
+        else:
+            for key, _, position in self._read_entries(self._map, self._used):
+                self._positions[key] = position
+
+    @staticmethod
+    def _read_entries(data, used: int):
+        position = 8
+        while position < used:
+            length = struct.unpack_from('<i', data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+            position += 4 + length + (8 - (4 + length) % 8) % 8
+            yield key, struct.unpack_from('<d', data, position)[0], position
+            position += 8
+
+    @classmethod
+    def read_file(cls, filename: str):
+        """Return the (key, value) pairs stored in `filename` without mapping it."""
+        with open(filename, 'rb') as f:
+            data = f.read()
+        used = struct.unpack_from('<i', data, 0)[0] if len(data) >= 8 else 0
+        return [(key, value) for key, value, _ in cls._read_entries(data, used)]
+
+    def _position(self, key: str) -> int:
+        position = self._positions.get(key)
+        if position is None:
+            encoded = key.encode('utf-8')
+            padding = b' ' * ((8 - (4 + len(encoded)) % 8) % 8)
+            entry = struct.pack(f'<i{len(encoded) + len(padding)}sd', len(encoded), encoded + padding, 0.0)
+            while self._used + len(entry) > self._capacity:
+                self._capacity *= 2
+                self._file.truncate(self._capacity)
+                self._map.close()
+                self._map = mmap.mmap(self._file.fileno(), self._capacity)
+            self._map[self._used:self._used + len(entry)] = entry
+            # Publish the entry only once it has been fully written
+            self._used += len(entry)
+            struct.pack_into('<i', self._map, 0, self._used)
+            position = self._positions[key] = self._used - 8
+        return position
+
+    def add(self, key: str, amount: float):
+        position = self._position(key)
+        struct.pack_into('<d', self._map, position, struct.unpack_from('<d', self._map, position)[0] + amount)
+
+    def set(self, key: str, value: float):
+        struct.pack_into('<d', self._map, self._position(key), value)
+
+    def items(self):
+        return [(key, value) for key, value, _ in self._read_entries(self._map, self._used)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def mark_process_dead(pid: int, directory: str):
+    """Remove the gauge values of the exited process `pid` from `directory`."""
+    for filename in glob.glob(os.path.join(directory, f'gauges_{pid}.db')):
+        os.remove(filename)
+
+
+# --------
+# Registry
+# --------
+
+class MetricsRegistry(object):
+    """Holds the metric definitions and the value stores of the current process."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.directory = None
+        self.lock = threading.Lock()
+        self._stores = {}
+        os.register_at_fork(after_in_child=self._reset_stores)
+
+    def _reset_stores(self):
+        # A forked worker must write to its own files, not to its parent's
+        self.lock = threading.Lock()
+        self._stores = {}
+
+    def configure(self, directory: str = None):
+        with self.lock:
+            self.directory = directory
+            self._stores = {}
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def store(self, kind: str):
+        """Return the store of this process for 'values' (counters, histograms) or 'gauges'."""
+        store = self._stores.get(kind)
+        if store is None:
+            if self.directory:
+                store = MmapedDict(os.path.join(self.directory, f'{kind}_{os.getpid()}.db'))
+            else:
+                store = MemoryDict()
+            self._stores[kind] = store
+        return store
+
+    def collect_values(self):
+        """Return the values of every process, summed by key."""
+        totals = {}
+        if self.directory:
+            for filename in glob.glob(os.path.join(self.directory, '*.db')):
+                for key, value in MmapedDict.read_file(filename):
+                    totals[key] = totals.get(key, 0.0) + value
+        else:
+            with self.lock:
+                for store in self._stores.values():
+                    for key, value in store.items():
+                        totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def generate_latest(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        samples = {}
+        for key, value in self.collect_values().items():
+            metric_name, sample_name, labels = json.loads(key)
+            samples.setdefault(metric_name, []).append((sample_name, tuple(map(tuple, labels)), value))
+
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.render(samples.get(metric.name, [])))
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                     for name, value in labels)
+    return '{' + pairs + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+# -------
+# Metrics
+# -------
+
+class Metric(object):
+    type = 'untyped'
+    store_kind = 'values'
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        registry.register(self)
+
+    def _key(self, sample_name: str, labelvalues: tuple, extra=()) -> str:
+        cache_key = (sample_name, labelvalues, extra)
+        key = self._keys.get(cache_key)
+        if key is None:
+            labels = list(zip(self.labelnames, labelvalues)) + list(extra)
+            key = self._keys[cache_key] = json.dumps([self.name, sample_name, labels])
+        return key
+
+    def render(self, samples):
+        return [f'{sample_name}{format_labels(labels)} {format_value(value)}'
+                for sample_name, labels, value in sorted(samples)]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labelvalues: tuple = (), amount: float = 1.0):
+        with self.registry.lock:
+            self._inc(labelvalues, amount)
+
+    def _inc(self, labelvalues: tuple, amount: float):
+        # Caller must hold the registry lock
+        self.registry.store(self.store_kind).add(self._key(self.name + '_total', labelvalues), amount)
+
+
+class Gauge(Metric):
+    """Gauge whose value is summed over all live processes."""
+    type = 'gauge'
+    store_kind = 'gauges'
+
+    def inc(self, labelvalues: tuple = (), amount: float = 1.0):
+        with self.registry.lock:
+            self._inc(labelvalues, amount)
+
+    def dec(self, labelvalues: tuple = (), amount: float = 1.0):
+        self.inc(labelvalues, -amount)
+
+    def set(self, value: float, labelvalues: tuple = ()):
+        key = self._key(self.name, labelvalues)
+        with self.registry.lock:
+            self.registry.store(self.store_kind).set(key, value)
+
+    def _inc(self, labelvalues: tuple, amount: float):
+        # Caller must hold the registry lock
+        self.registry.store(self.store_kind).add(self._key(self.name, labelvalues), amount)
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed upper bounds. Buckets are stored non-cumulatively
+    (one write per observation) and accumulated when rendered.
+    """
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.set_buckets(buckets)
+
+    def set_buckets(self, buckets):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets)) + (float('inf'),)
+        self._keys = {}
+        self._observation_keys = {}
+
+    def _keys_for(self, labelvalues: tuple):
+        keys = self._observation_keys.get(labelvalues)
+        if keys is None:
+            bucket_keys = [self._key(f'{self.name}_bucket', labelvalues, (('le', format_value(bound)),))
+                           for bound in self.buckets]
+            keys = self._observation_keys[labelvalues] = (bucket_keys,
+                                                          self._key(f'{self.name}_sum', labelvalues),
+                                                          self._key(f'{self.name}_count', labelvalues))
+        return keys
+
+    def observe(self, value: float, labelvalues: tuple = ()):
+        with self.registry.lock:
+            self._observe(value, labelvalues)
+
+    def _observe(self, value: float, labelvalues: tuple):
+        # Caller must hold the registry lock
+        bucket_keys, sum_key, count_key = self._keys_for(labelvalues)
+        store = self.registry.store(self.store_kind)
+        store.add(bucket_keys[bisect_left(self.buckets, value)], 1.0)
+        store.add(sum_key, value)
+        store.add(count_key, 1.0)
+
+    def render(self, samples):
+        buckets, others = {}, []
+        for sample_name, labels, value in samples:
+            if sample_name.endswith('_bucket'):
+                series = tuple(label for label in labels if label[0] != 'le')
+                le = float(dict(labels)['le'])
+                buckets.setdefault(series, {})[le] = buckets.get(series, {}).get(le, 0.0) + value
+            else:
+                others.append((sample_name, labels, value))
+
+        lines = []
+        for series, counts in sorted(buckets.items()):
+            cumulative = 0.0
+            for bound in self.buckets:
+                cumulative += counts.get(bound, 0.0)
+                labels = series + (('le', format_value(bound)),)
+                lines.append(f'{self.name}_bucket{format_labels(labels)} {format_value(cumulative)}')
+        return lines + super().render(others)
+
+
+# ---------
+# Extension
+# ---------
+
+class Metrics(object):
+    """Flask extension recording request metrics per endpoint and serving `/metrics`."""
+
+    def __init__(self, app=None):
+        self.registry = MetricsRegistry()
+        self.request_latency = Histogram(self.registry, 'flask_request_latency_seconds',
+                                         'Latency of HTTP requests in seconds.', ('endpoint',))
+        self.requests = Counter(self.registry, 'flask_requests',
+                                'Number of HTTP requests by endpoint and status code.', ('endpoint', 'status'))
+        self.in_flight = Gauge(self.registry, 'flask_requests_in_flight',
+                               'Number of HTTP requests currently being handled.', ('endpoint',))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        self.registry.configure(app.config['METRICS_DIR'])
+        self.request_latency.set_buckets(app.config['METRICS_LATENCY_BUCKETS'])
+
+        app.before_request(self.start_request)
+        app.after_request(self.record_status)
+        app.teardown_request(self.finish_request)
+        app.add_url_rule(app.config['METRICS_PATH'], endpoint='metrics', view_func=self.metrics_view)
+
+    # The timings are kept in the WSGI environ rather than `g`, which may
+    # already be gone when a preserved request context is torn down
+    def start_request(self):
+        endpoint = (request.endpoint or 'unmatched',)
+        request.environ['metrics.endpoint'] = endpoint
+        request.environ['metrics.start'] = time.perf_counter()
+        self.in_flight.inc(endpoint)
+
+    @staticmethod
+    def record_status(response):
+        request.environ['metrics.status'] = response.status_code
+        return response
+
+    def finish_request(self, exc):
+        start = request.environ.pop('metrics.start', None)
+        if start is None:
+            return
+        endpoint = request.environ.pop('metrics.endpoint')
+        status = 500 if exc is not None else request.environ.pop('metrics.status', 500)
+        latency = time.perf_counter() - start
+        with self.registry.lock:
+            self.request_latency._observe(latency, endpoint)
+            self.requests._inc(endpoint + (str(status),), 1.0)
+            self.in_flight._inc(endpoint, -1.0)
+
+    def metrics_view(self):
+        return current_app.response_class(self.registry.generate_latest(), content_type=CONTENT_TYPE)
@@ -1,11 +1,20 @@
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timezone
 
 from flask_login import UserMixin
-from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy import JSON, DateTime, ForeignKey, Index, Integer, String, Text, event
+from sqlalchemy import inspect as inspect_instance
 from sqlalchemy.orm import mapped_column, relationship
-from werkzeug.security import check_password_hash, generate_password_hash
+from src import db, fragment_cache, identity_cache, password_hasher
+from src.hashing import needs_rehash
+from src.marketplace import adjust_facets, facet_key
+from src.search import index_packages, unindex_packages
+from src.stats import adjust_freelancer_stats, stats_key
 
-from src import db
+
+def utcnow():
+    """Return the current UTC time as a naive datetime (as stored in the database)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class Freelancer(UserMixin, db.Model):
@@ -14,8 +23,10 @@ class Freelancer(UserMixin, db.Model):
 
     The following attributes of a user are stored in this table:
         * email - email address of the user
-        * hashed password - hashed password (using werkzeug.security)
+        * hashed password - hashed password (using werkzeug.security, see `src.hashing`)
         * registered_on - date & time that the user registered
+        * packages_version - counter bumped whenever one of the user's packages changes
+        * packages_updated_at - date & time (UTC) of the last change to the user's packages
 
     REMEMBER: Never store the plaintext password in a database!
     """
@@ -25,8 +36,10 @@ class Freelancer(UserMixin, db.Model):
     id = mapped_column(Integer(), primary_key=True, autoincrement=True)
     full_name = mapped_column(String(), nullable=False)
     email = mapped_column(String(), unique=True, nullable=False)
-    password_hashed = mapped_column(String(128), nullable=False)
+    password_hashed = mapped_column(String(255), nullable=False)
     created_at = mapped_column(DateTime(), nullable=False)
+    packages_version = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    packages_updated_at = mapped_column(DateTime())
 
     # Define the relationship to the `Package` class
     packages_relationship = relationship('Package', back_populates='freelancer_relationship')
@@ -41,19 +54,31 @@ class Freelancer(UserMixin, db.Model):
         self.created_at = datetime.now()
 
     def is_password_correct(self, password_plaintext: str):
-        return check_password_hash(self.password_hashed, password_plaintext)
+        if not password_hasher.verify(self.password_hashed, password_plaintext):
+            return False
+
+        # Transparently upgrade hashes created with an older hashing policy
+        if needs_rehash(self.password_hashed):
+            self.password_hashed = self._generate_password_hash(password_plaintext)
+        return True
 
     def set_password(self, password_plaintext: str):
         self.password_hashed = self._generate_password_hash(password_plaintext)
+        identity_cache.invalidate(self.id)
 
     @staticmethod
     def _generate_password_hash(password_plaintext):
-        return generate_password_hash(password_plaintext)
+        return password_hasher.hash(password_plaintext)
 
     def __repr__(self):
         return f'<Freelancer: {self.email}>'
 
 
+@event.listens_for(Freelancer, 'after_delete')
+def invalidate_deleted_freelancer(mapper, connection, target):
+    identity_cache.invalidate(target.id)
+
+
 class Package(db.Model):
     """
     Class that represents a Freelancer's package that has been created.
@@ -62,15 +87,28 @@ class Package(db.Model):
         * package_name - Name of the package service
         * category - category of the package service
         * rating - rating (1 (bad) to 5 (amazing)) of the package service
+        * updated_at - date & time (UTC) the package was created or last changed
     """
 
     __tablename__ = 'packages'
+    __table_args__ = (
+        # Queries of a freelancer's own packages: the listing (ordered by id),
+        # the category filter and the rating filter
+        Index('ix_packages_freelancer_id_id', 'freelancer_id', 'id'),
+        Index('ix_packages_freelancer_id_category', 'freelancer_id', 'category'),
+        Index('ix_packages_freelancer_id_rating', 'freelancer_id', 'rating'),
+        # Marketplace queries across freelancers, sorted by rating or recency (id)
+        Index('ix_packages_rating_id', 'rating', 'id'),
+        Index('ix_packages_category_rating_id', 'category', 'rating', 'id'),
+        Index('ix_packages_category_id', 'category', 'id'),
+    )
 
     id = mapped_column(Integer(), primary_key=True, autoincrement=True)
     package_name = mapped_column(String())
     category = mapped_column(String())
     rating = mapped_column(Integer())
     freelancer_id = mapped_column(ForeignKey('freelancers.id'))
+    updated_at = mapped_column(DateTime(), default=utcnow, onupdate=utcnow)
 
     # Define the relationship to the `Freelancer` class
     freelancer_relationship = relationship('Freelancer', back_populates='packages_relationship')
@@ -93,3 +131,186 @@ class Package(db.Model):
 
     def __repr__(self):
         return f'<Package: {self.package_name}>'
+
+
+# Keep the full-text index, the marketplace facets, the freelancer statistics
+# and the packages version of the owner in sync with packages written through
+# the ORM (the bulk paths in `src.packages.bulk` update them themselves)
+
+def touch_freelancers(connection, freelancer_ids):
+    """Bump the packages version of the given freelancers, whose package pages have changed."""
+    ids = sorted({id for id in freelancer_ids if id is not None})
+    if not ids:
+        return
+    freelancers = Freelancer.__table__
+    connection.execute(
+        freelancers.update()
+        .where(freelancers.c.id.in_(ids))
+        .values(packages_version=freelancers.c.packages_version + 1, packages_updated_at=utcnow())
+    )
+    for id in ids:
+        fragment_cache.invalidate('profile-summary', id)
+
+
+def previous_value(state, name: str):
+    """Return the value attribute `name` had before the pending changes were flushed."""
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(state.object, name)
+
+
+@event.listens_for(Package, 'after_insert')
+def track_inserted_package(mapper, connection, target):
+    index_packages(connection, [target.id])
+    adjust_facets(connection, Counter({facet_key(target.category, target.rating): 1}))
+    adjust_freelancer_stats(connection, Counter({stats_key(target.freelancer_id, target.category, target.rating): 1}))
+    touch_freelancers(connection, [target.freelancer_id])
+
+
+@event.listens_for(Package, 'after_update')
+def track_updated_package(mapper, connection, target):
+    state = inspect_instance(target)
+    if any(state.attrs[name].history.has_changes() for name in ('package_name', 'category', 'freelancer_id')):
+        index_packages(connection, [target.id])
+    if any(state.attrs[name].history.has_changes() for name in ('category', 'rating')):
+        adjust_facets(connection, Counter({
+            facet_key(previous_value(state, 'category'), previous_value(state, 'rating')): -1,
+            facet_key(target.category, target.rating): 1,
+        }))
+    if any(state.attrs[name].history.has_changes() for name in ('category', 'rating', 'freelancer_id')):
+        adjust_freelancer_stats(connection, Counter({
+            stats_key(previous_value(state, 'freelancer_id'), previous_value(state, 'category'),
+                      previous_value(state, 'rating')): -1,
+            stats_key(target.freelancer_id, target.category, target.rating): 1,
+        }))
+    if any(state.attrs[name].history.has_changes() for name in ('package_name', 'category', 'rating', 'freelancer_id')):
+        touch_freelancers(connection, [previous_value(state, 'freelancer_id'), target.freelancer_id])
+
+
+@event.listens_for(Package, 'after_delete')
+def track_deleted_package(mapper, connection, target):
+    unindex_packages(connection, [target.id])
+    adjust_facets(connection, Counter({facet_key(target.category, target.rating): -1}))
+    adjust_freelancer_stats(connection, Counter({stats_key(target.freelancer_id, target.category, target.rating): -1}))
+    touch_freelancers(connection, [target.freelancer_id])
+
+
+class PackageFacet(db.Model):
+    """
+    Class that holds the number of packages per (category, rating) across all freelancers.
+
+    The counts are maintained incrementally (see `src.marketplace`) so that the
+    marketplace facets are read from this small table instead of aggregating
+    the `packages` table on every request.
+    """
+
+    __tablename__ = 'package_facets'
+
+    category = mapped_column(String(), primary_key=True)
+    rating = mapped_column(Integer(), primary_key=True)
+    package_count = mapped_column(Integer(), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PackageFacet: {self.category} ({self.rating}): {self.package_count}>'
+
+
+class FreelancerStats(db.Model):
+    """
+    Class that holds the package statistics of a freelancer.
+
+    The following attributes are stored in this table (one row per freelancer):
+        * package_count - number of packages
+        * rating_sum, rating_count - sum and number of the package ratings
+        * rating_1 ... rating_5 - number of packages per rating (histogram)
+
+    The package counts per category are in `FreelancerCategoryStats`. Both are
+    maintained incrementally (see `src.stats`) so that profiles read a few rows
+    instead of aggregating the freelancer's packages.
+    """
+
+    __tablename__ = 'freelancer_stats'
+
+    freelancer_id = mapped_column(Integer(), primary_key=True)
+    package_count = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    rating_sum = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    rating_count = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    rating_1 = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    rating_2 = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    rating_3 = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    rating_4 = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    rating_5 = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<FreelancerStats: {self.freelancer_id} ({self.package_count} packages)>'
+
+
+class FreelancerCategoryStats(db.Model):
+    """
+    Class that holds the number of packages of a freelancer per category (see `FreelancerStats`).
+    """
+
+    __tablename__ = 'freelancer_category_stats'
+
+    freelancer_id = mapped_column(Integer(), primary_key=True)
+    category = mapped_column(String(), primary_key=True)
+    package_count = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<FreelancerCategoryStats: {self.freelancer_id} {self.category}: {self.package_count}>'
+
+
+class Job(db.Model):
+    """
+    Class that represents a background job, run by `flask worker` (see `src.jobs`).
+
+    The following attributes of a job are stored in this table:
+        * name - name of the registered task to run
+        * payload - JSON arguments of the task
+        * idempotency_key - optional key under which the job is enqueued at most once
+        * status - 'pending', 'running', 'done' or 'failed'
+        * attempts - number of times the job has been started
+        * max_attempts - number of attempts after which a failing job is marked as failed
+        * run_at - date & time (UTC) from which the job may run (pushed back on retries)
+        * locked_by, locked_at - worker running the job, and since when
+        * last_error - error of the last failed attempt
+    """
+
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers claim the due jobs in `run_at` order
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = mapped_column(Integer(), primary_key=True, autoincrement=True)
+    name = mapped_column(String(), nullable=False)
+    payload = mapped_column(JSON())
+    idempotency_key = mapped_column(String(), unique=True)
+    status = mapped_column(String(), nullable=False, default='pending', server_default='pending')
+    attempts = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    max_attempts = mapped_column(Integer(), nullable=False)
+    run_at = mapped_column(DateTime(), nullable=False)
+    locked_by = mapped_column(String())
+    locked_at = mapped_column(DateTime())
+    last_error = mapped_column(Text())
+    created_at = mapped_column(DateTime(), nullable=False, default=utcnow)
+    finished_at = mapped_column(DateTime())
+
+    def __repr__(self):
+        return f'<Job: {self.name} ({self.status})>'
+
+
+class SchemaVersion(db.Model):
+    """
+    Class that records which version of the database schema has been applied.
+
+    The table holds a single row (id = 1) that is checked on startup so that
+    the schema DDL only runs when the models have changed.
+    """
+
+    __tablename__ = 'schema_version'
+
+    id = mapped_column(Integer(), primary_key=True)
+    version = mapped_column(Integer(), nullable=False)
+    applied_at = mapped_column(DateTime(), nullable=False)
+
+    def __repr__(self):
+        return f'<SchemaVersion: {self.version}>'
@@ -7,4 +7,4 @@ from flask import Blueprint
 
 packages_blueprint = Blueprint('packages', __name__, template_folder='templates')
 
-from . import routes
+from . import routes, tasks
@@ -0,0 +1,133 @@
+"""
+Bulk operations on packages.
+
+Rows are validated one by one with `PackageModel` so that errors can be
+reported per row, while the writes themselves are issued as one executemany
+statement per batch of `batch_size` rows. These statements bypass the
+`Package` mapper events, so the full-text index, the marketplace facets, the
+freelancer statistics and the packages version of the owners are updated
+here explicitly.
+"""
+from collections import Counter
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError, validator
+
+from src import db
+from src.marketplace import adjust_facets, count_facets
+from src.models import Package, touch_freelancers
+from src.search import index_packages, unindex_packages
+from src.stats import adjust_freelancer_stats, count_package_stats
+
+from .routes import PackageModel
+
+
+class PackageUpdateModel(BaseModel):
+    """Class for parsing a partial update of an existing package."""
+    id: int
+    package_name: Optional[str]
+    category: Optional[str]
+    rating: Optional[int]
+
+    @validator('rating')
+    def package_rating_check(cls, value):
+        if value is not None and value not in range(1, 6):
+            raise ValueError('Package rating must be a whole number between 1 and 5')
+        return value
+
+
+def batched(items, batch_size: int):
+    """Yield successive lists of at most `batch_size` items."""
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def validate_rows(rows, model=PackageModel):
+    """
+    Validate each row with `model`, returning the valid (index, model) pairs and
+    a list of errors in the form {'index': ..., 'errors': [...]}.
+    """
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'index': index, 'errors': [{'msg': 'Row must be a JSON object'}]})
+            continue
+        try:
+            valid.append((index, model(**row)))
+        except ValidationError as e:
+            errors.append({'index': index, 'errors': e.errors()})
+    return valid, errors
+
+
+def owned_package_ids(ids, freelancer_id: int, batch_size: int):
+    """Return the subset of `ids` that belong to `freelancer_id`."""
+    owned = set()
+    for batch in batched(list(ids), batch_size):
+        query = db.select(Package.id).where(Package.id.in_(batch), Package.freelancer_id == freelancer_id)
+        owned.update(db.session.execute(query).scalars())
+    return owned
+
+
+def package_owners(connection, ids):
+    """Return the ids of the freelancers owning the packages with the given ids."""
+    if not ids:
+        return set()
+    return set(connection.execute(db.select(Package.freelancer_id).where(Package.id.in_(ids)).distinct()).scalars())
+
+
+def insert_package_rows(rows, batch_size: int):
+    """
+    Insert dictionaries of `Package` column values with one INSERT per batch,
+    returning the ids of the new rows in the same order.
+    """
+    ids = []
+    for batch in batched(list(rows), batch_size):
+        result = db.session.execute(db.insert(Package).returning(Package.id, sort_by_parameter_order=True), batch)
+        batch_ids = result.scalars().all()
+        connection = db.session.connection()
+        index_packages(connection, batch_ids)
+        adjust_facets(connection, count_facets(connection, batch_ids))
+        adjust_freelancer_stats(connection, count_package_stats(connection, batch_ids))
+        touch_freelancers(connection, [row['freelancer_id'] for row in batch])
+        ids.extend(batch_ids)
+    return ids
+
+
+def insert_packages(packages, freelancer_id: int, batch_size: int):
+    """Insert validated `PackageModel` objects for `freelancer_id`, returning the new ids."""
+    return insert_package_rows([dict(package.dict(), freelancer_id=freelancer_id) for package in packages],
+                               batch_size)
+
+
+def update_packages(updates, batch_size: int):
+    """Apply validated `PackageUpdateModel` objects with one UPDATE executemany per batch."""
+    for batch in batched(list(updates), batch_size):
+        connection = db.session.connection()
+        faceted_ids = [update.id for update in batch if update.category is not None or update.rating is not None]
+        previous_facets = count_facets(connection, faceted_ids)
+        previous_stats = count_package_stats(connection, faceted_ids)
+
+        db.session.execute(db.update(Package), [update.dict(exclude_none=True) for update in batch])
+
+        index_packages(connection, [update.id for update in batch
+                                    if update.package_name is not None or update.category is not None])
+        facets = count_facets(connection, faceted_ids)
+        facets.subtract(previous_facets)
+        adjust_facets(connection, facets)
+        stats = count_package_stats(connection, faceted_ids)
+        stats.subtract(previous_stats)
+        adjust_freelancer_stats(connection, stats)
+        touch_freelancers(connection, package_owners(connection, [update.id for update in batch]))
+
+
+def delete_packages(ids, batch_size: int):
+    """Delete the packages with the given ids with one DELETE per batch."""
+    for batch in batched(list(ids), batch_size):
+        connection = db.session.connection()
+        unindex_packages(connection, batch)
+        facets = count_facets(connection, batch)
+        adjust_facets(connection, Counter({key: -count for key, count in facets.items()}))
+        stats = count_package_stats(connection, batch)
+        adjust_freelancer_stats(connection, Counter({key: -count for key, count in stats.items()}))
+        touch_freelancers(connection, package_owners(connection, batch))
+        db.session.execute(db.delete(Package).where(Package.id.in_(batch)))
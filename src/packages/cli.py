@@ -0,0 +1,163 @@
+"""
+CLI commands for moving packages in and out of the database:
+
+    flask packages export [--format csv|ndjson] [--freelancer-id ID] OUTPUT
+    flask packages import [--format csv|ndjson] [--freelancer-id ID] INPUT
+    flask packages reindex
+
+Both commands stream the rows in chunks so memory stays flat regardless of
+the size of the file: export reads with a server-side cursor (`yield_per`)
+and import validates each row with `PackageModel`, skips the rows whose
+owner is not a known freelancer (checked with one query per chunk) and
+inserts one chunk at a time with a single INSERT.
+"""
+import csv
+import json
+import time
+
+import click
+from flask.cli import AppGroup
+from pydantic import ValidationError
+
+from src import db
+from src.marketplace import rebuild_facets
+from src.models import Freelancer, Package
+from src.search import rebuild_search_index
+
+from .bulk import insert_package_rows
+from .routes import PackageModel
+
+
+FIELDS = ['id', 'package_name', 'category', 'rating', 'freelancer_id']
+
+packages_cli = AppGroup('packages', help='Import and export packages.')
+
+
+def detect_format(file_format, stream):
+    """Return `file_format`, or guess it from the file extension (defaulting to CSV)."""
+    if file_format:
+        return file_format
+    return 'ndjson' if getattr(stream, 'name', '').endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def report_progress(action: str, count: int, start: float):
+    elapsed = time.perf_counter() - start
+    click.echo(f'{action} {count} packages in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} rows/sec)',
+               err=True)
+
+
+def read_rows(stream, file_format):
+    """Yield (row dictionary, error) pairs from a CSV or NDJSON stream."""
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row, None
+        return
+
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield None, str(e)
+            continue
+        yield row, None
+
+
+@packages_cli.command('export')
+@click.argument('output', type=click.File('w'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--freelancer-id', type=int, help='Only export the packages of this freelancer.')
+@click.option('--chunk-size', type=int, default=5000, show_default=True, help='Rows fetched per round trip.')
+def export_packages(output, file_format, freelancer_id, chunk_size):
+    """Export packages as CSV or NDJSON."""
+    file_format = detect_format(file_format, output)
+    query = db.select(*[getattr(Package, field) for field in FIELDS]).order_by(Package.id)
+    if freelancer_id is not None:
+        query = query.where(Package.freelancer_id == freelancer_id)
+
+    if file_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(FIELDS)
+        write_row = writer.writerow
+    else:
+        def write_row(row):
+            output.write(json.dumps(dict(zip(FIELDS, row))) + '\n')
+
+    start = time.perf_counter()
+    count = 0
+    for partition in db.session.execute(query.execution_options(yield_per=chunk_size)).partitions():
+        for row in partition:
+            write_row(row)
+        count += len(partition)
+        report_progress('Exported', count, start)
+
+    report_progress('Finished exporting', count, start)
+
+
+@packages_cli.command('import')
+@click.argument('input', type=click.File('r'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--freelancer-id', type=int, help='Assign every package to this freelancer instead of the '
+                                                 '`freelancer_id` column of the file.')
+@click.option('--chunk-size', type=int, default=5000, show_default=True, help='Rows inserted per transaction.')
+def import_packages(input, file_format, freelancer_id, chunk_size):
+    """Import packages from a CSV or NDJSON file."""
+    file_format = detect_format(file_format, input)
+    start = time.perf_counter()
+    count = skipped = 0
+    chunk = []
+
+    def flush():
+        nonlocal count, skipped
+        # Check the owners up front, so a chunk never fails on the foreign key
+        # after the previous chunks were committed
+        owners = {row['freelancer_id'] for _, row in chunk}
+        known_owners = set(db.session.scalars(db.select(Freelancer.id).where(Freelancer.id.in_(owners))))
+        rows = []
+        for row_number, row in chunk:
+            if row['freelancer_id'] in known_owners:
+                rows.append(row)
+            else:
+                click.echo(f'Skipping row {row_number}: unknown freelancer {row["freelancer_id"]}', err=True)
+                skipped += 1
+        if rows:
+            insert_package_rows(rows, chunk_size)
+            db.session.commit()
+        count += len(rows)
+        chunk.clear()
+        report_progress('Imported', count, start)
+
+    for row_number, (row, error) in enumerate(read_rows(input, file_format), start=1):
+        if row is None:
+            click.echo(f'Skipping row {row_number}: {error}', err=True)
+            skipped += 1
+            continue
+        try:
+            package = PackageModel(**row)
+            owner = freelancer_id if freelancer_id is not None else int(row['freelancer_id'])
+        except (ValidationError, KeyError, TypeError, ValueError) as e:
+            click.echo(f'Skipping row {row_number}: {e}'.replace('\n', ' '), err=True)
+            skipped += 1
+            continue
+
+        chunk.append((row_number, dict(package.dict(), freelancer_id=owner)))
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    report_progress('Finished importing', count, start)
+    click.echo(f'Imported {count} packages ({skipped} skipped)')
+
+
+@packages_cli.command('reindex')
+@click.option('--chunk-size', type=int, default=10000, show_default=True, help='Packages indexed per statement.')
+def reindex_packages(chunk_size):
+    """Rebuild the full-text search index and the marketplace facets of the packages."""
+    start = time.perf_counter()
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection, chunk_size)
+        rebuild_facets(connection)
+    click.echo(f'Rebuilt the search index and facets in {time.perf_counter() - start:.1f}s')
@@ -1,10 +1,14 @@
 from flask import (abort, current_app, flash, redirect, render_template,
-                   request, url_for)
+                   request, stream_template, url_for)
 from flask_login import current_user, login_required
 from pydantic import BaseModel, ValidationError, validator
 
-from src import db
-from src.models import Package
+from src import db, http_cache
+from src.jobs import enqueue
+from src.marketplace import SORT_ORDERS, browse_packages, facet_counts, parse_cursor
+from src.models import Freelancer, Package
+from src.replica import use_primary
+from src.search import search_packages
 
 from . import packages_blueprint
 
@@ -26,6 +30,21 @@ class PackageModel(BaseModel):
         return value
 
 
+# ----------------
+# Helper Functions
+# ----------------
+
+def get_page_size():
+    """Return the requested page size, bounded by `PACKAGES_MAX_PER_PAGE`."""
+    per_page = request.args.get('per_page', default=current_app.config['PACKAGES_PER_PAGE'], type=int)
+    return max(1, min(per_page, current_app.config['PACKAGES_MAX_PER_PAGE']))
+
+
+def get_page_number():
+    """Return the requested 1-based page number."""
+    return max(1, request.args.get('page', default=1, type=int))
+
+
 # ------
 # Routes
 # ------
@@ -42,13 +61,76 @@ def index():
 @packages_blueprint.get('/packages/')
 @login_required
 def list_packages():
+    # Answer conditional requests from the owner's packages version without loading any package
+    version, updated_at = db.session.execute(
+        db.select(Freelancer.packages_version, Freelancer.packages_updated_at).where(Freelancer.id == current_user.id)
+    ).one()
+    return http_cache.conditional(render_package_list, 'packages', current_user.id, version, last_modified=updated_at)
+
+
+def render_package_list():
     query = db.select(Package).where(Package.freelancer_id == current_user.id).order_by(Package.id)
-    packages = db.session.execute(query).scalars().all()
-    return render_template('packages/package.html', packages=packages)
+
+    # Streamed mode renders the whole catalogue while only holding one chunk of rows in memory
+    if request.args.get('stream', default=current_app.config['PACKAGES_STREAM_LISTING'], type=int):
+        packages = db.session.execute(
+            query.execution_options(yield_per=current_app.config['PACKAGES_STREAM_CHUNK_SIZE'])
+        ).scalars()
+        return current_app.response_class(stream_template('packages/package.html', packages=packages))
+
+    # Keyset pagination: seek past the last id of the previous page instead of using OFFSET
+    per_page = get_page_size()
+    after = request.args.get('after', type=int)
+    if after is not None:
+        query = query.where(Package.id > after)
+    packages = db.session.execute(query.limit(per_page + 1)).scalars().all()
+
+    next_cursor = None
+    if len(packages) > per_page:
+        packages = packages[:per_page]
+        next_cursor = packages[-1].id
+
+    return render_template('packages/package.html', packages=packages, next_cursor=next_cursor, per_page=per_page)
+
+
+@packages_blueprint.get('/marketplace')
+def marketplace():
+    category = request.args.get('category', default='').strip() or None
+    min_rating = request.args.get('min_rating', type=int)
+    if min_rating is not None and min_rating not in range(1, 6):
+        abort(400)
+    sort = request.args.get('sort', default='rating')
+    if sort not in SORT_ORDERS:
+        abort(400)
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            parse_cursor(after, sort)
+        except ValueError:
+            abort(400)
+
+    per_page = get_page_size()
+    packages, next_cursor = browse_packages(category, min_rating, sort, after, per_page)
+    return render_template('packages/marketplace.html', packages=packages, next_cursor=next_cursor,
+                           facets=facet_counts(category, min_rating), category=category,
+                           min_rating=min_rating, sort=sort, per_page=per_page)
+
+
+@packages_blueprint.get('/packages/search')
+@login_required
+def search():
+    query = request.args.get('q', default='').strip()
+    page = get_page_number()
+    per_page = get_page_size()
+    packages, has_next = search_packages(query, current_user.id, page, per_page)
+
+    return render_template('packages/search.html', query=query, packages=packages,
+                           page=page, per_page=per_page, has_next=has_next)
 
 
 @packages_blueprint.route('/packages/add', methods=['GET', 'POST'])
 @login_required
+@use_primary
 def add_package():
     if request.method == 'POST':
         try:
@@ -62,10 +144,14 @@ def add_package():
             # Save the form data to the database
             new_package = Package(request_data.package_name, request_data.category, request_data.rating, current_user.id)
             db.session.add(new_package)
+            db.session.flush()
+            # Logged by the worker once the package is committed
+            enqueue('packages.log_change', {'action': 'added', 'package_name': new_package.package_name,
+                                            'freelancer_id': current_user.id},
+                    idempotency_key=f'package-added:{new_package.id}:{new_package.updated_at}')
             db.session.commit()
 
-            flash(f"Added new package ({new_package.title})!")
-            current_app.logger.info(f'Package ({new_package.title}) was added for user: {current_user.id}!')
+            flash(f"Added new package ({new_package.package_name})!")
             return redirect(url_for('packages.list_packages'))
         except ValidationError as e:
             flash("Error with package data submitted!")
@@ -76,6 +162,7 @@ def add_package():
 
 @packages_blueprint.route('/packages/<id>/delete')
 @login_required
+@use_primary
 def delete_package(id):
     query = db.select(Package).where(Package.id == id)
     package = db.session.execute(query).scalar_one_or_none()
@@ -87,14 +174,17 @@ def delete_package(id):
         abort(403)
 
     db.session.delete(package)
+    enqueue('packages.log_change', {'action': 'deleted', 'package_name': package.package_name,
+                                    'freelancer_id': current_user.id},
+            idempotency_key=f'package-deleted:{package.id}:{package.updated_at}')
     db.session.commit()
     flash(f'Package ({package.package_name}) was deleted!')
-    current_app.logger.info(f'Book ({package.package_name}) was deleted for user: {current_user.id}!')
     return redirect(url_for('packages.list_packages'))
 
 
 @packages_blueprint.route('/packages/<id>/edit', methods=['GET', 'POST'])
 @login_required
+@use_primary
 def edit_package(id):
     query = db.select(Package).where(Package.id == id)
     package = db.session.execute(query).scalar_one_or_none()
@@ -102,7 +192,7 @@ def edit_package(id):
     if package is None:
         abort(404)
 
-    if package.user_id != current_user.id:
+    if package.freelancer_id != current_user.id:
         abort(403)
 
     if request.method == 'POST':
@@ -111,10 +201,14 @@ def edit_package(id):
                     request.form['category'],
                     request.form['rating'])
         db.session.add(package)
+        db.session.flush()
+        # A resubmitted form changes nothing, so `updated_at` and the key stay the same
+        enqueue('packages.log_change', {'action': 'updated', 'package_name': package.package_name,
+                                        'freelancer_id': current_user.id},
+                idempotency_key=f'package-updated:{package.id}:{package.updated_at}')
         db.session.commit()
 
         flash(f'Package ({ package.package_name }) was updated!')
-        current_app.logger.info(f'Package ({ package.package_name }) was updated by user: { current_user.id}')
         return redirect(url_for('packages.list_packages'))
 
     return render_template('packages/edit_package.html', package=package)
@@ -0,0 +1,12 @@
+"""
+Background jobs of the package views (see `src.jobs`).
+"""
+from flask import current_app
+
+from src import job_queue
+
+
+@job_queue.task('packages.log_change')
+def log_package_change(payload):
+    current_app.logger.info(f"Package ({payload['package_name']}) was {payload['action']} "
+                            f"for user: {payload['freelancer_id']}!")
@@ -0,0 +1,153 @@
+"""
+Connection pool instrumentation and per-connection database settings.
+
+Every engine created by `db` uses `InstrumentedQueuePool`, which times how
+long each checkout waits for a connection (including opening a new one).
+`DatabasePool` exports these metrics for each bind:
+    * db_pool_checkout_wait_seconds - histogram of checkout waits
+    * db_pool_checkout_timeouts_total - checkouts that gave up after `pool_timeout`
+    * db_pool_size, db_pool_checked_out, db_pool_overflow - current pool usage
+
+Requests piling up in `db_pool_checkout_wait_seconds` while `db_pool_checked_out`
+stays at `pool_size + max_overflow` mean that the workers are starved for
+connections.
+
+New connections are also configured here. SQLite gets the `SQLITE_PRAGMAS`,
+e.g. WAL journaling, `busy_timeout` and `synchronous=NORMAL`. PostgreSQL
+gets `DB_STATEMENT_TIMEOUT_MS`.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from src.metrics import Counter, Gauge, Histogram
+
+
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """`QueuePool` reporting the time spent waiting for each checkout to `observe_checkout`."""
+
+    observe_checkout = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection_record = super()._do_get()
+        except TimeoutError:
+            if self.observe_checkout is not None:
+                self.observe_checkout(self, time.perf_counter() - start, timed_out=True)
+            raise
+        if self.observe_checkout is not None:
+            self.observe_checkout(self, time.perf_counter() - start, timed_out=False)
+        return connection_record
+
+    def recreate(self):
+        # Called when the engine is disposed; the new pool keeps reporting
+        pool = super().recreate()
+        pool.observe_checkout = self.observe_checkout
+        return pool
+
+
+def execute_settings(dbapi_connection, statements, autocommit: bool = False):
+    """
+    Run `statements` on a new DBAPI connection. With `autocommit`, they run
+    outside of any transaction (the previous mode is restored afterwards).
+    """
+    if autocommit:
+        previous, dbapi_connection.autocommit = dbapi_connection.autocommit, True
+    cursor = dbapi_connection.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+        if autocommit:
+            dbapi_connection.autocommit = previous
+
+
+def configure_connection(engine, config):
+    """Apply the per-connection settings of `config` to every new connection of `engine`."""
+    if engine.dialect.name == 'sqlite':
+        statements = [f'PRAGMA {name} = {value}' for name, value in config['SQLITE_PRAGMAS'].items()]
+    elif engine.dialect.name == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        statements = [f"SET statement_timeout = {int(config['DB_STATEMENT_TIMEOUT_MS'])}"]
+    else:
+        return
+    # psycopg2 and asyncpg would run the SET in an implicit transaction, which
+    # the ROLLBACK of the pool's reset-on-return then undoes at the first checkin
+    autocommit = engine.dialect.name == 'postgresql'
+
+    def on_connect(dbapi_connection, connection_record):
+        execute_settings(dbapi_connection, statements, autocommit)
+
+    event.listen(engine, 'connect', on_connect)
+
+
+class DatabasePool(object):
+    """Flask extension configuring the connections of `db` and exporting pool metrics."""
+
+    def __init__(self, app=None):
+        self.pools = {}
+        self._metrics = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from src import db
+
+        metrics = app.extensions.get('metrics')
+        if metrics is not None and self._metrics is None:
+            registry = metrics.registry
+            self._metrics = {
+                'wait': Histogram(registry, 'db_pool_checkout_wait_seconds',
+                                  'Time spent waiting for a database connection from the pool.', ('bind',),
+                                  buckets=CHECKOUT_WAIT_BUCKETS),
+                'timeouts': Counter(registry, 'db_pool_checkout_timeouts',
+                                    'Number of pool checkouts that timed out.', ('bind',)),
+                'size': Gauge(registry, 'db_pool_size', 'Number of pooled connections kept open.', ('bind',)),
+                'checked_out': Gauge(registry, 'db_pool_checked_out',
+                                     'Number of connections currently checked out of the pool.', ('bind',)),
+                'overflow': Gauge(registry, 'db_pool_overflow',
+                                  'Number of connections open beyond the pool size.', ('bind',)),
+            }
+
+        # `db` must be initialized first: it creates the engines
+        self.pools = {}
+        with app.app_context():
+            for bind_key, engine in db.engines.items():
+                configure_connection(engine, app.config)
+                self.instrument(bind_key or 'default', engine)
+        app.extensions['database_pool'] = self
+
+    def instrument(self, name: str, engine):
+        self.pools[name] = engine
+        if self._metrics is None or not isinstance(engine.pool, InstrumentedQueuePool):
+            return
+
+        def observe_checkout(pool, wait, timed_out):
+            if timed_out:
+                self._metrics['timeouts'].inc((name,))
+            else:
+                self._metrics['wait'].observe(wait, (name,))
+            self.record_usage(name, pool)
+
+        def on_checkin(dbapi_connection, connection_record):
+            self.record_usage(name, engine.pool)
+
+        engine.pool.observe_checkout = observe_checkout
+        event.listen(engine, 'checkin', on_checkin)
+
+    def record_usage(self, name: str, pool):
+        self._metrics['size'].set(pool.size(), (name,))
+        self._metrics['checked_out'].set(pool.checkedout(), (name,))
+        self._metrics['overflow'].set(max(pool.overflow(), 0), (name,))
+
+    def stats(self):
+        """Return the current usage of the pool of each bind."""
+        return {name: {'size': engine.pool.size(), 'checked_out': engine.pool.checkedout(),
+                       'overflow': max(engine.pool.overflow(), 0)}
+                for name, engine in self.pools.items() if isinstance(engine.pool, QueuePool)}
@@ -0,0 +1,97 @@
+"""
+Read/write splitting between the primary database and a read replica.
+
+When the 'replica' bind is configured (`REPLICA_DATABASE_URL`), `db.session`
+routes each statement:
+    * GET and HEAD requests read from the replica, including the Flask-Login
+      user loader that runs in them
+    * flushes, INSERT/UPDATE/DELETE statements and any other request use the primary
+    * views decorated with `@use_primary` (views that write, even on GET) use the primary
+
+Once a request has written, its remaining reads go to the primary, so they
+see the uncommitted rows. After a commit, the user's session cookie is
+marked to read from the primary for `REPLICA_STICKY_SECONDS`, which should
+exceed the usual replication lag, so users always see their own writes.
+Without a replica every statement goes to the primary.
+"""
+import time
+from functools import wraps
+
+from flask import current_app, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+
+REPLICA_BIND = 'replica'
+
+# Per-request routing state, kept in the WSGI environ like the request metrics
+READ_FROM_REPLICA = 'db.read_from_replica'
+WROTE = 'db.wrote'
+
+# Session cookie key holding the time until which the user reads from the primary
+STICKY_UNTIL = '_primary_until'
+
+
+def mark_written():
+    """Send the remaining reads of the current request, and the user's next requests, to the primary."""
+    if has_request_context():
+        request.environ[WROTE] = True
+
+
+def reads_from_replica() -> bool:
+    return has_request_context() and request.environ.get(READ_FROM_REPLICA, False) and not request.environ.get(WROTE)
+
+
+def use_primary(view):
+    """Decorator for views that write to the database, so that they also read from the primary."""
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        request.environ[READ_FROM_REPLICA] = False
+        return view(*args, **kwargs)
+    return decorated_view
+
+
+class RoutingSession(Session):
+    """`db.session` class sending the reads of GET requests to the replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.bind is not None:
+            # Joined to an external transaction, e.g. the one each test rolls back
+            return self.bind
+        if bind is None and REPLICA_BIND in self._db.engines:
+            if self._flushing or isinstance(clause, UpdateBase):
+                mark_written()
+            elif reads_from_replica():
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        super().commit()
+        mark_written()
+
+
+class ReplicaRouter(object):
+    """Flask extension deciding, for each request, whether `db.session` reads from the replica."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.route_request)
+        app.after_request(self.stick_to_primary)
+        app.extensions['replica_router'] = self
+
+    @staticmethod
+    def enabled() -> bool:
+        return REPLICA_BIND in current_app.config['SQLALCHEMY_BINDS']
+
+    def route_request(self):
+        if self.enabled():
+            request.environ[READ_FROM_REPLICA] = (request.method in ('GET', 'HEAD')
+                                                  and session.get(STICKY_UNTIL, 0) < time.time())
+
+    def stick_to_primary(self, response):
+        if request.environ.get(WROTE) and self.enabled():
+            session[STICKY_UNTIL] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return response
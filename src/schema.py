@@ -0,0 +1,167 @@
+"""
+Versioned bootstrap of the database schema.
+
+The schema version applied to the database is stored in the `schema_version`
+table. On startup each process reads that row with a single primary-key query
+through the shared `db.engine`; the DDL only runs when the stored version is
+older than `SCHEMA_VERSION`, and then only in one process at a time thanks to
+a file lock. Existing data is never dropped by the bootstrap.
+
+Bump `SCHEMA_VERSION` whenever the models gain new tables, columns or
+indexes, or when a string column is widened. New columns are added to
+existing tables with `ALTER TABLE ... ADD COLUMN`, so they must be nullable
+or have a `server_default`; string columns declared wider than in the
+database are widened with `ALTER TABLE ... ALTER COLUMN ... TYPE`.
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+import sqlalchemy as sqla
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateColumn
+
+from src import db
+
+
+SCHEMA_VERSION = 8
+
+
+@contextmanager
+def schema_lock(path: str):
+    """Hold an exclusive, cross-process lock on `path` for the duration of the block."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def current_schema_version():
+    """Return the schema version stamped in the database, or None if it has not been stamped."""
+    from src.models import SchemaVersion
+
+    query = db.select(SchemaVersion.version).where(SchemaVersion.id == 1)
+    try:
+        with db.engine.connect() as connection:
+            return connection.execute(query).scalar()
+    except (OperationalError, ProgrammingError):
+        # The `schema_version` table does not exist yet
+        return None
+
+
+def schema_is_current() -> bool:
+    """Return whether the database is stamped with `SCHEMA_VERSION` or newer."""
+    version = current_schema_version()
+    return version is not None and version >= SCHEMA_VERSION
+
+
+def stamp_schema(version: int = SCHEMA_VERSION):
+    """Record `version` as the schema version applied to the database."""
+    from src.models import SchemaVersion
+
+    with db.engine.begin() as connection:
+        connection.execute(db.delete(SchemaVersion))
+        connection.execute(db.insert(SchemaVersion).values(id=1, version=version, applied_at=datetime.now()))
+
+
+def add_missing_columns(connection):
+    """Add the columns declared on the models that are missing from existing tables."""
+    inspector = sqla.inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                connection.execute(sqla.DDL(f'ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(connection)}'))
+
+
+def narrow_columns(connection):
+    """Yield the (table, column) of the string columns declared wider on the models than in the database."""
+    inspector = sqla.inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            current = existing.get(column.name)
+            if not isinstance(column.type, sqla.String) or not isinstance(current, sqla.String):
+                continue
+            if current.length is not None and (column.type.length is None or column.type.length > current.length):
+                yield table, column
+
+
+def widen_columns(connection):
+    """Widen the string columns declared wider on the models than in the database."""
+    # SQLite does not enforce the length of VARCHAR columns (and cannot alter them)
+    if connection.dialect.name == 'sqlite':
+        return
+    for table, column in list(narrow_columns(connection)):
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(sqla.DDL(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE {column_type}'))
+
+
+def upgrade_schema():
+    """Create missing tables, columns and indexes, then stamp the current schema version."""
+    from src.health import invalidate_table_status
+    from src.marketplace import rebuild_facets
+    from src.search import rebuild_search_index
+    from src.stats import rebuild_freelancer_stats
+
+    db.create_all()
+
+    # `create_all` only creates columns and indexes together with new tables,
+    # so add the ones declared on tables that already existed, and widen the
+    # string columns whose declared length grew
+    with db.engine.begin() as connection:
+        add_missing_columns(connection)
+        widen_columns(connection)
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        # Derive the search index, facets and freelancer statistics of packages
+        # written before those tables existed
+        rebuild_search_index(connection)
+        rebuild_facets(connection)
+        rebuild_freelancer_stats(connection)
+
+    stamp_schema()
+    invalidate_table_status()
+
+
+def reset_schema():
+    """Drop and recreate every table, then stamp the current schema version."""
+    from src import fragment_cache, identity_cache
+    from src.marketplace import marketplace_cache
+
+    db.drop_all()
+    upgrade_schema()
+    identity_cache.clear()
+    fragment_cache.clear()
+    marketplace_cache.clear()
+
+
+def ensure_schema(app):
+    """Bring the database schema up to `SCHEMA_VERSION`, returning True if any DDL ran."""
+    with app.app_context():
+        if schema_is_current():
+            return False
+
+        with schema_lock(app.config['SCHEMA_LOCK_FILE']):
+            # Another process may have upgraded the schema while we waited for the lock
+            if schema_is_current():
+                return False
+
+            upgrade_schema()
+            return True
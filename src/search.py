@@ -0,0 +1,200 @@
+"""
+Full-text search over `Package.package_name` and `Package.category`.
+
+The text index lives in the `packages_search` table next to `packages`:
+
+    * SQLite - an FTS5 virtual table whose rowid is the package id, ranked with bm25()
+    * PostgreSQL - a (package_id, tsvector) table with a GIN index, ranked with ts_rank_cd()
+
+Every search is scoped to one freelancer. PostgreSQL combines the GIN index
+with the `freelancer_id` index, but FTS5 can only filter on the text itself,
+so in SQLite each word is indexed prefixed with the owner id (e.g.
+'7xlogo'). A search then only reads the index entries of that freelancer,
+instead of every package containing a common word.
+
+The table is created and dropped together with the models (`db.create_all`
+and `db.drop_all`) and is kept in sync through `index_packages` and
+`unindex_packages`, which are called from the `Package` mapper events and
+from the bulk paths in `src.packages.bulk` (which bypass those events).
+Matches on the package name weigh more than matches on the category.
+"""
+import re
+
+from sqlalchemy import DDL, bindparam, event, text
+
+from src import db
+
+
+SEARCH_TABLE = 'packages_search'
+
+# Letters and digits only: FTS5 splits words on underscores
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+CREATE_DDL = {
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        f"USING fts5(package_name, category, tokenize='unicode61 remove_diacritics 2')",
+    ],
+    'postgresql': [
+        f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+        f'package_id INTEGER PRIMARY KEY REFERENCES packages (id) ON DELETE CASCADE, '
+        f'document TSVECTOR NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)',
+    ],
+}
+
+SELECT_PACKAGES_SQL = 'SELECT id, package_name, category, freelancer_id FROM packages WHERE id IN :ids'
+
+INDEX_SQL = {
+    'sqlite': f'INSERT INTO {SEARCH_TABLE} (rowid, package_name, category) '
+              f'VALUES (:id, :package_name, :category)',
+    'postgresql': f"INSERT INTO {SEARCH_TABLE} (package_id, document) "
+                  f"SELECT id, setweight(to_tsvector('simple', coalesce(package_name, '')), 'A') || "
+                  f"setweight(to_tsvector('simple', coalesce(category, '')), 'B') "
+                  f"FROM packages WHERE id IN :ids "
+                  f"ON CONFLICT (package_id) DO UPDATE SET document = excluded.document",
+}
+
+UNINDEX_SQL = {
+    'sqlite': f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN :ids',
+    'postgresql': f'DELETE FROM {SEARCH_TABLE} WHERE package_id IN :ids',
+}
+
+SEARCH_SQL = {
+    'sqlite': (
+        f'SELECT packages.* FROM {SEARCH_TABLE} JOIN packages ON packages.id = {SEARCH_TABLE}.rowid '
+        f'WHERE {SEARCH_TABLE} MATCH :query '
+        f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0), packages.id '
+        f'LIMIT :limit OFFSET :offset'
+    ),
+    'postgresql': (
+        f"SELECT packages.* FROM {SEARCH_TABLE} JOIN packages ON packages.id = {SEARCH_TABLE}.package_id "
+        f"WHERE {SEARCH_TABLE}.document @@ to_tsquery('simple', :query) AND packages.freelancer_id = :freelancer_id "
+        f"ORDER BY ts_rank_cd({SEARCH_TABLE}.document, to_tsquery('simple', :query)) DESC, packages.id "
+        f"LIMIT :limit OFFSET :offset"
+    ),
+}
+
+
+def supports_search(connection) -> bool:
+    return connection.dialect.name in CREATE_DDL
+
+
+def scoped_words(freelancer_id: int, value: str) -> str:
+    """Prefix every word of `value` with the owner id, e.g. (7, 'Logo design') -> '7xlogo 7xdesign'."""
+    return ' '.join(f'{freelancer_id}x{word}' for word in WORD_PATTERN.findall((value or '').lower()))
+
+
+# ------------------
+# Schema Maintenance
+# ------------------
+
+def create_search_table(target, connection, **kw):
+    for statement in CREATE_DDL.get(connection.dialect.name, []):
+        connection.execute(DDL(statement))
+
+
+def drop_search_table(target, connection, **kw):
+    if supports_search(connection):
+        connection.execute(DDL(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+
+
+# Created after (and dropped before) the `packages` table it refers to
+event.listen(db.metadata, 'after_create', create_search_table)
+event.listen(db.metadata, 'before_drop', drop_search_table)
+
+
+def rebuild_search_index(connection, batch_size: int = 10000):
+    """Recreate the text index of every package, `batch_size` packages at a time."""
+    if not supports_search(connection):
+        return
+
+    connection.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+    last_id = 0
+    while True:
+        ids = connection.execute(
+            text('SELECT id FROM packages WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {'last_id': last_id, 'limit': batch_size}
+        ).scalars().all()
+        if not ids:
+            break
+        index_packages(connection, ids)
+        last_id = ids[-1]
+
+
+# -----------------
+# Index Maintenance
+# -----------------
+
+def execute_with_ids(connection, statement: str, ids):
+    return connection.execute(text(statement).bindparams(bindparam('ids', expanding=True)), {'ids': list(ids)})
+
+
+def index_packages(connection, ids):
+    """(Re)index the packages with the given ids from their current row in `packages`."""
+    if not ids or not supports_search(connection):
+        return
+
+    if connection.dialect.name == 'postgresql':
+        execute_with_ids(connection, INDEX_SQL['postgresql'], ids)
+        return
+
+    rows = [{'id': id, 'package_name': scoped_words(freelancer_id, package_name),
+             'category': scoped_words(freelancer_id, category)}
+            for id, package_name, category, freelancer_id in execute_with_ids(connection, SELECT_PACKAGES_SQL, ids)]
+    execute_with_ids(connection, UNINDEX_SQL['sqlite'], ids)
+    if rows:
+        connection.execute(text(INDEX_SQL['sqlite']), rows)
+
+
+def unindex_packages(connection, ids):
+    """Remove the packages with the given ids from the text index."""
+    if not ids or not supports_search(connection):
+        return
+    execute_with_ids(connection, UNINDEX_SQL[connection.dialect.name], ids)
+
+
+# ------
+# Search
+# ------
+
+def parse_query(query: str, freelancer_id: int, dialect_name: str):
+    """
+    Convert free text into a prefix query matching every word, or None if the
+    text has no words. Only letters and digits are kept, so user input can
+    never break the FTS5/tsquery syntax.
+    """
+    words = WORD_PATTERN.findall((query or '').lower())
+    if not words:
+        return None
+    if dialect_name == 'postgresql':
+        return ' & '.join(f'{word}:*' for word in words)
+    return ' '.join(f'"{freelancer_id}x{word}"*' for word in words)
+
+
+def search_parameters(query: str, freelancer_id: int, dialect_name: str, limit: int, offset: int = 0):
+    """Return the parameters of `SEARCH_SQL[dialect_name]`, or None if `query` has no words."""
+    search_query = parse_query(query, freelancer_id, dialect_name)
+    if search_query is None:
+        return None
+    return {'query': search_query, 'freelancer_id': freelancer_id, 'limit': limit, 'offset': offset}
+
+
+def search_packages(query: str, freelancer_id: int, page: int = 1, per_page: int = 50):
+    """
+    Return the packages of `freelancer_id` matching `query`, best match first,
+    as a (packages, has_next_page) tuple for the 1-based `page`.
+    """
+    from src.models import Package
+
+    connection = db.session.connection()
+    if not supports_search(connection):
+        return [], False
+    parameters = search_parameters(query, freelancer_id, connection.dialect.name,
+                                   limit=per_page + 1, offset=(page - 1) * per_page)
+    if parameters is None:
+        return [], False
+
+    statement = db.select(Package).from_statement(text(SEARCH_SQL[connection.dialect.name]))
+    packages = db.session.execute(statement, parameters).scalars().all()
+    return packages[:per_page], len(packages) > per_page
@@ -0,0 +1,179 @@
+"""
+Package statistics of a freelancer (count, average rating, rating histogram and counts per category).
+
+The statistics are read from the `freelancer_stats` (one row per freelancer)
+and `freelancer_category_stats` (one row per freelancer and category) summary
+tables, which `adjust_freelancer_stats` updates incrementally from the
+`Package` mapper events and the bulk paths in `src.packages.bulk`, so no
+request aggregates the packages of a freelancer. `flask stats rebuild`
+recomputes them from scratch, one range of freelancers at a time.
+"""
+from collections import Counter, defaultdict
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, text
+
+from src import db
+
+
+RATINGS = range(1, 6)
+
+stats_cli = AppGroup('stats', help='Maintain the freelancer package statistics.')
+
+
+def stats_key(freelancer_id, category, rating):
+    """Return the key of a package in the statistics deltas (the category key column is not nullable)."""
+    return (freelancer_id, category or '', rating)
+
+
+# -----------------
+# Stats Maintenance
+# -----------------
+
+def count_package_stats(connection, ids) -> Counter:
+    """Return the number of packages per (freelancer_id, category, rating) among the packages with the given ids."""
+    if not ids:
+        return Counter()
+    rows = connection.execute(
+        text('SELECT freelancer_id, category, rating, COUNT(*) FROM packages WHERE id IN :ids '
+             'GROUP BY freelancer_id, category, rating')
+        .bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(ids)}
+    )
+    counts = Counter()
+    for freelancer_id, category, rating, count in rows:
+        counts[stats_key(freelancer_id, category, rating)] += count
+    return counts
+
+
+def adjust_freelancer_stats(connection, deltas: Counter):
+    """Add `deltas` ({(freelancer_id, category, rating): change in package count}) to the statistics."""
+    from src.models import FreelancerCategoryStats, FreelancerStats
+
+    freelancers = defaultdict(Counter)
+    categories = Counter()
+    for (freelancer_id, category, rating), delta in deltas.items():
+        if freelancer_id is None or not delta:
+            continue
+        totals = freelancers[freelancer_id]
+        totals['package_count'] += delta
+        if rating is not None:
+            totals['rating_sum'] += rating * delta
+            totals['rating_count'] += delta
+            if rating in RATINGS:
+                totals[f'rating_{rating}'] += delta
+        categories[(freelancer_id, category)] += delta
+
+    stats_columns = ['package_count', 'rating_sum', 'rating_count'] + [f'rating_{rating}' for rating in RATINGS]
+    stats_rows = [dict({column: totals[column] for column in stats_columns}, freelancer_id=freelancer_id)
+                  for freelancer_id, totals in sorted(freelancers.items()) if any(totals.values())]
+    category_rows = [{'freelancer_id': freelancer_id, 'category': category, 'package_count': delta}
+                     for (freelancer_id, category), delta in sorted(categories.items()) if delta]
+
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    if stats_rows:
+        statement = insert(FreelancerStats)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[FreelancerStats.freelancer_id],
+            set_={column: getattr(FreelancerStats, column) + getattr(statement.excluded, column)
+                  for column in stats_columns}
+        ), stats_rows)
+    if category_rows:
+        statement = insert(FreelancerCategoryStats)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[FreelancerCategoryStats.freelancer_id, FreelancerCategoryStats.category],
+            set_={'package_count': FreelancerCategoryStats.package_count + statement.excluded.package_count}
+        ), category_rows)
+
+
+def rebuild_freelancer_stats(connection, first_id: int = None, last_id: int = None):
+    """
+    Recompute the statistics of the freelancers with ids in [`first_id`, `last_id`]
+    (by default all of them) with one GROUP BY over their packages.
+    """
+    in_range = 'freelancer_id BETWEEN :first_id AND :last_id' if first_id is not None else None
+    params = {'first_id': first_id, 'last_id': last_id} if in_range else {}
+    where = f"WHERE freelancer_id IS NOT NULL{f' AND {in_range}' if in_range else ''}"
+    histogram = ', '.join(f'SUM(CASE WHEN rating = {rating} THEN 1 ELSE 0 END)' for rating in RATINGS)
+
+    connection.execute(text(f"DELETE FROM freelancer_stats{f' WHERE {in_range}' if in_range else ''}"), params)
+    connection.execute(text(f"DELETE FROM freelancer_category_stats{f' WHERE {in_range}' if in_range else ''}"),
+                       params)
+    connection.execute(text(
+        f"INSERT INTO freelancer_stats (freelancer_id, package_count, rating_sum, rating_count, "
+        f"{', '.join(f'rating_{rating}' for rating in RATINGS)}) "
+        f"SELECT freelancer_id, COUNT(*), COALESCE(SUM(rating), 0), COUNT(rating), {histogram} "
+        f"FROM packages {where} GROUP BY freelancer_id"
+    ), params)
+    connection.execute(text(
+        f"INSERT INTO freelancer_category_stats (freelancer_id, category, package_count) "
+        f"SELECT freelancer_id, COALESCE(category, ''), COUNT(*) "
+        f"FROM packages {where} GROUP BY freelancer_id, COALESCE(category, '')"
+    ), params)
+
+
+# -------
+# Reading
+# -------
+
+def stats_query(freelancer_id: int):
+    """Return the primary-key query of the statistics row of `freelancer_id`."""
+    from src.models import FreelancerStats
+
+    return db.select(FreelancerStats).where(FreelancerStats.freelancer_id == freelancer_id)
+
+
+def category_stats_query(freelancer_id: int):
+    """Return the query of the package counts per category of `freelancer_id`."""
+    from src.models import FreelancerCategoryStats
+
+    return (
+        db.select(FreelancerCategoryStats.category, FreelancerCategoryStats.package_count)
+        .where(FreelancerCategoryStats.freelancer_id == freelancer_id, FreelancerCategoryStats.package_count > 0)
+        .order_by(FreelancerCategoryStats.category)
+    )
+
+
+def summarize_statistics(stats, category_rows) -> dict:
+    """Return the package statistics from the results of `stats_query` (or None) and `category_stats_query`."""
+    return {
+        'package_count': stats.package_count if stats else 0,
+        'average_rating': round(stats.rating_sum / stats.rating_count, 2) if stats and stats.rating_count else None,
+        'ratings': {rating: getattr(stats, f'rating_{rating}') if stats else 0 for rating in RATINGS},
+        'categories': {category: count for category, count in category_rows},
+    }
+
+
+def package_statistics(freelancer_id: int) -> dict:
+    """Return the package statistics of `freelancer_id`; the packages themselves are never read."""
+    stats = db.session.execute(stats_query(freelancer_id)).scalar_one_or_none()
+    return summarize_statistics(stats, db.session.execute(category_stats_query(freelancer_id)))
+
+
+# ---
+# CLI
+# ---
+
+@stats_cli.command('rebuild')
+@click.option('--chunk-size', type=int, default=1000, show_default=True,
+              help='Freelancer ids recomputed per transaction.')
+def rebuild_stats(chunk_size):
+    """Recompute the package statistics of every freelancer from the packages."""
+    first_id, last_id = db.session.execute(text(
+        'SELECT MIN(freelancer_id), MAX(freelancer_id) FROM ('
+        'SELECT freelancer_id FROM packages UNION ALL SELECT freelancer_id FROM freelancer_stats) AS ids'
+    )).one()
+    db.session.rollback()
+
+    count = 0
+    if first_id is not None:
+        for start in range(first_id, last_id + 1, chunk_size):
+            with db.engine.begin() as connection:
+                rebuild_freelancer_stats(connection, start, start + chunk_size - 1)
+            count += 1
+    click.echo(f'Rebuilt the package statistics in {count} chunks of {chunk_size} freelancer ids')
@@ -2,8 +2,31 @@ import os
 
 import pytest
 
-from src import create_app, db
-from src.models import Freelancer, Package
+from src import create_app, db, fragment_cache, identity_cache
+from src.marketplace import marketplace_cache, rebuild_facets
+from src.models import Freelancer, Package, SchemaVersion
+from src.search import rebuild_search_index
+
+
+# ----------------
+# Helper Functions
+# ----------------
+
+def clear_caches():
+    identity_cache.clear()
+    fragment_cache.clear()
+    marketplace_cache.clear()
+
+
+def empty_database():
+    # Delete the rows committed outside of the transaction of `init_database`
+    with db.engine.begin() as connection:
+        for table in reversed(db.metadata.sorted_tables):
+            if table is not SchemaVersion.__table__:
+                connection.execute(table.delete())
+        rebuild_search_index(connection)
+        rebuild_facets(connection)
+    clear_caches()
 
 
 # --------
@@ -16,23 +39,44 @@ def new_user():
     return freelancer
 
 
-@pytest.fixture(scope='module')
-def test_client():
+@pytest.fixture(scope='session')
+def app():
     # Set the Testing configuration prior to creating the Flask application
     os.environ['CONFIG_TYPE'] = 'config.config.TestingConfig'
+    # The schema is created once for the whole session (of each pytest-xdist worker)
     flask_app = create_app()
 
+    # The in-memory database only lives as long as one of its connections
+    with flask_app.app_context():
+        connection = db.engine.connect()
+
+    yield flask_app
+
+    connection.close()
+
+
+@pytest.fixture(scope='module')
+def test_client(app):
     # Create a test client using the Flask application configured for testing
-    with flask_app.test_client() as testing_client:
+    with app.test_client() as testing_client:
         # Establish an application context
-        with flask_app.app_context():
+        with app.app_context():
             yield testing_client  # this is where the testing happens!
 
+            empty_database()
 
-@pytest.fixture(scope='module')
+
+@pytest.fixture(scope='function')
 def init_database(test_client):
-    # Create the database and the database table
-    db.create_all()
+    # Run the test in a transaction that is rolled back afterwards: the commits
+    # of the test (and of the views) only release a SAVEPOINT within it
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    if connection.dialect.name == 'sqlite':
+        # pysqlite defers BEGIN to the first write; without it the first SAVEPOINT would commit
+        connection.exec_driver_sql('BEGIN')
+    db.session.remove()
+    db.session.configure(bind=connection, join_transaction_mode='create_savepoint')
 
     # Insert user data
     default_user = Freelancer('Sophat Chhay', email='tovban.freelancer@gmail.com', password_plaintext='SecretPass')
@@ -56,11 +100,15 @@ def init_database(test_client):
 
     yield  # this is where the testing happens!
 
-    db.drop_all()
+    db.session.remove()
+    db.session.configure(bind=None, join_transaction_mode='conditional_savepoint')
+    transaction.rollback()
+    connection.close()
+    clear_caches()
 
 
 @pytest.fixture(scope='function')
-def log_in_default_user(test_client):
+def log_in_default_user(test_client, init_database):
     test_client.post('/login',
                      data={'email': 'tovban.freelancer@gmail.com', 'password': 'SecretPass'})
 
@@ -70,7 +118,7 @@ def log_in_default_user(test_client):
 
 
 @pytest.fixture(scope='function')
-def log_in_second_user(test_client):
+def log_in_second_user(test_client, init_database):
     test_client.post('/login',
                      data={'email': 'tovban.freelancer@gmail.com','password': 'FlaskIsTheBest987'})
 
@@ -81,11 +129,10 @@ def log_in_second_user(test_client):
 
 
 @pytest.fixture(scope='module')
-def cli_test_client():
-    # Set the Testing configuration prior to creating the Flask application
-    os.environ['CONFIG_TYPE'] = 'config.config.TestingConfig'
-    flask_app = create_app()
-
-    runner = flask_app.test_cli_runner()
+def cli_test_client(app):
+    runner = app.test_cli_runner()
 
     yield runner  # this is where the testing happens!
+
+    with app.app_context():
+        empty_database()
@@ -0,0 +1,60 @@
+"""
+This file (test_analytics.py) contains the functional tests for the rating report
+command and the '/api/v1/analytics/ratings' endpoint.
+"""
+import json
+
+from src import db
+from src.models import Package
+
+
+def test_ratings_endpoint(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+          and the default set of packages in the database
+    WHEN the '/api/v1/analytics/ratings' endpoint is requested (GET)
+    THEN check the rating distribution per category and the freelancer rankings are returned
+    """
+    response = test_client.get('/api/v1/analytics/ratings?top=1&min_packages=2')
+    assert response.status_code == 200
+    report = response.json
+    assert (report['packages'], report['unrated_packages'], report['rated_freelancers']) == (3, 0, 1)
+    assert report['overall']['average_rating'] == 4.0
+    assert report['overall']['histogram'] == {'1': 0, '2': 0, '3': 1, '4': 1, '5': 1}
+    assert [entry['category'] for entry in report['categories']] == ['Taylor Jenkins Reid', 'Emily Henry']
+    assert report['categories'][0]['percentiles'] == {'p25': 4, 'p50': 4, 'p75': 5, 'p90': 5}
+    assert [entry['category'] for entry in report['top_categories']] == ['Taylor Jenkins Reid']
+    assert len(report['top_freelancers']) == 1
+    assert report['top_freelancers'][0]['package_count'] == 3
+
+
+def test_ratings_endpoint_requires_login(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/api/v1/analytics/ratings' endpoint is requested (GET) without logging in
+    THEN check a 401 is returned
+    """
+    response = test_client.get('/api/v1/analytics/ratings')
+    assert response.status_code == 401
+
+
+def test_ratings_command(test_client, cli_test_client):
+    """
+    GIVEN packages of two freelancers
+    WHEN the 'flask analytics ratings' command is called with small chunks
+    THEN check the JSON report covers every package
+    """
+    for freelancer_id, ratings in ((8001, [5, 5, 4]), (8002, [2, 3, 1, 2])):
+        for rating in ratings:
+            db.session.add(Package(f'Report {rating}', 'Reports', str(rating), freelancer_id))
+    db.session.commit()
+
+    output = cli_test_client.invoke(args=['analytics', 'ratings', '--top', '5', '--min-packages', '3',
+                                          '--chunk-size', '2'])
+    assert output.exit_code == 0
+    report = json.loads(output.output)
+    assert report['packages'] == 7
+    assert report['categories'][0]['package_count'] == 7
+    assert [entry['freelancer_id'] for entry in report['top_freelancers']] == [8001, 8002]
+    assert [entry['freelancer_id'] for entry in report['most_active_freelancers']] == [8002, 8001]
+    assert report['top_freelancers'][0]['average_rating'] == 4.67
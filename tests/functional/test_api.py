@@ -0,0 +1,89 @@
+"""
+This file (test_api.py) contains the functional tests for the `api` blueprint.
+
+These tests send JSON to the bulk package endpoints and check the per-row results.
+"""
+from src import db
+from src.models import Package
+
+
+def test_bulk_create_not_logged_in(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN '/api/v1/packages' is posted to (POST) without a user logged in
+    THEN check that a '401' (Unauthorized) JSON error is returned
+    """
+    response = test_client.post('/api/v1/packages', json=[])
+    assert response.status_code == 401
+    assert response.json['error'] == 'Unauthorized'
+
+
+def test_bulk_create_packages(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN '/api/v1/packages' is posted to (POST) with valid and invalid rows
+    THEN check the valid rows are created and the invalid ones are reported by index
+    """
+    rows = [{'package_name': f'Bulk Package {n}', 'category': 'Bulk', 'rating': 1 + n % 5} for n in range(25)]
+    rows.insert(3, {'package_name': 'Invalid Rating', 'category': 'Bulk', 'rating': 9})
+    rows.insert(7, 'not an object')
+
+    response = test_client.post('/api/v1/packages', json=rows)
+    assert response.status_code == 207
+    assert response.json['created'] == 25
+    assert len(response.json['ids']) == 25
+    assert [error['index'] for error in response.json['errors']] == [3, 7]
+    assert Package.query.filter_by(category='Bulk').count() == 25
+
+
+def test_bulk_create_requires_array(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN '/api/v1/packages' is posted to (POST) with a JSON object instead of an array
+    THEN check that a '400' (Bad Request) JSON error is returned
+    """
+    response = test_client.post('/api/v1/packages', json={'package_name': 'Not a list'})
+    assert response.status_code == 400
+    assert response.json['error'] == 'Bad Request'
+
+
+def test_bulk_update_packages(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN '/api/v1/packages' is patched (PATCH) with owned and unknown package ids
+    THEN check the owned packages are updated and the unknown ids are reported
+    """
+    ids = test_client.post('/api/v1/packages', json=[
+        {'package_name': 'Before Update', 'category': 'Update', 'rating': 1},
+        {'package_name': 'Before Update', 'category': 'Update', 'rating': 1},
+    ]).json['ids']
+
+    response = test_client.patch('/api/v1/packages', json=[
+        {'id': ids[0], 'rating': 5},
+        {'id': ids[1], 'package_name': 'After Update'},
+        {'id': 987654, 'rating': 2},
+    ])
+    assert response.status_code == 207
+    assert response.json['updated'] == 2
+    assert response.json['errors'][0]['index'] == 2
+
+    db.session.expire_all()
+    assert db.session.get(Package, ids[0]).rating == 5
+    assert db.session.get(Package, ids[1]).package_name == 'After Update'
+    assert db.session.get(Package, ids[1]).rating == 1
+
+
+def test_bulk_delete_packages(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN '/api/v1/packages' is sent a DELETE with a list of ids
+    THEN check the owned packages are deleted
+    """
+    ids = test_client.post('/api/v1/packages', json=[
+        {'package_name': 'To Delete', 'category': 'Delete', 'rating': 3} for _ in range(3)
+    ]).json['ids']
+
+    response = test_client.delete('/api/v1/packages', json={'ids': ids})
+    assert response.status_code == 200
+    assert response.json == {'deleted': 3, 'errors': []}
+    assert Package.query.filter_by(category='Delete').count() == 0
@@ -0,0 +1,101 @@
+"""
+This file (test_async_api.py) contains the functional tests for the async
+read-only endpoints of the `api` blueprint.
+"""
+import asyncio
+
+from src import db
+from src.models import Freelancer, Package
+
+
+def default_freelancer():
+    return Freelancer.query.filter_by(email='tovban.freelancer@gmail.com').first()
+
+
+def test_get_package(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN '/api/v1/packages/<id>' is requested (GET) without a user logged in
+    THEN check the package is returned as JSON
+    """
+    package = Package.query.filter_by(package_name='Malibu Rising').first()
+    response = test_client.get(f'/api/v1/packages/{package.id}')
+    assert response.status_code == 200
+    assert response.json == {'id': package.id, 'package_name': 'Malibu Rising', 'category': 'Taylor Jenkins Reid',
+                             'rating': 5, 'freelancer_id': package.freelancer_id}
+
+
+def test_get_unknown_package(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN '/api/v1/packages/<id>' is requested (GET) for a package that does not exist
+    THEN check that a '404' (Not Found) JSON error is returned
+    """
+    response = test_client.get('/api/v1/packages/987654')
+    assert response.status_code == 404
+    assert response.json['error'] == 'Not Found'
+
+
+def test_get_freelancer(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN '/api/v1/freelancers/<id>' is requested (GET)
+    THEN check the public profile and package statistics are returned, without the email address
+    """
+    freelancer = default_freelancer()
+    response = test_client.get(f'/api/v1/freelancers/{freelancer.id}')
+    assert response.status_code == 200
+    assert response.json['full_name'] == 'Sophat Chhay'
+    assert 'email' not in response.json
+    statistics = response.json['statistics']
+    assert statistics['package_count'] == Package.query.filter_by(freelancer_id=freelancer.id).count()
+    assert statistics['categories']['Taylor Jenkins Reid'] == 2
+
+    assert test_client.get('/api/v1/freelancers/987654').status_code == 404
+
+
+def test_list_freelancer_packages(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN '/api/v1/freelancers/<id>/packages' is requested (GET) page by page
+    THEN check every package is returned once, in id order, and the last page has no next cursor
+    """
+    freelancer = default_freelancer()
+    expected = db.session.execute(
+        db.select(Package.id).where(Package.freelancer_id == freelancer.id).order_by(Package.id)
+    ).scalars().all()
+
+    ids, after = [], 0
+    while after is not None:
+        response = test_client.get(f'/api/v1/freelancers/{freelancer.id}/packages?per_page=2&after={after}')
+        assert response.status_code == 200
+        assert len(response.json['results']) <= 2
+        ids.extend(package['id'] for package in response.json['results'])
+        after = response.json['next_after']
+    assert ids == expected
+
+
+def test_async_engine_pool(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the async engine is used on an attached event loop and on another loop
+    THEN check the attached loop gets the pooled engine and other loops an unpooled one
+    """
+    async_db = test_client.application.extensions['async_db']
+
+    async def engines():
+        async_db.attach(asyncio.get_running_loop())
+        try:
+            pooled = async_db.engine
+            unpooled = await asyncio.to_thread(asyncio.run, unattached_engine())
+        finally:
+            await async_db.detach()
+        return pooled, unpooled
+
+    async def unattached_engine():
+        return async_db.engine
+
+    pooled, unpooled = asyncio.run(engines())
+    assert pooled is not unpooled
+    assert type(unpooled.pool).__name__ == 'NullPool'
+    assert async_db.event_loop is None
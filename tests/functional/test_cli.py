@@ -1,6 +1,15 @@
 """
 This file (test_cli.py) contains the functional tests for the CLI (Command-Line Interface) functions.
 """
+from src import db
+from src.models import Freelancer, Package
+
+
+def create_freelancer(email: str) -> int:
+    freelancer = Freelancer('CLI Tester', email, 'SecretPass')
+    db.session.add(freelancer)
+    db.session.commit()
+    return freelancer.id
 
 
 def test_initialize_database(cli_test_client):
@@ -12,3 +21,73 @@ def test_initialize_database(cli_test_client):
     output = cli_test_client.invoke(args=['init_db'])
     assert output.exit_code == 0
     assert 'Initialized the database!' in output.output
+
+
+def test_import_and_export_packages_csv(test_client, cli_test_client, tmp_path):
+    """
+    GIVEN a Flask application configured for testing and a CSV file of packages
+    WHEN the 'flask packages import' and 'flask packages export' commands are called
+    THEN check the valid rows are imported, the invalid row is skipped and the export matches
+    """
+    freelancer_id = create_freelancer('cli.csv@gmail.com')
+    import_file = tmp_path / 'packages.csv'
+    import_file.write_text('package_name,category,rating\n'
+                           'CLI Package One,CLI Category,5\n'
+                           'CLI Package Two,CLI Category,9\n'
+                           'CLI Package Three,CLI Category,2\n')
+
+    output = cli_test_client.invoke(args=['packages', 'import', str(import_file),
+                                          '--freelancer-id', str(freelancer_id)])
+    assert output.exit_code == 0
+    assert 'Imported 2 packages (1 skipped)' in output.output
+
+    export_file = tmp_path / 'export.ndjson'
+    output = cli_test_client.invoke(args=['packages', 'export', str(export_file),
+                                          '--freelancer-id', str(freelancer_id)])
+    assert output.exit_code == 0
+    lines = export_file.read_text().splitlines()
+    assert len(lines) == 2
+    assert '"package_name": "CLI Package One"' in lines[0]
+    assert f'"freelancer_id": {freelancer_id}' in lines[1]
+
+
+def test_import_packages_ndjson_uses_freelancer_column(test_client, cli_test_client, tmp_path):
+    """
+    GIVEN a Flask application configured for testing and an NDJSON file of packages
+    WHEN the 'flask packages import' command is called without --freelancer-id
+    THEN check each package is assigned to the freelancer of its row
+    """
+    freelancer_id = create_freelancer('cli.ndjson@gmail.com')
+    import_file = tmp_path / 'packages.ndjson'
+    import_file.write_text(f'{{"package_name": "NDJSON Package", "category": "CLI", "rating": 4, '
+                           f'"freelancer_id": {freelancer_id}}}\n'
+                           'not json\n'
+                           '{"package_name": "No Owner", "category": "CLI", "rating": 4}\n')
+
+    output = cli_test_client.invoke(args=['packages', 'import', str(import_file)])
+    assert output.exit_code == 0
+    assert 'Imported 1 packages (2 skipped)' in output.output
+
+    output = cli_test_client.invoke(args=['packages', 'export', '--format', 'csv',
+                                          '--freelancer-id', str(freelancer_id)])
+    assert output.exit_code == 0
+    assert f'NDJSON Package,CLI,4,{freelancer_id}' in output.output
+
+
+def test_import_packages_skips_unknown_freelancers(test_client, cli_test_client, tmp_path):
+    """
+    GIVEN an NDJSON file of packages, one of them owned by a freelancer that does not exist
+    WHEN the 'flask packages import' command is called with chunks of one row
+    THEN check the package of the unknown freelancer is skipped and the other chunks are imported
+    """
+    freelancer_id = create_freelancer('cli.unknown@gmail.com')
+    import_file = tmp_path / 'packages.ndjson'
+    import_file.write_text(''.join(f'{{"package_name": "Owned {number}", "category": "CLI Owners", "rating": 4, '
+                                   f'"freelancer_id": {owner}}}\n'
+                                   for number, owner in enumerate([freelancer_id, 987654, freelancer_id])))
+
+    output = cli_test_client.invoke(args=['packages', 'import', str(import_file), '--chunk-size', '1'])
+    assert output.exit_code == 0
+    assert 'Skipping row 2: unknown freelancer 987654' in output.output
+    assert 'Imported 2 packages (1 skipped)' in output.output
+    assert db.session.scalar(db.select(db.func.count()).where(Package.category == 'CLI Owners')) == 2
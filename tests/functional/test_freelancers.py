@@ -189,3 +189,79 @@ def test_status_page(test_client):
     assert b'Database initialized: True' in response.data
     assert b'Database `users` table created: True' in response.data
     assert b'Database `books` table created: True' in response.data
+
+
+def test_status_live(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/status/live' page is requested (GET)
+    THEN check the liveness response is returned as JSON
+    """
+    response = test_client.get('/status/live')
+    assert response.status_code == 200
+    assert response.json == {'status': 'ok'}
+
+
+def test_status_ready(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/status/ready' page is requested (GET)
+    THEN check the readiness response reports the database and its latency
+    """
+    response = test_client.get('/status/ready')
+    assert response.status_code == 200
+    assert response.json['status'] == 'ok'
+    assert response.json['database'] is True
+    assert response.json['latency_ms'] >= 0
+
+
+def test_metrics_endpoint(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/metrics' page is requested (GET) after another page
+    THEN check the request metrics are exposed per endpoint in the text format
+    """
+    test_client.get('/login')
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    assert b'# TYPE flask_request_latency_seconds histogram' in response.data
+    assert b'flask_requests_total{endpoint="freelancers.login",status="200"}' in response.data
+    assert b'flask_requests_in_flight{endpoint="metrics"} 1.0' in response.data
+
+
+def test_profile_package_statistics(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+          and the default set of packages in the database
+    WHEN the '/profile' page is requested (GET)
+    THEN check the package count, average rating and counts per category are displayed
+    """
+    response = test_client.get('/profile')
+    assert response.status_code == 200
+    assert b'Packages: 3' in response.data
+    assert b'Average rating: 4.0' in response.data
+    assert b'<td>Taylor Jenkins Reid</td><td>2</td>' in response.data
+    assert b'<td>Emily Henry</td><td>1</td>' in response.data
+
+
+def test_profile_summary_fragment_cache(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN the '/profile' page is requested (GET) twice, and again after a package is added
+    THEN check the cached package statistics are reused until the packages change
+    """
+    fragment_cache = test_client.application.extensions['fragment_cache']
+    test_client.get('/profile')
+    hits = fragment_cache.stats()['hits']
+
+    response = test_client.get('/profile')
+    assert fragment_cache.stats()['hits'] > hits
+    assert b'Packages: 3' in response.data
+
+    test_client.post('/api/v1/packages', json=[{'package_name': 'Fragment', 'category': 'Caching', 'rating': 5}])
+    response = test_client.get('/profile')
+    assert b'Packages: 4' in response.data
+
+    metrics = test_client.get('/metrics').data.decode()
+    assert 'jinja_fragment_cache_hits_total{fragment="profile-summary"}' in metrics
@@ -0,0 +1,128 @@
+"""
+This file (test_http_cache.py) contains the functional tests for the HTTP
+caching of the package pages (ETag / Last-Modified) and static files.
+"""
+import pytest
+
+from src import db
+from src.models import Freelancer, Package
+
+
+@pytest.fixture(scope='function')
+def no_pending_flashes(test_client):
+    # Logging in flashes a message, and pages are never cached while one is pending,
+    # so render a page to display (and consume) it
+    test_client.get('/marketplace')
+
+
+def test_list_packages_not_modified(test_client, init_database, log_in_default_user, no_pending_flashes):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN the '/packages/' page is requested (GET) again with the ETag of the first response
+    THEN check that a '304' (Not Modified) response without a body is returned
+    """
+    response = test_client.get('/packages/')
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert 'no-cache' in response.headers['Cache-Control']
+
+    response = test_client.get('/packages/', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_list_packages_modified_after_change(test_client, init_database, log_in_default_user, no_pending_flashes):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN a package is changed, added in bulk and deleted after the page was cached
+    THEN check the cached ETag no longer matches after each change
+    """
+    def assert_modified(etag):
+        response = test_client.get('/packages/', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        return response.headers['ETag']
+
+    etag = test_client.get('/packages/').headers['ETag']
+    package = db.session.execute(db.select(Package).where(Package.package_name == 'Book Lovers')).scalar_one()
+    package.update(rating='1')
+    db.session.commit()
+    etag = assert_modified(etag)
+
+    ids = test_client.post('/api/v1/packages', json=[{'package_name': 'ETag', 'category': 'Caching', 'rating': 3}]).json['ids']
+    etag = assert_modified(etag)
+
+    test_client.delete('/api/v1/packages', json={'ids': ids})
+    assert_modified(etag)
+
+
+def test_list_packages_if_modified_since(test_client, init_database, log_in_default_user, no_pending_flashes):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN the '/packages/' page is requested (GET) with only the Last-Modified date of the first response
+    THEN check the page is rendered, since only the ETag validates cached pages
+    """
+    response = test_client.get('/packages/')
+    headers = {'If-Modified-Since': response.headers['Last-Modified']}
+    assert test_client.get('/packages/', headers=headers).status_code == 200
+
+    headers['If-None-Match'] = response.headers['ETag']
+    assert test_client.get('/packages/', headers=headers).status_code == 304
+
+
+def test_list_packages_with_pending_flash(test_client, init_database, log_in_default_user, no_pending_flashes):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN the '/packages/' page is requested (GET) with its ETag while a flash message is pending
+    THEN check the page is rendered so that the message is displayed
+    """
+    etag = test_client.get('/packages/').headers['ETag']
+    test_client.get('/login')
+
+    response = test_client.get('/packages/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Already logged in!' in response.data
+
+
+def test_profile_not_modified(test_client, init_database, log_in_default_user, no_pending_flashes):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN the '/profile' page is requested (GET) again with the ETag of the first response
+    THEN check that a '304' (Not Modified) response is returned
+    """
+    etag = test_client.get('/profile').headers['ETag']
+    assert test_client.get('/profile', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_package_versions(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing, with the default set of packages in the database
+    WHEN a package is updated
+    THEN check the package and its owner record when the change happened
+    """
+    package = db.session.execute(db.select(Package).where(Package.package_name == 'Malibu Rising')).scalar_one()
+    owner = db.session.get(Freelancer, package.freelancer_id)
+    version, created = owner.packages_version, package.updated_at
+    assert created is not None
+
+    package.update(package_name='Malibu Rising (2nd edition)')
+    db.session.commit()
+    assert package.updated_at >= created
+    assert owner.packages_version == version + 1
+
+
+def test_static_files_versioned(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the URL of a static file is built and requested (GET)
+    THEN check the URL carries a content hash and the file is cached for a year
+    """
+    with test_client.application.test_request_context():
+        from flask import url_for
+        url = url_for('static', filename='css/base.css')
+    assert '?v=' in url
+
+    response = test_client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.max_age == 365 * 24 * 60 * 60
+    assert response.cache_control.immutable
+    assert response.cache_control.public
@@ -0,0 +1,63 @@
+"""
+This file (test_instrumentation.py) contains the functional tests for the per-request
+SQL instrumentation.
+"""
+import logging
+import os
+
+from flask import current_app
+
+from src import create_app, db
+from src.models import Freelancer
+
+
+def test_instrumentation_disabled_by_default(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/status/ready' page is requested (GET)
+    THEN check no Server-Timing header is added
+    """
+    response = test_client.get('/status/ready')
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
+
+
+def test_server_timing_header(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application with SQL instrumentation enabled and the default user logged in
+    WHEN the '/packages/' page is requested (GET)
+    THEN check the Server-Timing header reports the queries of the request
+    """
+    current_app.config['SQL_INSTRUMENTATION_ENABLED'] = True
+    try:
+        response = test_client.get('/packages/')
+    finally:
+        current_app.config['SQL_INSTRUMENTATION_ENABLED'] = False
+
+    assert response.status_code == 200
+    server_timing = response.headers['Server-Timing']
+    assert server_timing.startswith('db;dur=')
+    assert 'queries"' in server_timing
+
+
+def test_n_plus_one_detection(test_client, init_database, caplog):
+    """
+    GIVEN a Flask application with SQL instrumentation enabled
+    WHEN a view lazy loads `Freelancer.packages_relationship` for each freelancer
+    THEN check an N+1 warning is logged
+    """
+    # Routes can only be added before the first request, so use a fresh application
+    os.environ['CONFIG_TYPE'] = 'config.config.TestingConfig'
+    app = create_app()
+
+    @app.route('/n-plus-one')
+    def n_plus_one():
+        freelancers = db.session.execute(db.select(Freelancer)).scalars().all()
+        return str(sum(len(freelancer.packages_relationship) for freelancer in freelancers))
+
+    app.config.update(SQL_INSTRUMENTATION_ENABLED=True, SQL_N_PLUS_ONE_THRESHOLD=2)
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        response = app.test_client().get('/n-plus-one')
+
+    assert response.status_code == 200
+    assert 'Possible N+1 query in n_plus_one' in caplog.text
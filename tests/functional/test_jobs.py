@@ -0,0 +1,198 @@
+"""
+This file (test_jobs.py) contains the functional tests for the background job queue.
+"""
+from datetime import timedelta
+
+import pytest
+
+from src import db, job_queue
+from src.jobs import Worker, enqueue
+from src.models import Job, Package, utcnow
+
+
+calls = []
+
+
+@job_queue.task('tests.record')
+def record(payload):
+    calls.append(payload)
+
+
+@job_queue.task('tests.fail', max_attempts=2)
+def fail(payload):
+    raise RuntimeError('Job failed on purpose')
+
+
+@pytest.fixture(scope='function')
+def jobs(test_client):
+    calls.clear()
+
+    yield  # this is where the testing happens!
+
+    db.session.rollback()
+    db.session.execute(db.delete(Job))
+    db.session.commit()
+
+
+def test_enqueue_with_idempotency_key(test_client, jobs):
+    """
+    GIVEN a registered task
+    WHEN jobs are enqueued twice with the same idempotency key and once without a key
+    THEN check only two jobs are queued, pending and due
+    """
+    enqueue('tests.record', {'n': 1}, idempotency_key='record-1')
+    enqueue('tests.record', {'n': 1}, idempotency_key='record-1')
+    enqueue('tests.record', {'n': 2})
+    db.session.commit()
+
+    queued = db.session.execute(db.select(Job).order_by(Job.id)).scalars().all()
+    assert [job.payload for job in queued] == [{'n': 1}, {'n': 2}]
+    assert all(job.status == 'pending' and job.run_at <= utcnow() for job in queued)
+    assert queued[0].max_attempts == test_client.application.config['JOB_MAX_ATTEMPTS']
+
+    with pytest.raises(ValueError):
+        enqueue('tests.unknown')
+
+
+def test_worker_runs_due_jobs(test_client, jobs):
+    """
+    GIVEN jobs that are due and a job delayed to later
+    WHEN a worker runs in burst mode with a thread pool
+    THEN check the due jobs ran and are done, and the delayed job is still pending
+    """
+    for n in range(3):
+        enqueue('tests.record', {'n': n})
+    enqueue('tests.record', {'n': 'later'}, delay=3600)
+    db.session.commit()
+
+    worker = Worker(test_client.application, concurrency=2, pool='thread', poll_interval=0.01)
+    worker.run(burst=True)
+
+    assert sorted(payload['n'] for payload in calls) == [0, 1, 2]
+    assert worker.completed == 3
+    statuses = db.session.execute(db.select(Job.status, Job.attempts, Job.locked_by).order_by(Job.id)).all()
+    assert statuses == [('done', 1, None)] * 3 + [('pending', 0, None)]
+
+
+def test_failing_job_is_retried_with_backoff(test_client, jobs):
+    """
+    GIVEN a task that always fails and is allowed two attempts
+    WHEN the worker runs it, then again once the backoff has elapsed
+    THEN check it is rescheduled after the backoff first, then marked as failed with the error
+    """
+    enqueue('tests.fail', {})
+    db.session.commit()
+    worker = Worker(test_client.application, concurrency=1, pool='thread', poll_interval=0.01)
+
+    worker.run(burst=True)
+    job = db.session.execute(db.select(Job)).scalar_one()
+    assert (job.status, job.attempts) == ('pending', 1)
+    assert 'Job failed on purpose' in job.last_error
+    backoff = test_client.application.config['JOB_RETRY_BACKOFF']
+    assert job.run_at >= utcnow() + timedelta(seconds=backoff - 5)
+
+    job.run_at = utcnow()
+    db.session.commit()
+    worker.run(burst=True)
+    db.session.refresh(job)
+    assert (job.status, job.attempts) == ('failed', 2)
+    assert job.finished_at is not None
+    assert worker.failed == 1
+
+
+def test_stale_running_job_is_claimed_again(test_client, jobs):
+    """
+    GIVEN a job left running by a worker that died
+    WHEN another worker runs after the lock timeout
+    THEN check the job is run again
+    """
+    enqueue('tests.record', {'n': 'stale'})
+    db.session.commit()
+    job = db.session.execute(db.select(Job)).scalar_one()
+    job.status, job.attempts, job.locked_by = 'running', 1, 'dead-worker'
+    job.locked_at = utcnow() - timedelta(seconds=test_client.application.config['JOB_LOCK_TIMEOUT'] + 1)
+    db.session.commit()
+
+    Worker(test_client.application, concurrency=1, pool='thread', poll_interval=0.01).run(burst=True)
+
+    db.session.refresh(job)
+    assert calls == [{'n': 'stale'}]
+    assert (job.status, job.attempts) == ('done', 2)
+
+
+def test_worker_command(test_client, cli_test_client, jobs):
+    """
+    GIVEN a queued job
+    WHEN the 'flask worker --burst' command is called
+    THEN check the job is run and the summary is printed
+    """
+    enqueue('tests.record', {'n': 'cli'})
+    db.session.commit()
+
+    output = cli_test_client.invoke(args=['worker', '--burst', '--concurrency', '1'])
+    assert output.exit_code == 0
+    assert '1 jobs done, 0 failed' in output.output
+    assert calls == [{'n': 'cli'}]
+
+
+def test_worker_prunes_finished_jobs(test_client, cli_test_client, jobs):
+    """
+    GIVEN done and failed jobs finished before and after the retention period, and a pending job
+    WHEN the worker runs and then the 'flask worker --prune' command is called
+    THEN check only the finished jobs older than `JOB_RETENTION` are deleted
+    """
+    retention = timedelta(seconds=test_client.application.config['JOB_RETENTION'])
+    for n, status, age in ((1, 'done', 2 * retention), (2, 'failed', 2 * retention), (3, 'done', timedelta(0)),
+                           (4, 'pending', 2 * retention), (5, 'done', 2 * retention)):
+        enqueue('tests.record', {'n': n}, delay=3600)
+        db.session.flush()
+        if status != 'pending':
+            job = db.session.execute(db.select(Job).where(Job.payload['n'].as_integer() == n)).scalar_one()
+            job.status, job.finished_at = status, utcnow() - age
+    db.session.commit()
+
+    Worker(test_client.application, concurrency=1, pool='thread', poll_interval=0.01).run(burst=True)
+    remaining = db.session.execute(db.select(Job.payload).order_by(Job.id)).scalars().all()
+    assert remaining == [{'n': 3}, {'n': 4}]
+
+    db.session.execute(db.update(Job).where(Job.status == 'pending')
+                       .values(status='done', finished_at=utcnow() - 2 * retention))
+    db.session.commit()
+    output = cli_test_client.invoke(args=['worker', '--prune'])
+    assert output.exit_code == 0
+    assert 'Deleted 1 finished jobs' in output.output
+    assert db.session.execute(db.select(Job.payload)).scalars().all() == [{'n': 3}]
+
+
+def test_add_package_enqueues_job(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a logged in freelancer
+    WHEN a package is added
+    THEN check a job logging the change is queued with the package
+    """
+    response = test_client.post('/packages/add',
+                                data={'package_title': 'Queued Package', 'package_author': 'Jobs',
+                                      'package_rating': '4'})
+    assert response.status_code == 302
+
+    job = db.session.execute(db.select(Job).where(Job.name == 'packages.log_change')).scalar_one()
+    assert job.payload['action'] == 'added'
+    assert job.payload['package_name'] == 'Queued Package'
+    assert job.idempotency_key.startswith('package-added:')
+
+
+def test_resubmitted_edit_enqueues_one_job(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a logged in freelancer
+    WHEN the same package edit form is submitted twice
+    THEN check a single job logging the change is queued
+    """
+    package = db.session.execute(db.select(Package).where(Package.package_name == 'Book Lovers')).scalar_one()
+    form = {'package_name': 'Book Lovers (2nd edition)', 'category': 'Emily Henry', 'rating': '4'}
+    for _ in range(2):
+        response = test_client.post(f'/packages/{package.id}/edit', data=form)
+        assert response.status_code == 302
+
+    jobs = db.session.execute(db.select(Job).where(Job.name == 'packages.log_change')).scalars().all()
+    assert [job.payload['action'] for job in jobs] == ['updated']
+    assert jobs[0].idempotency_key.startswith(f'package-updated:{package.id}:')
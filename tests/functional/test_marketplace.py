@@ -0,0 +1,127 @@
+"""
+This file (test_marketplace.py) contains the functional tests for the public
+'/marketplace' listing and its facet counts.
+"""
+from src import db
+from src.marketplace import marketplace_cache
+from src.models import Package, PackageFacet
+
+
+def facet_table():
+    rows = db.session.execute(db.select(PackageFacet).where(PackageFacet.package_count > 0)).scalars()
+    return {(facet.category, facet.rating): facet.package_count for facet in rows}
+
+
+def test_marketplace_page(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing, with the default set of packages in the database
+    WHEN the '/marketplace' page is requested (GET) without a user logged in
+    THEN check every package is listed with its facet counts, best rated first
+    """
+    response = test_client.get('/marketplace')
+    assert response.status_code == 200
+    html = response.data.decode()
+    assert html.index('Malibu Rising') < html.index('Carrie Soto is Back') < html.index('Book Lovers')
+    assert 'Taylor Jenkins Reid</a> (2)' in html
+    assert 'Emily Henry</a> (1)' in html
+
+
+def test_marketplace_filters(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing, with the default set of packages in the database
+    WHEN the '/marketplace' page is requested (GET) with a category and a minimum rating
+    THEN check only the matching packages are listed and the facets follow the other filter
+    """
+    response = test_client.get('/marketplace?category=Taylor+Jenkins+Reid&min_rating=5')
+    assert response.status_code == 200
+    assert b'Malibu Rising' in response.data
+    assert b'Carrie Soto is Back' not in response.data
+    assert b'Book Lovers' not in response.data
+    # Rating facets are restricted to the category, category facets to the minimum rating
+    assert b'(1 rated 4)' in response.data
+    assert b'Emily Henry</a>' not in response.data
+
+
+def test_marketplace_sort_and_pagination(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing, with the default set of packages in the database
+    WHEN the '/marketplace' page is requested (GET) by recency, one package per page
+    THEN check the newest package comes first and the next page link continues from it
+    """
+    response = test_client.get('/marketplace?sort=recent&per_page=1')
+    assert b'Book Lovers' in response.data
+    assert b'Malibu Rising' not in response.data
+    assert b'Next page' in response.data
+
+    newest = db.session.execute(db.select(db.func.max(Package.id))).scalar()
+    response = test_client.get(f'/marketplace?sort=recent&per_page=1&after={newest}')
+    assert b'Carrie Soto is Back' in response.data
+
+
+def test_marketplace_invalid_parameters(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/marketplace' page is requested (GET) with an invalid sort, rating or cursor
+    THEN check that a '400' (Bad Request) error is returned
+    """
+    assert test_client.get('/marketplace?sort=price').status_code == 400
+    assert test_client.get('/marketplace?min_rating=9').status_code == 400
+    assert test_client.get('/marketplace?after=abc').status_code == 400
+
+
+def test_facets_follow_orm_changes(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing, with the default set of packages in the database
+    WHEN a package is updated and then deleted through the ORM
+    THEN check the facet summary table is adjusted each time
+    """
+    assert facet_table() == {('Taylor Jenkins Reid', 5): 1, ('Taylor Jenkins Reid', 4): 1, ('Emily Henry', 3): 1}
+
+    package = db.session.execute(db.select(Package).where(Package.package_name == 'Book Lovers')).scalar_one()
+    package.update(category='Taylor Jenkins Reid', rating='5')
+    db.session.commit()
+    assert facet_table() == {('Taylor Jenkins Reid', 5): 2, ('Taylor Jenkins Reid', 4): 1}
+
+    db.session.delete(package)
+    db.session.commit()
+    assert facet_table() == {('Taylor Jenkins Reid', 5): 1, ('Taylor Jenkins Reid', 4): 1}
+
+
+def test_facets_follow_bulk_changes(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN packages are created, updated and deleted through the bulk API
+    THEN check the facet summary table is adjusted for every batch
+    """
+    before = facet_table()
+    ids = test_client.post('/api/v1/packages', json=[
+        {'package_name': f'Facet {n}', 'category': 'Facets', 'rating': 2} for n in range(3)
+    ]).json['ids']
+    assert facet_table() == {**before, ('Facets', 2): 3}
+
+    test_client.patch('/api/v1/packages', json=[{'id': ids[0], 'rating': 5}, {'id': ids[1], 'package_name': 'Renamed'}])
+    assert facet_table() == {**before, ('Facets', 2): 2, ('Facets', 5): 1}
+
+    test_client.delete('/api/v1/packages', json={'ids': ids})
+    assert facet_table() == before
+
+
+def test_marketplace_cache(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing with a marketplace cache TTL
+    WHEN the '/marketplace' page is requested (GET) again after a new package was added
+    THEN check the cached page is served until the cache is cleared
+    """
+    test_client.application.config['MARKETPLACE_CACHE_TTL'] = 60
+    marketplace_cache.clear()
+    try:
+        test_client.get('/marketplace')
+        db.session.add(Package('Cached Package', 'Caching', '5', 1))
+        db.session.commit()
+
+        assert b'Cached Package' not in test_client.get('/marketplace').data
+        marketplace_cache.clear()
+        assert b'Cached Package' in test_client.get('/marketplace').data
+    finally:
+        test_client.application.config['MARKETPLACE_CACHE_TTL'] = 0
+        marketplace_cache.clear()
@@ -0,0 +1,53 @@
+"""
+This file (test_package_listing.py) contains the functional tests for the paginated
+and streamed package listing of the `packages` blueprint.
+"""
+import re
+
+
+def test_list_packages_first_page(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+          and the default set of packages in the database
+    WHEN the '/packages/?per_page=2' page is requested (GET)
+    THEN check only the first two packages are displayed with a link to the next page
+    """
+    response = test_client.get('/packages/?per_page=2')
+    assert response.status_code == 200
+    assert b'Malibu Rising' in response.data
+    assert b'Carrie Soto is Back' in response.data
+    assert b'Book Lovers' not in response.data
+    assert b'Next page' in response.data
+
+
+def test_list_packages_next_page(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+          and the default set of packages in the database
+    WHEN the next page link of the first page is followed (GET)
+    THEN check the remaining package is displayed without a link to a further page
+    """
+    response = test_client.get('/packages/?per_page=2')
+    next_url = re.search(r'href="([^"]*after=[^"]*)"', response.data.decode()).group(1).replace('&amp;', '&')
+
+    response = test_client.get(next_url)
+    assert response.status_code == 200
+    assert b'Book Lovers' in response.data
+    assert b'Malibu Rising' not in response.data
+    assert b'Next page' not in response.data
+
+
+def test_list_packages_streamed(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+          and the default set of packages in the database
+    WHEN the '/packages/?stream=1' page is requested (GET)
+    THEN check the whole catalogue is streamed without pagination
+    """
+    response = test_client.get('/packages/?stream=1')
+    assert response.status_code == 200
+    assert response.is_streamed
+    data = response.get_data()
+    for package_name in [b'Malibu Rising', b'Carrie Soto is Back', b'Book Lovers']:
+        assert package_name in data
+    assert b'Next page' not in data
@@ -0,0 +1,160 @@
+"""
+This file (test_replica.py) contains the functional tests for the routing of
+reads to a read replica, with two SQLite files standing in for the primary
+and the replica. The replica only receives the primary's data when
+`replicate` is called, like a replica with a very long lag.
+"""
+import os
+import sqlite3
+
+import pytest
+
+from config.config import TestingConfig, replica_binds
+from src import create_app, db, health
+from src.models import Freelancer, Package
+from src.replica import REPLICA_BIND
+
+
+class ReplicaTestingConfig(TestingConfig):
+    # The database files are set by the `replica_client` fixture
+    REPLICA_STICKY_SECONDS = 0
+
+
+def replicate():
+    """Copy the primary database into the replica."""
+    with sqlite3.connect(ReplicaTestingConfig.PRIMARY_PATH) as primary, \
+            sqlite3.connect(ReplicaTestingConfig.REPLICA_PATH) as replica:
+        primary.backup(replica)
+
+
+@pytest.fixture(scope='module')
+def replica_client(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('replica')
+    ReplicaTestingConfig.PRIMARY_PATH = str(directory / 'primary.db')
+    ReplicaTestingConfig.REPLICA_PATH = str(directory / 'replica.db')
+    ReplicaTestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{ReplicaTestingConfig.PRIMARY_PATH}'
+    ReplicaTestingConfig.SQLALCHEMY_BINDS = replica_binds(f'sqlite:///{ReplicaTestingConfig.REPLICA_PATH}',
+                                                          TestingConfig.SQLALCHEMY_ENGINE_OPTIONS)
+
+    config_type = os.environ.get('CONFIG_TYPE')
+    os.environ['CONFIG_TYPE'] = f'{__name__}.ReplicaTestingConfig'
+    flask_app = create_app()
+    os.environ['CONFIG_TYPE'] = config_type or 'config.config.TestingConfig'
+
+    with flask_app.test_client() as testing_client:
+        with flask_app.app_context():
+            freelancer = Freelancer('Replica Reader', 'replica.reader@example.com', 'ReplicaPass')
+            db.session.add(freelancer)
+            db.session.commit()
+            db.session.add(Package('Replicated Package', 'Replication', '4', freelancer.id))
+            db.session.commit()
+            replicate()
+
+            testing_client.post('/login', data={'email': 'replica.reader@example.com', 'password': 'ReplicaPass'})
+            yield testing_client
+            testing_client.get('/logout')
+            db.session.remove()
+
+    # `db` registered an (empty) metadata for the bind, which the apps of other tests do not have
+    db.metadatas.pop(REPLICA_BIND, None)
+
+
+def add_to_primary(package_name: str) -> int:
+    """Add a package to the primary only (not replicated yet) and return its id."""
+    freelancer = Freelancer.query.filter_by(email='replica.reader@example.com').one()
+    package = Package(package_name, 'Replication', '3', freelancer.id)
+    db.session.add(package)
+    db.session.commit()
+    return package.id
+
+
+def test_get_reads_from_replica(replica_client):
+    """
+    GIVEN a Flask application with a read replica, and a package only added to the primary
+    WHEN the '/packages/' page is requested (GET)
+    THEN check the page is read from the replica, which does not have the new package yet
+    """
+    add_to_primary('Lagging Package')
+
+    response = replica_client.get('/packages/')
+    assert response.status_code == 200
+    assert b'Replicated Package' in response.data
+    assert b'Lagging Package' not in response.data
+
+    replicate()
+    assert b'Lagging Package' in replica_client.get('/packages/').data
+
+
+def test_read_your_writes(replica_client):
+    """
+    GIVEN a Flask application with a read replica that lags behind the primary
+    WHEN a package is added through the API and the '/packages/' page is requested (GET) right after
+    THEN check the user's page is read from the primary and shows the new package until the window ends
+    """
+    replica_client.application.config['REPLICA_STICKY_SECONDS'] = 60
+    try:
+        response = replica_client.post('/api/v1/packages',
+                                       json=[{'package_name': 'Fresh Package', 'category': 'Replication', 'rating': 5}])
+        assert response.status_code == 201
+        assert b'Fresh Package' in replica_client.get('/packages/').data
+    finally:
+        replica_client.application.config['REPLICA_STICKY_SECONDS'] = 0
+
+    # A write with no stickiness window lets the next page be read from the (stale) replica
+    replica_client.post('/api/v1/packages', json=[{'package_name': 'Unsticky Package', 'category': 'Replication',
+                                                  'rating': 5}])
+    response = replica_client.get('/packages/')
+    assert b'Fresh Package' not in response.data
+    assert b'Unsticky Package' not in response.data
+
+
+def test_writing_view_uses_primary(replica_client):
+    """
+    GIVEN a Flask application with a read replica, and a package only added to the primary
+    WHEN the package is deleted with its delete link (GET)
+    THEN check the view reads the package from the primary and deletes it there
+    """
+    package_id = add_to_primary('Unreplicated Package')
+
+    response = replica_client.get(f'/packages/{package_id}/delete')
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Package, package_id) is None
+
+
+def test_replica_pool_metrics(replica_client):
+    """
+    GIVEN a Flask application with a read replica
+    WHEN the '/status/ready' page is requested (GET)
+    THEN check the pools of both the primary and the replica are reported
+    """
+    assert set(replica_client.get('/status/ready').json['database_pool']) == {'default', 'replica'}
+
+
+def test_health_checks_use_replica(replica_client):
+    """
+    GIVEN a Flask application with a read replica that lost the 'packages' table
+    WHEN the tables are checked for the status page (GET) and the '/status/ready' page is requested (GET)
+    THEN check the table check reads the replica, and readiness reports the primary and the replica separately
+    """
+    app = replica_client.application
+    with sqlite3.connect(ReplicaTestingConfig.REPLICA_PATH) as replica:
+        replica.execute('DROP TABLE packages')
+    health.invalidate_table_status()
+    try:
+        with app.test_request_context('/status'):
+            app.preprocess_request()
+            assert health.table_exists('freelancers') is True
+            assert health.table_exists('packages') is False
+        with app.test_request_context('/status', method='POST'):
+            app.preprocess_request()
+            assert health.table_exists('packages') is True
+    finally:
+        replicate()
+        health.invalidate_table_status()
+
+    result = replica_client.get('/status/ready').json
+    assert result['status'] == 'ok'
+    assert result['database'] is True
+    assert result['replica']['database'] is True
+    assert result['replica']['latency_ms'] >= 0
@@ -0,0 +1,87 @@
+"""
+This file (test_schema.py) contains the functional tests for the versioned schema bootstrap.
+"""
+import sqlalchemy as sqla
+from flask import current_app
+
+from src import db
+from src.models import Freelancer, SchemaVersion
+from src.schema import SCHEMA_VERSION, current_schema_version, ensure_schema, narrow_columns
+
+
+def test_schema_is_stamped_on_startup(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the application has been created
+    THEN check the database is stamped with the current schema version
+    """
+    assert current_schema_version() == SCHEMA_VERSION
+
+
+def test_ensure_schema_skips_ddl_when_current(test_client):
+    """
+    GIVEN a database stamped with the current schema version
+    WHEN the schema bootstrap runs again (e.g. another worker starts)
+    THEN check that no DDL is run
+    """
+    assert ensure_schema(current_app._get_current_object()) is False
+
+
+def test_ensure_schema_upgrades_without_dropping_data(test_client):
+    """
+    GIVEN a database containing a freelancer but without a schema version stamp
+    WHEN the schema bootstrap runs
+    THEN check the schema is stamped again and the existing data is kept
+    """
+    freelancer = Freelancer('Schema Tester', 'schema.tester@gmail.com', 'SecretPass')
+    db.session.add(freelancer)
+    db.session.commit()
+    SchemaVersion.__table__.drop(db.engine)
+    assert current_schema_version() is None
+
+    assert ensure_schema(current_app._get_current_object()) is True
+    assert current_schema_version() == SCHEMA_VERSION
+    assert Freelancer.query.filter_by(email='schema.tester@gmail.com').first() is not None
+
+    db.session.delete(freelancer)
+    db.session.commit()
+
+
+def test_package_indexes_created(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the schema has been bootstrapped
+    THEN check the freelancer-scoped composite indexes exist on the packages table
+    """
+    index_names = {index['name'] for index in sqla.inspect(db.engine).get_indexes('packages')}
+    assert {'ix_packages_freelancer_id_id',
+            'ix_packages_freelancer_id_category',
+            'ix_packages_freelancer_id_rating'} <= index_names
+
+
+def test_upgrade_adds_missing_columns(test_client):
+    """
+    GIVEN a database whose packages table predates the `updated_at` column
+    WHEN the schema bootstrap runs
+    THEN check the column is added to the existing table
+    """
+    with db.engine.begin() as connection:
+        connection.execute(sqla.text('ALTER TABLE packages DROP COLUMN updated_at'))
+    SchemaVersion.__table__.drop(db.engine)
+
+    assert ensure_schema(current_app._get_current_object()) is True
+    assert 'updated_at' in {column['name'] for column in sqla.inspect(db.engine).get_columns('packages')}
+
+
+def test_upgrade_finds_narrow_columns():
+    """
+    GIVEN a database whose freelancers table predates the wider `password_hashed` column
+    WHEN the string columns are compared with the models
+    THEN check the column is found to need widening
+    """
+    engine = sqla.create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(sqla.text('CREATE TABLE freelancers (id INTEGER PRIMARY KEY, full_name VARCHAR, '
+                                     'email VARCHAR, password_hashed VARCHAR(128))'))
+        narrow = [(table.name, column.name) for table, column in narrow_columns(connection)]
+    assert narrow == [('freelancers', 'password_hashed')]
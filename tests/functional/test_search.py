@@ -0,0 +1,90 @@
+"""
+This file (test_search.py) contains the functional tests for the full-text
+search of packages (`/packages/search` and `/api/v1/packages/search`).
+"""
+from src import db
+from src.models import Package
+
+
+def test_search_page(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+          and the default set of packages in the database
+    WHEN the '/packages/search?q=taylor' page is requested (GET)
+    THEN check only the packages whose category matches are displayed
+    """
+    response = test_client.get('/packages/search?q=taylor')
+    assert response.status_code == 200
+    assert b'Malibu Rising' in response.data
+    assert b'Carrie Soto is Back' in response.data
+    assert b'Book Lovers' not in response.data
+
+
+def test_search_prefix_and_ranking(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN '/api/v1/packages/search' is requested (GET) with a word prefix
+    THEN check a match on the package name ranks before a match on the category
+    """
+    response = test_client.post('/api/v1/packages', json=[
+        {'package_name': 'Logo design', 'category': 'Graphics', 'rating': 4},
+        {'package_name': 'Brand kit', 'category': 'Logo work', 'rating': 5},
+    ])
+    assert response.status_code == 201
+
+    response = test_client.get('/api/v1/packages/search?q=log')
+    assert response.status_code == 200
+    assert [result['package_name'] for result in response.json['results']] == ['Logo design', 'Brand kit']
+    assert response.json['next_page'] is None
+
+
+def test_search_follows_updates_and_deletes(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN a package is renamed and another is deleted through the ORM
+    THEN check the search results reflect both changes
+    """
+    package = db.session.execute(db.select(Package).where(Package.package_name == 'Book Lovers')).scalar_one()
+    package.update(package_name='Beach Read')
+    db.session.commit()
+
+    response = test_client.get('/api/v1/packages/search?q=beach')
+    assert [result['id'] for result in response.json['results']] == [package.id]
+    assert test_client.get('/api/v1/packages/search?q=lovers').json['results'] == []
+
+    db.session.delete(package)
+    db.session.commit()
+    assert test_client.get('/api/v1/packages/search?q=beach').json['results'] == []
+
+
+def test_search_pagination(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN '/api/v1/packages/search' is requested (GET) one page at a time
+    THEN check every match is returned exactly once across the pages
+    """
+    test_client.post('/api/v1/packages', json=[
+        {'package_name': f'Paged package {n}', 'category': 'Paging', 'rating': 3} for n in range(5)
+    ])
+
+    first = test_client.get('/api/v1/packages/search?q=paging&per_page=3').json
+    assert first['next_page'] == 2
+    second = test_client.get('/api/v1/packages/search?q=paging&per_page=3&page=2').json
+    assert second['next_page'] is None
+
+    ids = [result['id'] for result in first['results'] + second['results']]
+    assert len(ids) == len(set(ids)) == 5
+
+
+def test_search_sanitizes_query(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN '/api/v1/packages/search' is requested (GET) with FTS syntax or without a query
+    THEN check the query is treated as plain words and a missing query is a '400' error
+    """
+    response = test_client.get('/api/v1/packages/search', query_string={'q': 'taylor" OR NEAR(*'})
+    assert response.status_code == 200
+    assert response.json['results'] == []
+
+    response = test_client.get('/api/v1/packages/search')
+    assert response.status_code == 400
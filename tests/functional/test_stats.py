@@ -0,0 +1,98 @@
+"""
+This file (test_stats.py) contains the functional tests for the freelancer
+package statistics summary tables.
+"""
+from src import db
+from src.models import Freelancer, FreelancerCategoryStats, FreelancerStats, Package
+from src.stats import package_statistics
+
+
+def default_user_id():
+    return db.session.execute(
+        db.select(Freelancer.id).where(Freelancer.email == 'tovban.freelancer@gmail.com')
+    ).scalar_one()
+
+
+def category_table(freelancer_id):
+    rows = db.session.execute(
+        db.select(FreelancerCategoryStats.category, FreelancerCategoryStats.package_count)
+        .where(FreelancerCategoryStats.freelancer_id == freelancer_id, FreelancerCategoryStats.package_count > 0)
+    )
+    return dict(rows.all())
+
+
+def test_stats_follow_orm_changes(test_client, init_database):
+    """
+    GIVEN a Flask application configured for testing, with the default set of packages in the database
+    WHEN a package is updated and then deleted through the ORM
+    THEN check the statistics of its freelancer are adjusted each time
+    """
+    freelancer_id = default_user_id()
+    assert package_statistics(freelancer_id) == {
+        'package_count': 3, 'average_rating': 4.0, 'ratings': {1: 0, 2: 0, 3: 1, 4: 1, 5: 1},
+        'categories': {'Emily Henry': 1, 'Taylor Jenkins Reid': 2},
+    }
+
+    package = db.session.execute(db.select(Package).where(Package.package_name == 'Book Lovers')).scalar_one()
+    package.update(category='Taylor Jenkins Reid', rating='5')
+    db.session.commit()
+    statistics = package_statistics(freelancer_id)
+    assert statistics['average_rating'] == 4.67
+    assert statistics['ratings'] == {1: 0, 2: 0, 3: 0, 4: 1, 5: 2}
+    assert statistics['categories'] == {'Taylor Jenkins Reid': 3}
+
+    db.session.delete(package)
+    db.session.commit()
+    statistics = package_statistics(freelancer_id)
+    assert (statistics['package_count'], statistics['average_rating']) == (2, 4.5)
+    assert category_table(freelancer_id) == {'Taylor Jenkins Reid': 2}
+
+
+def test_stats_follow_bulk_changes(test_client, init_database, log_in_default_user):
+    """
+    GIVEN a Flask application configured for testing, with the default user logged in
+    WHEN packages are created, updated and deleted through the bulk API
+    THEN check the statistics of the freelancer are adjusted for every batch
+    """
+    freelancer_id = default_user_id()
+    before = package_statistics(freelancer_id)
+    ids = test_client.post('/api/v1/packages', json=[
+        {'package_name': f'Stats {n}', 'category': 'Stats', 'rating': 2} for n in range(3)
+    ]).json['ids']
+    statistics = package_statistics(freelancer_id)
+    assert statistics['package_count'] == before['package_count'] + 3
+    assert statistics['ratings'][2] == 3
+    assert statistics['categories']['Stats'] == 3
+
+    test_client.patch('/api/v1/packages', json=[{'id': ids[0], 'rating': 5, 'category': 'Moved'},
+                                                {'id': ids[1], 'package_name': 'Renamed'}])
+    statistics = package_statistics(freelancer_id)
+    assert (statistics['ratings'][2], statistics['ratings'][5]) == (2, before['ratings'][5] + 1)
+    assert (statistics['categories']['Stats'], statistics['categories']['Moved']) == (2, 1)
+
+    test_client.delete('/api/v1/packages', json={'ids': ids})
+    assert package_statistics(freelancer_id) == before
+
+
+def test_stats_rebuild_command(test_client, cli_test_client):
+    """
+    GIVEN packages of two freelancers and statistics that drifted from them
+    WHEN the 'flask stats rebuild' command is called with small chunks
+    THEN check the statistics are recomputed from the packages
+    """
+    for freelancer_id, ratings in ((7001, [5, 4, 4]), (7003, [1])):
+        for rating in ratings:
+            db.session.add(Package(f'Rebuild {rating}', 'Rebuild', str(rating), freelancer_id))
+    db.session.commit()
+    expected = {freelancer_id: package_statistics(freelancer_id) for freelancer_id in (7001, 7003)}
+
+    db.session.execute(db.update(FreelancerStats).values(package_count=99, rating_5=42))
+    db.session.add(FreelancerStats(freelancer_id=7002, package_count=1))
+    db.session.commit()
+
+    output = cli_test_client.invoke(args=['stats', 'rebuild', '--chunk-size', '2'])
+    assert output.exit_code == 0
+    assert 'Rebuilt the package statistics in 2 chunks of 2 freelancer ids' in output.output
+    assert {freelancer_id: package_statistics(freelancer_id) for freelancer_id in (7001, 7003)} == expected
+    assert db.session.execute(db.select(FreelancerStats.freelancer_id)).scalars().all() == [7001, 7003]
+    assert expected[7001]['average_rating'] == 4.33
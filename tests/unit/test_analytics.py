@@ -0,0 +1,85 @@
+"""
+This file (test_analytics.py) contains the unit tests for the vectorized rating reports.
+"""
+import numpy as np
+
+from src.analytics import RatingHistograms, build_rating_report, rank, summarize
+
+
+def test_histograms_accumulate_chunks():
+    """
+    GIVEN two chunks of package columns, with missing and invalid values
+    WHEN they are added to the rating histograms
+    THEN check the counts per category and freelancer only include the packages rated 1 to 5
+    """
+    histograms = RatingHistograms()
+    histograms.add(['Design', 'Writing', None, 'Design'], [5, 3, 4, None], [2, 2, None, 7])
+    histograms.add(['Design', 'Legal'], [1, 9], [7, 1])
+
+    assert (histograms.packages, histograms.unrated) == (6, 2)
+    assert histograms.categories == {'Design': 0, 'Writing': 1, '': 2, 'Legal': 3}
+    assert histograms.category_counts[:3].tolist() == [[1, 0, 0, 0, 1], [0, 0, 1, 0, 0], [0, 0, 0, 1, 0]]
+    assert histograms.category_counts[3:].sum() == 0
+    assert histograms.freelancers == {2: 0, 7: 1}
+    assert histograms.freelancer_counts[:2].tolist() == [[0, 0, 1, 0, 1], [1, 0, 0, 0, 0]]
+    assert histograms.freelancer_counts.sum() == 3
+
+
+def test_histograms_freelancer_codes_are_dense():
+    """
+    GIVEN packages of a few freelancers with large and sparse ids
+    WHEN they are added to the rating histograms
+    THEN check the freelancer histograms only hold one row per distinct freelancer
+    """
+    histograms = RatingHistograms()
+    histograms.add(['Design'] * 4, [5, 4, 3, 2], [10 ** 12, 3, 10 ** 12, 10 ** 9])
+    histograms.add(['Design'] * 2, [1, 5], [3, 7])
+
+    assert histograms.freelancers == {3: 0, 10 ** 9: 1, 10 ** 12: 2, 7: 3}
+    assert len(histograms.freelancer_counts) <= 2 * len(histograms.freelancers)
+    assert histograms.freelancer_counts[histograms.freelancers[10 ** 12]].tolist() == [0, 0, 1, 0, 1]
+    report = build_rating_report(histograms, top=2, min_packages=1)
+    assert [entry['freelancer_id'] for entry in report['top_freelancers']] == [7, 10 ** 12]
+    assert [entry['freelancer_id'] for entry in report['most_active_freelancers']] == [10 ** 12, 3]
+
+
+def test_summarize_and_rank():
+    """
+    GIVEN rating histograms of four groups, one of them empty
+    WHEN they are summarized and ranked
+    THEN check the means, nearest-rank percentiles and rankings are exact
+    """
+    counts = np.array([[0, 0, 0, 1, 3], [1, 1, 1, 1, 1], [0, 0, 0, 0, 0], [0, 0, 0, 2, 0]])
+    summary = summarize(counts)
+
+    assert summary['totals'].tolist() == [4, 5, 0, 2]
+    assert summary['means'][[0, 1, 3]].tolist() == [4.75, 3.0, 4.0]
+    assert np.isnan(summary['means'][2])
+    assert summary['percentiles'][25][[0, 1, 3]].tolist() == [4, 2, 4]
+    assert summary['percentiles'][50][[0, 1, 3]].tolist() == [5, 3, 4]
+    assert summary['percentiles'][90][[0, 1, 3]].tolist() == [5, 5, 4]
+
+    assert rank(summary, 10).tolist() == [0, 3, 1]
+    assert rank(summary, 10, min_packages=3).tolist() == [0, 1]
+    assert rank(summary, 2, by='totals').tolist() == [1, 0]
+
+
+def test_build_rating_report():
+    """
+    GIVEN rating histograms of a few packages
+    WHEN the rating report is built
+    THEN check the overall distribution, the categories and the freelancer rankings
+    """
+    histograms = RatingHistograms()
+    histograms.add(['Design', 'Design', 'Design', 'Writing', 'Writing'], [5, 4, 5, 2, None], [1, 1, 1, 2, 2])
+    report = build_rating_report(histograms, top=5, min_packages=2)
+
+    assert (report['packages'], report['unrated_packages'], report['rated_freelancers']) == (5, 1, 2)
+    assert report['overall'] == {'package_count': 4, 'average_rating': 4.0,
+                                 'percentiles': {'p25': 2, 'p50': 4, 'p75': 5, 'p90': 5},
+                                 'histogram': {'1': 0, '2': 1, '3': 0, '4': 1, '5': 2}}
+    assert [entry['category'] for entry in report['categories']] == ['Design', 'Writing']
+    assert [entry['category'] for entry in report['top_categories']] == ['Design']
+    assert [entry['freelancer_id'] for entry in report['top_freelancers']] == [1]
+    assert report['top_freelancers'][0]['average_rating'] == 4.67
+    assert [entry['freelancer_id'] for entry in report['most_active_freelancers']] == [1, 2]
@@ -0,0 +1,67 @@
+"""
+This file (test_async_db.py) contains the unit tests for the async database
+helpers and the ASGI adapter.
+"""
+import asyncio
+
+import pytest
+
+from src.async_db import async_database_url
+
+
+def test_async_database_url():
+    """
+    GIVEN database URLs of the synchronous drivers
+    WHEN their async URL is computed
+    THEN check the async driver of each backend is used and async URLs are kept
+    """
+    assert str(async_database_url('sqlite:///app.db')) == 'sqlite+aiosqlite:///app.db'
+    assert async_database_url('postgresql://user:pw@localhost/app').drivername == 'postgresql+asyncpg'
+    assert async_database_url('postgresql+psycopg2://localhost/app').drivername == 'postgresql+asyncpg'
+    assert async_database_url('sqlite+aiosqlite:///app.db').drivername == 'sqlite+aiosqlite'
+    with pytest.raises(ValueError):
+        async_database_url('mysql://localhost/app')
+
+
+def test_asgi_application(test_client, init_database):
+    """
+    GIVEN the Flask application wrapped in the ASGI adapter
+    WHEN the server sends the lifespan events and an HTTP request to the async API
+    THEN check the event loop is attached for the pooled engine and the JSON response is sent
+    """
+    from src.asgi import AsgiApplication
+
+    application = AsgiApplication(test_client.application)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def serve():
+        lifespan = asyncio.Queue()
+        await lifespan.put({'type': 'lifespan.startup'})
+        server_lifespan = asyncio.create_task(application({'type': 'lifespan'}, lifespan.get, send))
+        while not messages:
+            await asyncio.sleep(0)
+        lifespan_messages = len(messages)
+        attached = application.async_db.event_loop is asyncio.get_running_loop()
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/v1/packages/987654', 'query_string': b'',
+                 'headers': [], 'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80),
+                 'root_path': ''}
+        await application(scope, receive, send)
+        await lifespan.put({'type': 'lifespan.shutdown'})
+        await server_lifespan
+        return lifespan_messages, attached
+
+    lifespan_messages, attached = asyncio.run(serve())
+    assert attached
+    assert messages[0] == {'type': 'lifespan.startup.complete'}
+    http_messages = messages[lifespan_messages:-1]
+    assert http_messages[0]['type'] == 'http.response.start' and http_messages[0]['status'] == 404
+    assert b'Package 987654 not found' in http_messages[1]['body']
+    assert messages[-1] == {'type': 'lifespan.shutdown.complete'}
+    assert application.async_db.event_loop is None
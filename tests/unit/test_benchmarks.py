@@ -0,0 +1,56 @@
+"""
+This file (test_benchmarks.py) contains the unit tests for the benchmark data generator and suite.
+"""
+import random
+
+from benchmarks.datagen import packages_per_freelancer
+from benchmarks.suite import compare_with_baseline, percentile
+
+
+def result(throughput, p95_ms, errors=0):
+    return {'requests': 100, 'errors': errors, 'throughput': throughput, 'p50_ms': 1.0, 'p95_ms': p95_ms,
+            'p99_ms': p95_ms}
+
+
+def test_packages_per_freelancer():
+    """
+    GIVEN a number of freelancers and a mean number of packages
+    WHEN the packages per freelancer are drawn
+    THEN every freelancer has at least one package and the total is exact
+    """
+    counts = packages_per_freelancer(random.Random(1), 500, 20)
+    assert len(counts) == 500
+    assert min(counts) >= 1
+    assert sum(counts) == 500 * 20
+    assert max(counts) > 5 * 20
+
+
+def test_percentile():
+    """
+    GIVEN sorted latencies
+    WHEN percentiles are taken
+    THEN they are the nearest-rank values
+    """
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.95) == 0.0
+
+
+def test_compare_with_baseline():
+    """
+    GIVEN a saved baseline
+    WHEN results are compared with it
+    THEN only throughput drops, p95 increases beyond the tolerance and errors are regressions
+    """
+    baseline = {'results': {'client': {'status': result(1000, 10.0), 'profile': result(200, 50.0)}}}
+
+    assert compare_with_baseline({'client': {'status': result(850, 11.5)}}, baseline, 0.2) == []
+
+    regressions = compare_with_baseline({'client': {'status': result(700, 10.0), 'profile': result(200, 70.0),
+                                                    'login': result(10, 100.0, errors=3)}}, baseline, 0.2)
+    assert len(regressions) == 3
+    assert 'client/status: throughput' in regressions[0]
+    assert 'client/profile: p95' in regressions[1]
+    assert 'client/login: 3 of 100 requests failed' in regressions[2]
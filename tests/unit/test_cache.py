@@ -0,0 +1,71 @@
+"""
+This file (test_cache.py) contains the unit tests for the cache.py file.
+"""
+from src.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_get_and_set():
+    """
+    GIVEN a TTLCache
+    WHEN a value is stored and then looked up
+    THEN check the value is returned and the hit/miss counters are updated
+    """
+    cache = TTLCache(maxsize=2, ttl=10)
+    assert cache.get('freelancers') is None
+    cache.set('freelancers', True)
+    assert cache.get('freelancers') is True
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_cache_entries_expire():
+    """
+    GIVEN a TTLCache with a 10 second time-to-live
+    WHEN the time-to-live has elapsed
+    THEN check the entry is no longer returned
+    """
+    timer = FakeTimer()
+    cache = TTLCache(ttl=10, timer=timer)
+    cache.set('packages', True)
+    timer.now = 9.9
+    assert cache.get('packages') is True
+    timer.now = 10.1
+    assert cache.get('packages') is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    GIVEN a TTLCache holding at most two entries
+    WHEN a third entry is stored
+    THEN check the least recently used entry is evicted
+    """
+    cache = TTLCache(maxsize=2)
+    cache.set(1, 'one')
+    cache.set(2, 'two')
+    cache.get(1)
+    cache.set(3, 'three')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'one'
+    assert cache.get(3) == 'three'
+
+
+def test_cache_delete_where():
+    """
+    GIVEN a TTLCache holding keys of several groups
+    WHEN the keys of one group are deleted with a predicate
+    THEN check only those keys are removed
+    """
+    cache = TTLCache(maxsize=10, ttl=10)
+    for key in [('row', 1), ('row', 2), ('summary', 1)]:
+        cache.set(key, True)
+    assert cache.delete_where(lambda key: key[0] == 'row') == 2
+    assert len(cache) == 1
+    assert cache.get(('summary', 1)) is True
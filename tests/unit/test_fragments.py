@@ -0,0 +1,83 @@
+"""
+This file (test_fragments.py) contains the unit tests for the fragments.py file.
+"""
+import pytest
+from flask import Flask, render_template_string
+
+from src.fragments import FragmentCache
+
+
+TEMPLATE = ("{% cache 'row', package_id, version %}"
+            "<td>{{ load() }}</td>"
+            "{% endcache %}")
+
+
+@pytest.fixture(params=['memory', 'file'])
+def app(request, tmp_path):
+    app = Flask(__name__)
+    app.config.update(FRAGMENT_CACHE_ENABLED=True,
+                      FRAGMENT_CACHE_BACKEND=request.param,
+                      FRAGMENT_CACHE_MAX_SIZE=10,
+                      FRAGMENT_CACHE_TTL=60,
+                      FRAGMENT_CACHE_DIR=str(tmp_path / 'fragments'))
+    app.fragment_cache = FragmentCache(app)
+    return app
+
+
+def render(app, package_id, version, value):
+    calls = []
+
+    def load():
+        calls.append(value)
+        return value
+
+    with app.app_context():
+        html = render_template_string(TEMPLATE, package_id=package_id, version=version, load=load)
+    return html, len(calls)
+
+
+def test_fragment_cache_hit(app):
+    """
+    GIVEN a template with a cached fragment
+    WHEN it is rendered twice with the same key
+    THEN check the block is only evaluated once and the hit ratio is reported
+    """
+    assert render(app, 1, 1, '<b>') == ('<td>&lt;b&gt;</td>', 1)
+    assert render(app, 1, 1, 'changed') == ('<td>&lt;b&gt;</td>', 0)
+    assert app.fragment_cache.stats() == {'enabled': True, 'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+
+def test_fragment_cache_versioned_key(app):
+    """
+    GIVEN a cached fragment
+    WHEN it is rendered with a new data version
+    THEN check the block is evaluated again
+    """
+    render(app, 1, 1, 'old')
+    assert render(app, 1, 2, 'new') == ('<td>new</td>', 1)
+
+
+def test_fragment_cache_invalidate_scope(app):
+    """
+    GIVEN cached fragments of two scopes
+    WHEN the fragments of one scope are invalidated
+    THEN check only that scope is rendered again
+    """
+    render(app, 1, 1, 'one')
+    render(app, 2, 1, 'two')
+    app.fragment_cache.invalidate('row', 1)
+    assert render(app, 1, 1, 'one again') == ('<td>one again</td>', 1)
+    assert render(app, 2, 1, 'two again') == ('<td>two</td>', 0)
+
+
+def test_fragment_cache_disabled():
+    """
+    GIVEN a disabled fragment cache
+    WHEN a template with a cached fragment is rendered twice
+    THEN check the block is evaluated every time
+    """
+    app = Flask(__name__)
+    app.config.update(FRAGMENT_CACHE_ENABLED=False)
+    FragmentCache(app)
+    render(app, 1, 1, 'first')
+    assert render(app, 1, 1, 'second') == ('<td>second</td>', 1)
@@ -0,0 +1,130 @@
+"""
+This file (test_hashing.py) contains the unit tests for the hashing.py file.
+"""
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from src.hashing import PasswordHasher, current_policy, hash_password, needs_rehash, normalize_method
+from src.models import Freelancer
+
+
+def test_normalize_method():
+    """
+    GIVEN werkzeug method strings with omitted parameters
+    WHEN they are normalized
+    THEN check the fully specified method stored in hashes is returned
+    """
+    assert normalize_method('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+    assert normalize_method('pbkdf2:sha512').startswith('pbkdf2:sha512:')
+    assert normalize_method('scrypt') == 'scrypt:32768:8:1'
+    assert normalize_method('scrypt:16384') == 'scrypt:16384:8:1'
+
+
+def test_policy_from_config():
+    """
+    GIVEN a Flask application with a password hashing policy configured
+    WHEN a password is hashed inside the application context
+    THEN check the configured method and salt length are used
+    """
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', PASSWORD_SALT_LENGTH=8)
+    with app.app_context():
+        assert current_policy() == ('pbkdf2:sha256:1000', 8)
+        password_hashed = hash_password('SecretPass')
+        assert password_hashed.startswith('pbkdf2:sha256:1000$')
+        assert not needs_rehash(password_hashed)
+
+
+def test_hashes_fit_column():
+    """
+    GIVEN the strongest password hashing policies supported by werkzeug
+    WHEN a password is hashed with each of them
+    THEN check the hash fits the `password_hashed` column
+    """
+    for method in ('scrypt:32768:8:1', 'pbkdf2:sha512:600000', 'pbkdf2:sha256:600000'):
+        password_hashed = generate_password_hash('SecretPass', method=method, salt_length=16)
+        assert len(password_hashed) <= Freelancer.password_hashed.type.length
+
+
+def test_needs_rehash():
+    """
+    GIVEN password hashes created with different policies
+    WHEN they are checked against the policy 'pbkdf2:sha256:2000' with 16 character salts
+    THEN check only the hash matching the policy does not need a rehash
+    """
+    policy = ('pbkdf2:sha256:2000', 16)
+    assert not needs_rehash(generate_password_hash('SecretPass', method='pbkdf2:sha256:2000'), policy)
+    assert needs_rehash(generate_password_hash('SecretPass', method='pbkdf2:sha256:1000'), policy)
+    assert needs_rehash(generate_password_hash('SecretPass', method='pbkdf2:sha256:2000', salt_length=8), policy)
+    assert needs_rehash('not a hash', policy)
+
+
+def test_rehash_on_correct_password():
+    """
+    GIVEN a Freelancer whose password hash was created with an older policy
+    WHEN the correct password (and then an incorrect one) is verified
+    THEN check the hash is upgraded to the current policy only on success
+    """
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:2000', PASSWORD_SALT_LENGTH=16)
+    freelancer = Freelancer('Sophat Chhay', 'tovban.freelancer@gmail.com', 'SecretPass')
+    freelancer.password_hashed = generate_password_hash('SecretPass', method='pbkdf2:sha256:1000')
+    stale_hash = freelancer.password_hashed
+
+    with app.app_context():
+        assert not freelancer.is_password_correct('WrongPass')
+        assert freelancer.password_hashed == stale_hash
+
+        assert freelancer.is_password_correct('SecretPass')
+        assert freelancer.password_hashed.startswith('pbkdf2:sha256:2000$')
+        assert freelancer.is_password_correct('SecretPass')
+
+
+def create_hasher(workers=0, queue_limit=0):
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', PASSWORD_SALT_LENGTH=16,
+                      PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_QUEUE_LIMIT=queue_limit)
+    return app, PasswordHasher(app)
+
+
+def test_password_hasher_process_pool():
+    """
+    GIVEN a PasswordHasher with one worker process
+    WHEN a password is hashed and verified
+    THEN check the hashing happens in the pool and the latency metrics are recorded
+    """
+    app, hasher = create_hasher(workers=1)
+    try:
+        with app.app_context():
+            password_hashed = hasher.hash('SecretPass')
+        assert password_hashed.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(password_hashed, 'SecretPass')
+        assert not hasher.verify(password_hashed, 'WrongPass')
+        stats = hasher.stats()
+        assert stats['completed'] == 3
+        assert stats['queue_depth'] == 0
+        assert stats['max_latency_ms'] > 0
+    finally:
+        hasher.shutdown()
+
+
+def test_password_hasher_backpressure():
+    """
+    GIVEN a PasswordHasher whose worker and queue slots are all taken
+    WHEN another hashing operation is requested during a request
+    THEN check a fast '503' (Service Unavailable) response is returned
+    """
+    app, hasher = create_hasher(workers=0, queue_limit=0)
+
+    @app.route('/hash')
+    def hash_view():
+        return hasher.hash('SecretPass')
+
+    hasher._slots.acquire()
+    response = app.test_client().get('/hash')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert hasher.stats()['rejected'] == 1
+
+    hasher._slots.release()
+    assert app.test_client().get('/hash').status_code == 200
@@ -0,0 +1,80 @@
+"""
+This file (test_identity.py) contains the unit tests for the identity.py file.
+"""
+from datetime import datetime
+
+from flask import Flask
+
+from src.identity import FreelancerIdentity, IdentityCache
+
+
+def create_cache(enabled=True):
+    app = Flask(__name__)
+    app.config.update(IDENTITY_CACHE_ENABLED=enabled,
+                      IDENTITY_CACHE_BACKEND='memory',
+                      IDENTITY_CACHE_MAX_SIZE=10,
+                      IDENTITY_CACHE_TTL=60)
+    return IdentityCache(app)
+
+
+def load_identity(user_id):
+    load_identity.calls += 1
+    return FreelancerIdentity(user_id, 'Sophat Chhay', 'tovban.freelancer@gmail.com', datetime.now())
+
+
+def test_identity_cache_saves_queries():
+    """
+    GIVEN an enabled identity cache
+    WHEN the same user is loaded several times
+    THEN check the loader is only called once and the hits are counted
+    """
+    load_identity.calls = 0
+    cache = create_cache()
+    for _ in range(3):
+        identity = cache.load(1, load_identity)
+    assert identity.email == 'tovban.freelancer@gmail.com'
+    assert identity.get_id() == '1'
+    assert load_identity.calls == 1
+    assert cache.stats() == {'enabled': True, 'hits': 2, 'misses': 1, 'hit_ratio': 0.6667}
+
+
+def test_identity_cache_invalidate():
+    """
+    GIVEN an identity cache holding a user
+    WHEN the user is invalidated (e.g. the password changed)
+    THEN check the next load calls the loader again
+    """
+    load_identity.calls = 0
+    cache = create_cache()
+    cache.load(1, load_identity)
+    cache.invalidate('1')
+    cache.load(1, load_identity)
+    assert load_identity.calls == 2
+
+
+def test_identity_cache_disabled():
+    """
+    GIVEN a disabled identity cache
+    WHEN a user is loaded twice
+    THEN check the loader is called every time
+    """
+    load_identity.calls = 0
+    cache = create_cache(enabled=False)
+    cache.load(1, load_identity)
+    cache.load(1, load_identity)
+    assert load_identity.calls == 2
+    assert cache.stats()['enabled'] is False
+
+
+def test_identity_snapshot_round_trip():
+    """
+    GIVEN a FreelancerIdentity
+    WHEN it is serialized for a shared backend and loaded back
+    THEN check the fields are preserved
+    """
+    identity = FreelancerIdentity(7, 'Sophat Chhay', 'tovban.freelancer@gmail.com', datetime(2023, 5, 1, 10, 30))
+    restored = FreelancerIdentity.from_dict(identity.to_dict())
+    assert restored.id == 7
+    assert restored.email == identity.email
+    assert restored.created_at == identity.created_at
+    assert restored == identity
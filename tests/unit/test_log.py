@@ -0,0 +1,104 @@
+"""
+This file (test_log.py) contains the unit tests for the log.py file.
+"""
+import json
+import logging
+import os
+import queue
+
+import pytest
+
+from src.log import InfoSamplingFilter, JsonFormatter, NonBlockingQueueHandler, create_queue_handler
+
+
+def make_record(level=logging.INFO, msg='Package (%s) was added!', args=('Build Python',), **extra):
+    record = logging.LogRecord('src', level, __file__, 42, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    """
+    GIVEN a log record with `extra` fields
+    WHEN it is formatted with the JsonFormatter
+    THEN check a single JSON line with the message and extra fields is produced
+    """
+    line = JsonFormatter().format(make_record(endpoint='packages.add_package', sql={'queries': 3}))
+    entry = json.loads(line)
+    assert '\n' not in line
+    assert entry['level'] == 'INFO'
+    assert entry['message'] == 'Package (Build Python) was added!'
+    assert entry['endpoint'] == 'packages.add_package'
+    assert entry['sql'] == {'queries': 3}
+    assert entry['location'] == 'test_log.py:42'
+
+
+def test_info_sampling_filter():
+    """
+    GIVEN a sampling filter keeping no INFO records
+    WHEN INFO and WARNING records are filtered
+    THEN check only the WARNING record is kept
+    """
+    sampling_filter = InfoSamplingFilter(0.0)
+    assert not sampling_filter.filter(make_record(logging.INFO))
+    assert sampling_filter.filter(make_record(logging.WARNING))
+    assert InfoSamplingFilter(1.0).filter(make_record(logging.INFO))
+
+
+def test_queue_handler_drops_when_full():
+    """
+    GIVEN a queue handler whose queue is full
+    WHEN another record is emitted
+    THEN check the record is dropped and counted instead of blocking
+    """
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.stats() == {'queued': 1, 'dropped': 1}
+
+
+def test_queue_handler_writes_in_background(tmp_path):
+    """
+    GIVEN a queue handler feeding a file handler from a background thread
+    WHEN records are emitted and the handler is closed
+    THEN check every record was written to the file as a JSON line
+    """
+    file_handler = logging.FileHandler(tmp_path / 'app.log')
+    file_handler.setFormatter(JsonFormatter())
+    handler = create_queue_handler(file_handler, queue_size=100, info_sample_rate=1.0)
+    for n in range(5):
+        handler.handle(make_record(args=(n,)))
+    handler.close()
+    file_handler.close()
+
+    lines = (tmp_path / 'app.log').read_text().splitlines()
+    assert [json.loads(line)['message'] for line in lines] == [f'Package ({n}) was added!' for n in range(5)]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork')
+def test_queue_handler_restarted_after_fork(tmp_path):
+    """
+    GIVEN a queue handler feeding a file handler from a background thread
+    WHEN the process forks and the child emits records
+    THEN check the child's records are written by a listener of its own
+    """
+    file_handler = logging.FileHandler(tmp_path / 'app.log')
+    file_handler.setFormatter(JsonFormatter())
+    handler = create_queue_handler(file_handler, queue_size=100, info_sample_rate=1.0)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            handler.handle(make_record(args=('child',)))
+            handler.close()
+        finally:
+            os._exit(0 if handler.listener is None else 1)
+    _, status = os.waitpid(pid, 0)
+    handler.handle(make_record(args=('parent',)))
+    handler.close()
+    file_handler.close()
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    lines = (tmp_path / 'app.log').read_text().splitlines()
+    assert [json.loads(line)['message'] for line in lines] == ['Package (child) was added!',
+                                                               'Package (parent) was added!']
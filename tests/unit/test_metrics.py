@@ -0,0 +1,97 @@
+"""
+This file (test_metrics.py) contains the unit tests for the metrics.py file.
+"""
+import os
+
+from src.metrics import Counter, Gauge, Histogram, MetricsRegistry, MmapedDict, mark_process_dead
+
+
+def test_histogram_exposition():
+    """
+    GIVEN a registry with a latency histogram
+    WHEN observations are recorded
+    THEN check the buckets are rendered cumulatively with the sum and count
+    """
+    registry = MetricsRegistry()
+    histogram = Histogram(registry, 'latency_seconds', 'Latency.', ('endpoint',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, ('packages.list_packages',))
+    histogram.observe(0.5, ('packages.list_packages',))
+    histogram.observe(5.0, ('packages.list_packages',))
+
+    output = registry.generate_latest()
+    assert '# TYPE latency_seconds histogram' in output
+    assert 'latency_seconds_bucket{endpoint="packages.list_packages",le="0.1"} 1.0' in output
+    assert 'latency_seconds_bucket{endpoint="packages.list_packages",le="1.0"} 2.0' in output
+    assert 'latency_seconds_bucket{endpoint="packages.list_packages",le="+Inf"} 3.0' in output
+    assert 'latency_seconds_count{endpoint="packages.list_packages"} 3.0' in output
+    assert 'latency_seconds_sum{endpoint="packages.list_packages"} 5.55' in output
+
+
+def test_counter_and_gauge():
+    """
+    GIVEN a registry with a counter and a gauge
+    WHEN they are incremented and decremented
+    THEN check the rendered values
+    """
+    registry = MetricsRegistry()
+    counter = Counter(registry, 'requests', 'Requests.', ('endpoint', 'status'))
+    gauge = Gauge(registry, 'in_flight', 'In flight.', ('endpoint',))
+    counter.inc(('freelancers.login', '200'))
+    counter.inc(('freelancers.login', '200'))
+    gauge.inc(('freelancers.login',))
+    gauge.inc(('freelancers.login',))
+    gauge.dec(('freelancers.login',))
+
+    output = registry.generate_latest()
+    assert 'requests_total{endpoint="freelancers.login",status="200"} 2.0' in output
+    assert 'in_flight{endpoint="freelancers.login"} 1.0' in output
+
+
+def test_mmaped_dict_grows_and_persists(tmp_path):
+    """
+    GIVEN a memory-mapped value file
+    WHEN more values are written than fit in the initial mapping and the file is reopened
+    THEN check every value can be read back
+    """
+    filename = str(tmp_path / 'values_1.db')
+    values = MmapedDict(filename)
+    for n in range(3000):
+        values.add(f'key-{n}', n)
+    values.add('key-7', 1)
+    values.close()
+
+    assert os.path.getsize(filename) > MmapedDict.initial_size
+    stored = dict(MmapedDict.read_file(filename))
+    assert len(stored) == 3000
+    assert stored['key-7'] == 8.0
+    assert dict(MmapedDict(filename).items())['key-2999'] == 2999.0
+
+
+def test_multiprocess_aggregation(tmp_path):
+    """
+    GIVEN two worker processes writing to the same metrics directory
+    WHEN the metrics are collected
+    THEN check the values of both processes are summed, and dead gauges are removed
+    """
+    directory = str(tmp_path)
+    registry = MetricsRegistry()
+    registry.configure(directory)
+    counter = Counter(registry, 'requests', 'Requests.', ('endpoint', 'status'))
+    gauge = Gauge(registry, 'in_flight', 'In flight.', ('endpoint',))
+    counter.inc(('packages.index', '200'))
+    gauge.inc(('packages.index',))
+
+    # Simulate a second worker process writing its own files
+    other = MmapedDict(os.path.join(directory, 'values_999999.db'))
+    other.add(counter._key('requests_total', ('packages.index', '200')), 4)
+    other_gauges = MmapedDict(os.path.join(directory, 'gauges_999999.db'))
+    other_gauges.add(gauge._key('in_flight', ('packages.index',)), 2)
+
+    output = registry.generate_latest()
+    assert 'requests_total{endpoint="packages.index",status="200"} 5.0' in output
+    assert 'in_flight{endpoint="packages.index"} 3.0' in output
+
+    mark_process_dead(999999, directory)
+    output = registry.generate_latest()
+    assert 'requests_total{endpoint="packages.index",status="200"} 5.0' in output
+    assert 'in_flight{endpoint="packages.index"} 1.0' in output
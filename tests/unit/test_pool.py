@@ -0,0 +1,122 @@
+"""
+This file (test_pool.py) contains the unit tests for the connection pool
+instrumentation and the per-connection database settings.
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+
+from src.pool import InstrumentedQueuePool, configure_connection, execute_settings
+
+
+def create_sqlite_engine(tmp_path, **options):
+    return create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, **options)
+
+
+def test_pool_reports_checkout_waits_and_timeouts(tmp_path):
+    """
+    GIVEN an engine using the instrumented pool with a single connection
+    WHEN a connection is checked out twice, then once more while it is in use
+    THEN check every checkout wait is reported and the starved checkout is reported as a timeout
+    """
+    engine = create_sqlite_engine(tmp_path, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    observed = []
+    engine.pool.observe_checkout = lambda pool, wait, timed_out: observed.append((wait, timed_out))
+
+    for _ in range(2):
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    assert [timed_out for _, timed_out in observed] == [False, False]
+
+    with engine.connect():
+        with pytest.raises(TimeoutError):
+            engine.connect()
+    assert observed[-1][1] is True
+    assert observed[-1][0] >= 0.05
+
+    # Disposing the engine recreates the pool, which keeps reporting
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert len(observed) == 5
+
+
+def test_sqlite_pragmas(tmp_path):
+    """
+    GIVEN an SQLite engine configured with pragmas
+    WHEN a new connection is opened
+    THEN check the WAL journal, busy timeout and synchronous level are applied
+    """
+    engine = create_sqlite_engine(tmp_path)
+    configure_connection(engine, {'SQLITE_PRAGMAS': {'journal_mode': 'WAL', 'busy_timeout': 1234, 'synchronous': 'NORMAL'},
+                                  'DB_STATEMENT_TIMEOUT_MS': 1000})
+
+    with engine.connect() as connection:
+        assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 1234
+        assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+
+
+class FakeConnection(object):
+    """DBAPI connection recording the statements it runs, with the autocommit mode at the time."""
+
+    def __init__(self):
+        self.autocommit = False
+        self.executed = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement):
+        self.executed.append((statement, self.autocommit))
+
+    def close(self):
+        pass
+
+
+def test_settings_run_in_autocommit():
+    """
+    GIVEN a new DBAPI connection outside of autocommit mode
+    WHEN settings are executed on it in autocommit mode
+    THEN check they run outside of a transaction and the previous mode is restored
+    """
+    connection = FakeConnection()
+    execute_settings(connection, ['SET statement_timeout = 1000'], autocommit=True)
+    assert connection.executed == [('SET statement_timeout = 1000', True)]
+    assert connection.autocommit is False
+
+
+@pytest.mark.skipif(not os.getenv('TEST_DATABASE_URI', '').startswith('postgresql'),
+                    reason='requires TEST_DATABASE_URI to point to PostgreSQL')
+def test_postgresql_statement_timeout_survives_checkin():
+    """
+    GIVEN a PostgreSQL engine configured with a statement timeout and a single pooled connection
+    WHEN the connection is checked in (rolled back by the pool) and checked out again
+    THEN check the statement timeout is still applied
+    """
+    engine = create_engine(os.environ['TEST_DATABASE_URI'], poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0)
+    configure_connection(engine, {'SQLITE_PRAGMAS': {}, 'DB_STATEMENT_TIMEOUT_MS': 1234})
+
+    for _ in range(2):
+        with engine.connect() as connection:
+            assert connection.execute(text('SHOW statement_timeout')).scalar() == '1234ms'
+    engine.dispose()
+
+
+def test_pool_metrics(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/metrics' and '/status/ready' pages are requested (GET)
+    THEN check the pool usage and checkout waits of the default bind are exported
+    """
+    test_client.get('/status/ready')
+    metrics = test_client.get('/metrics').text
+    assert 'db_pool_checkout_wait_seconds_count{bind="default"}' in metrics
+    assert 'db_pool_size{bind="default"} 5.0' in metrics
+    assert 'db_pool_checked_out{bind="default"}' in metrics
+
+    pool = test_client.get('/status/ready').json['database_pool']['default']
+    assert pool['size'] == 5 and pool['overflow'] == 0
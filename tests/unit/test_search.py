@@ -0,0 +1,27 @@
+"""
+This file (test_search.py) contains the unit tests for the search.py file.
+"""
+from src.search import parse_query, scoped_words
+
+
+def test_scoped_words():
+    """
+    GIVEN a package name with punctuation, accents and underscores
+    WHEN it is prepared for the SQLite text index
+    THEN check every lower-cased word is prefixed with the owner id
+    """
+    assert scoped_words(7, 'Logo design') == '7xlogo 7xdesign'
+    assert scoped_words(7, 'Café_menu, v2!') == '7xcafé 7xmenu 7xv2'
+    assert scoped_words(7, None) == ''
+
+
+def test_parse_query():
+    """
+    GIVEN free text typed by a user, including FTS5 and tsquery syntax
+    WHEN it is converted to a search query
+    THEN check only the words are kept, as prefix terms that must all match
+    """
+    assert parse_query('Logo des', 7, 'sqlite') == '"7xlogo"* "7xdes"*'
+    assert parse_query('logo" OR NEAR(*', 7, 'sqlite') == '"7xlogo"* "7xor"* "7xnear"*'
+    assert parse_query('logo & !des', 7, 'postgresql') == 'logo:* & des:*'
+    assert parse_query(' -- ', 7, 'sqlite') is None